@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+
+'''
+this script benchmarks the weather preparation backends for the given regions.
+it uses the files already downloaded by prepare-weather.py for the first
+available scenario and gcm and the weather points of each region, and
+compares the 'cdo' backend (crop, merge, extract) with the 'xarray' backend
+(lazy in-process extraction).
+with --formatter it measures the rows per second of the SWAT+ weather file
+formatter against the DataFrame.to_string formatting it replaced.
+
+usage: benchmark-weather.py region [region ...]
+       benchmark-weather.py --formatter
+'''
+
+import os, sys, shutil
+from datetime import datetime
+import numpy, pandas, geopandas
+from ccfx import listFiles, exists
+import datavariables as variables
+from instrumentation import instrument_script
+from coswatFX import weatherFileCatalog, catalogFiles, extractPointsSeries, formatSWATPlusWeatherRows, runPeriodCalendar, setWeatherVariableNames, groupWeatherFiles, cropAndMergeWeather
+from coswatFX import varNames
+
+weatherDir      = './weather-ws'
+benchmarkDir    = f'{weatherDir}/benchmark'
+
+# change working directory
+me = os.path.realpath(__file__)
+os.chdir(os.path.dirname(me))
+
+
+def scenarioPeriod(scenario):
+    if scenario == 'observed': return variables.run_period
+    if scenario == 'historical': return variables.historical_period
+    return variables.future_period
+
+
+def benchmarkFormatter(runPeriod = [1981, 2010], stations = 20):
+    '''
+    formats the rows of temperature-like files (two value columns) of a 30 year period
+    '''
+    yearList, jdayList  = runPeriodCalendar(runPeriod)
+    rng                 = numpy.random.default_rng(0)
+    stationColumns      = [[rng.normal(20, 8, len(yearList)).astype('float32').astype(float) for _ in range(2)] for _ in range(stations)]
+
+    timings = {}
+    for name in ['to_string', 'formatter']:
+        startTime = datetime.now()
+        for columns in stationColumns:
+            if name == 'to_string':
+                df = pandas.DataFrame({'year': yearList, 'jday': jdayList, 'tmax': columns[0], 'tmin': columns[1]})
+                text = df.to_string(col_space = [4, 6, 10, 10], header = False, index = False, na_rep = '-99', float_format = '%.4f')
+            else:
+                text = formatSWATPlusWeatherRows(yearList, jdayList, columns)
+        timings[name] = ((datetime.now() - startTime).total_seconds(), text)
+
+    rows = stations * len(yearList)
+    print(f"\n{'formatter':<30}{'rows':>10}{'seconds':>12}{'rows/s':>14}")
+    for name, (seconds, _) in timings.items():
+        print(f"{name:<30}{rows:>10}{seconds:>12.3f}{rows / max(seconds, 1e-9):>14.0f}")
+    print(f"\nidentical output: {timings['to_string'][1] == timings['formatter'][1]}\n")
+
+
+if __name__ == "__main__":
+
+    with instrument_script():
+
+        if sys.argv[1:] == ['--formatter']:
+            benchmarkFormatter()
+            sys.exit()
+
+        if len(sys.argv) < 2:
+            print("! select the regions to benchmark, they need weather points from prepare-weather.py")
+            sys.exit()
+
+        regions  = sys.argv[1:]
+        scenario = variables.available_scenarios[0]
+        gcm      = list(variables.weather_pr_links_list[scenario])[0]
+        period   = scenarioPeriod(scenario)
+
+        downloaded  = listFiles(f'{weatherDir}/download/{scenario}/{gcm}/', 'nc') + listFiles(f'{weatherDir}/download/{scenario}/{gcm}/', 'nc4')
+        keptFiles   = catalogFiles(weatherFileCatalog(downloaded), period)
+
+        if len(keptFiles) == 0:
+            print(f"! no downloaded files for {scenario}/{gcm} in {period}, run prepare-weather.py first")
+            sys.exit()
+
+        groupedFiles = groupWeatherFiles(keptFiles, setWeatherVariableNames(keptFiles, varNames, {}))
+        runPeriod    = [int(yr) for yr in period.split('-')]
+
+        print(f'\n# benchmarking weather backends for {scenario}/{gcm} ({period}, {len(keptFiles)} files)\n')
+
+        results = []
+        for region in regions:
+            pointsFile = f'../model-data/{region}/weather/swatplus/{region}-weatherPoints.gpkg'
+            if not exists(pointsFile):
+                print(f"  ! {pointsFile} not found, skipping {region}")
+                continue
+
+            regionPoints    = geopandas.read_file(pointsFile).to_crs(epsg=4326)
+            regionExtents   = regionPoints.total_bounds
+            regionBox       = [str(float(coord)) for coord in [regionExtents[0], regionExtents[2], regionExtents[1], regionExtents[3]]]
+            lonArray        = regionPoints.geometry.x.values
+            latArray        = regionPoints.geometry.y.values
+
+            print(f"  > {region}: {len(regionPoints)} points")
+
+            startTime       = datetime.now()
+            mergedFiles     = cropAndMergeWeather(groupedFiles, regionBox, f"{benchmarkDir}/cropped/{region}", f"{benchmarkDir}/merged/{region}/", variables.processes)
+            seriesCdo       = extractPointsSeries(mergedFiles, lonArray, latArray, runPeriod, v = False)
+            cdoTime         = (datetime.now() - startTime).total_seconds()
+
+            startTime       = datetime.now()
+            seriesXarray    = extractPointsSeries(groupedFiles, lonArray, latArray, runPeriod, v = False)
+            xarrayTime      = (datetime.now() - startTime).total_seconds()
+
+            identical = list(seriesCdo['variable'].values) == list(seriesXarray['variable'].values) and \
+                numpy.array_equal(seriesCdo.values, seriesXarray.values, equal_nan = True)
+
+            results.append([region, len(regionPoints), cdoTime, xarrayTime, identical])
+            shutil.rmtree(benchmarkDir, ignore_errors = True)
+
+        print(f"\n{'region':<30}{'points':>10}{'cdo (s)':>12}{'xarray (s)':>12}{'speedup':>10}  identical")
+        for region, points, cdoTime, xarrayTime, identical in results:
+            print(f"{region:<30}{points:>10}{cdoTime:>12.2f}{xarrayTime:>12.2f}{cdoTime / max(xarrayTime, 1e-9):>10.2f}  {identical}")
+        print()
@@ -1,8 +1,34 @@
-import re, geopandas, os, sys, pandas
-from ccfx import createPath, getFileBaseName, writeFile, readFile
+import re, geopandas, shapely, os, sys, json, pandas, numpy, xarray, uuid, hashlib, multiprocessing
+from multiprocessing import shared_memory
+from osgeo import gdal
+from ccfx import createPath, getFileBaseName, writeFile, readFile, deleteFile
 from cjfx import format_timedelta, show_progress
 from datetime import datetime, timedelta
-import subprocess
+import subprocess, contextlib, urllib.request, warnings
+from multiprocessing.pool import ThreadPool
+from filestate import memory_size, files_signature
+
+# weather file types, candidate variable names in the source files, and unit conversion
+extTypes         = ["tem", "pcp", "slr", "hmd", "wnd", ]
+
+varNames         = {'pcp': ['pr',],
+                    'tem': ['tasmax', 'tasmin'],
+                    'wnd': ['wnd', 'sfcwind', 'sfcWind', 'wind'],
+                    'hmd': ['hurs', 'rhs'],
+                    'slr': ['rlds',]}
+
+fullVarNames     = {'pcp': "precipitation",
+                    'tem': "temperature",
+                    'wnd': "wind speed",
+                    'hmd': "relative humidity",
+                    'slr': "solar radiation"}
+
+varFactors       = {'pcp': 86400.0000,
+                    'tem':  -273.1500,
+                    'slr':     0.0864,
+                    'hmd':     0.0100,
+                    'wnd':     1.0000}
+
 
 def runSWATPlus(txtinout_dir, final_dir = os.path.abspath(os.getcwd()),
                 executable_path = '', v = True, direct = False, modelName = None):
@@ -106,15 +132,254 @@ def isYearInFileRange(fileName, yearToCheck):
 
 def shouldKeep(baseFn, runPeriod):
     """Determines if a file should be downloaded based on year ranges."""
+    return len(catalogFiles(weatherFileCatalog([baseFn]), runPeriod)) > 0
+
+
+def weatherFileCatalog(fileNames_) -> pandas.DataFrame:
+    '''
+    parses weather file names or links into a table with their fileName, variable, model,
+    scenario, startYear and endYear. the years are the smallest and largest four digit
+    numbers of the name, the other columns follow the ISIMIP3b ({model}_{member}_{adjustment}_
+    {scenario}_{variable}_global_daily_{start}_{end}.nc) and ISIMIP2a ({variable}_{model}_
+    {start}_{end}.nc4) names and are empty for other names
+    '''
+    # typed as strings so that an empty list gives an empty catalog
+    catalog             = pandas.DataFrame({'fileName': pandas.Series([str(fname).strip() for fname in fileNames_], dtype = str)})
+    names               = catalog['fileName'].str.replace(r'^.*[/\\]', '', regex = True)
+
+    # like isYearInFileRange, a name needs at least two years, names without are never in a period
+    years               = names.str.extractall(r'(?<!\d)(\d{4})(?!\d)')[0].astype(int).groupby(level = 0)
+    dated               = (years.count() >= 2).reindex(catalog.index, fill_value = False)
+    catalog['startYear']    = years.min().reindex(catalog.index).where(dated)
+    catalog['endYear']      = years.max().reindex(catalog.index).where(dated)
+
+    isimip3b            = names.str.extract(r'^(?P<model>[^_]+)_[^_]+_[^_]+_(?P<scenario>[^_]+)_(?P<variable>[^_]+)_global_daily_\d{4}_\d{4}\.nc4?$')
+    isimip2a            = names.str.extract(r'^(?P<variable>[^_]+)_(?P<model>[^_]+)_\d{4}_\d{4}\.nc4?$')
+
+    for column in ['variable', 'model', 'scenario']:
+        catalog[column] = isimip3b[column].fillna(isimip2a[column]) if column in isimip2a else isimip3b[column]
+
+    return catalog
+
+
+def catalogFiles(catalog_, runPeriod_ = None, variables_ = None) -> list:
+    '''
+    returns the sorted file names of a catalog whose years overlap runPeriod_ ("1981-2010"
+    or [1981, 2010]) and whose variable is in variables_. None selects everything
+    '''
+    selected = pandas.Series(True, index = catalog_.index)
+
+    if not runPeriod_ is None:
+        startYear, endYear  = [int(yr) for yr in (runPeriod_.split('-') if isinstance(runPeriod_, str) else runPeriod_)]
+        selected &= (catalog_['startYear'] <= endYear) & (catalog_['endYear'] >= startYear)
+
+    if not variables_ is None:
+        selected &= catalog_['variable'].isin(list(variables_))
+
+    return sorted(catalog_.loc[selected, 'fileName'])
+
+
+@contextlib.contextmanager
+def exclusiveLock(lockFile_):
+    '''
+    holds an OS lock on lockFile_ while the with block runs, other processes wait for it.
+    the lock goes away with the process, so a crashed run can not leave it behind
+    '''
+    createPath(f"{os.path.dirname(os.path.abspath(lockFile_))}/")
+    with open(lockFile_, 'a+') as lockHandle:
+        if sys.platform == 'win32':
+            import msvcrt
+            while True:
+                try: msvcrt.locking(lockHandle.fileno(), msvcrt.LK_LOCK, 1); break
+                except OSError: continue
+        else:
+            import fcntl
+            fcntl.flock(lockHandle.fileno(), fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if sys.platform == 'win32': msvcrt.locking(lockHandle.fileno(), msvcrt.LK_UNLCK, 1)
+            else: fcntl.flock(lockHandle.fileno(), fcntl.LOCK_UN)
+
+
+def remoteFileSize(url_):
+    '''
+    returns the content length the server reports for url_, None if it can not be had
+    '''
+    try:
+        with urllib.request.urlopen(urllib.request.Request(url_, method = 'HEAD'), timeout = 60) as response:
+            size = response.headers.get('Content-Length')
+            return None if size is None else int(size)
+    except Exception:
+        return None
+
+
+def downloadWithResume(url_, dstDir_, verify_ = False, tries_ = 2):
+    '''
+    downloads url_ into dstDir_ through a .part file that is resumed after an interruption
+    and only renamed once its size matches the size the server reports. existing files
+    are trusted unless verify_, then they are checked against the server and completed.
+    returns (file name, 'exists', 'downloaded' or 'failed')
+    '''
+    fileName = f"{dstDir_}/{getFileBaseName(url_, extension = True)}"
+    partName = f"{fileName}.part"
+
+    if os.path.exists(fileName) and not verify_: return fileName, 'exists'
+
+    remoteSize = remoteFileSize(url_)
+    if os.path.exists(fileName):
+        if remoteSize is None or os.path.getsize(fileName) == remoteSize: return fileName, 'exists'
+        # incomplete from an earlier run, continue it
+        os.replace(fileName, partName)
+
+    command = ['wget', '-c', '-q', '-O', partName, '--no-check-certificate', '--retry-connrefused', f'--tries={tries_}', url_]
+    result  = subprocess.run(command, stdout = subprocess.DEVNULL, stderr = subprocess.PIPE, text = True)
+
+    if result.returncode != 0 or not os.path.exists(partName) or \
+            (remoteSize is not None and os.path.getsize(partName) != remoteSize):
+        reason = f"wget exited with {result.returncode}" if result.returncode != 0 else "size does not match the server"
+        print(f"\t! failed to download {url_}: {result.stderr.strip() or reason}")
+        if os.path.exists(partName) and os.path.getsize(partName) == 0: os.remove(partName)
+        return fileName, 'failed'
+
+    os.replace(partName, fileName)
+    return fileName, 'downloaded'
+
+
+def lockedDownload(url_, dstDir_, verify_ = False):
+    '''
+    runs downloadWithResume under an OS lock on {file}.lock, so a run that wants the same
+    file waits for the other run to finish it and then finds it, while other files go on
+    '''
+    with exclusiveLock(f"{dstDir_}/{getFileBaseName(url_, extension = True)}.lock"):
+        return downloadWithResume(url_, dstDir_, verify_)
+
+
+def downloadFiles(urls_, dstDir_, processes_ = 4, verify_ = False):
+    '''
+    downloads the unique urls_ into dstDir_ with at most processes_ transfers at a time.
+    every file is locked while it downloads, so concurrent runs fetch different files at
+    the same time and never the same file twice.
+    returns {file name: status}, raises RuntimeError when files could not be downloaded
+    '''
+    urls = list(dict.fromkeys(url.strip() for url in urls_ if url.strip() != ''))
+    createPath(f"{dstDir_}/")
+
+    with ThreadPool(max(1, min(processes_, len(urls)))) as pool:
+        results = pool.starmap(lockedDownload, [(url, dstDir_, verify_) for url in urls])
+
+    statuses = dict(results)
+    counts   = {status: list(statuses.values()).count(status) for status in ['exists', 'downloaded', 'failed']}
+    print(f"  > {len(urls)} files: {counts['downloaded']} downloaded, {counts['exists']} present, {counts['failed']} failed")
+
+    if counts['failed'] > 0:
+        raise RuntimeError(f"{counts['failed']} of {len(urls)} files could not be downloaded to {dstDir_}: " +
+            ', '.join(getFileBaseName(fileName, extension = True) for fileName, status in statuses.items() if status == 'failed'))
+
+    return statuses
 
-    def yearInRange(year_range, baseFn):
-        start_year, end_year = map(int, year_range.split('-'))
-        return isYearInFileRange(baseFn, start_year) or isYearInFileRange(baseFn, end_year)
 
-    if yearInRange(runPeriod, baseFn):
-        return True
+def runCommandJob(job_, threads_ = 1, retries_ = 0):
+    '''
+    runs one external command job {'name', 'command': [program, arguments...]} with the
+    thread count of the usual OpenMP and BLAS variables set to threads_, and runs it
+    again up to retries_ times while it fails.
+    returns the job with its returncode, tries, seconds and the stderr of the last try
+    '''
+    threadCount = str(max(1, int(threads_)))
+    environment = dict(os.environ, OMP_NUM_THREADS = threadCount, OPENBLAS_NUM_THREADS = threadCount, MKL_NUM_THREADS = threadCount)
+
+    startTime = datetime.now()
+    for tries in range(1, retries_ + 2):
+        try:
+            result = subprocess.run(job_['command'], stdout = subprocess.DEVNULL, stderr = subprocess.PIPE, text = True, env = environment)
+            returncode, stderr = result.returncode, result.stderr.strip()
+        except OSError as error:
+            # the program is missing or can not be started, trying again will not help
+            returncode, stderr = -1, str(error)
+            break
+        if returncode == 0: break
+
+    return dict(job_, returncode = returncode, tries = tries, seconds = (datetime.now() - startTime).total_seconds(), stderr = stderr)
+
+
+def runCommandJobs(jobs_, processes_ = 1, threads_ = 1, retries_ = 0):
+    '''
+    runs the command jobs ({'name', 'command'}) with runCommandJob, processes_ at a time,
+    and checks their exit status. the external programs do the work, so a pool of
+    threads waiting on them is enough.
+    returns the timing table of the jobs (name, returncode, tries, seconds, stderr).
+    raises RuntimeError with the stderr of the jobs that still failed after their retries
+    '''
+    if len(jobs_) == 0: return pandas.DataFrame(columns = ['name', 'returncode', 'tries', 'seconds', 'stderr'])
+
+    with ThreadPool(max(1, min(processes_, len(jobs_)))) as pool:
+        results = pool.starmap(runCommandJob, [(job, threads_, retries_) for job in jobs_])
+
+    timings = pandas.DataFrame([{key: result[key] for key in ['name', 'returncode', 'tries', 'seconds', 'stderr']} for result in results])
+
+    failed = timings[timings['returncode'] != 0]
+    if len(failed) > 0:
+        details = "\n".join(f"\t  - {row.name} ({row.tries} tries): {row.stderr.splitlines()[-1] if row.stderr else f'exit status {row.returncode}'}" for row in failed.itertuples())
+        raise RuntimeError(f"{len(failed)} of {len(jobs_)} jobs failed:\n{details}")
+
+    return timings
+
 
-    return False 
+def runTaskGraph(tasks_, workers_ = 1):
+    '''
+    runs tasks_ = {name: (function, args, [names of the tasks it depends on])} with at most
+    workers_ at a time, each as soon as all its dependencies are done. tasks are started in
+    the order of tasks_, so with one worker they run in that order in this process.
+    a failed task skips the tasks that depend on it.
+    returns {name: 'done', 'failed' or 'skipped'}
+    '''
+    from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+
+    status  = {}
+    running = {}
+
+    def readyTasks():
+        ready = []
+        for name, (function, args, dependencies) in tasks_.items():
+            if name in status or name in running.values(): continue
+            if any(status.get(dependency) in ['failed', 'skipped'] for dependency in dependencies):
+                print(f"\t! skipping {name}, a task it depends on did not finish")
+                status[name] = 'skipped'
+            elif all(status.get(dependency) == 'done' for dependency in dependencies):
+                ready.append(name)
+        return ready
+
+    def finish(name, runTask):
+        try:
+            runTask()
+            status[name] = 'done'
+        except Exception as error:
+            print(f"\t! {name} failed: {error}")
+            status[name] = 'failed'
+
+    if workers_ <= 1:
+        while True:
+            ready = readyTasks()
+            if len(ready) == 0: break
+            function, args, _ = tasks_[ready[0]]
+            finish(ready[0], lambda: function(*args))
+        return status
+
+    with ProcessPoolExecutor(max_workers = workers_) as pool:
+        while True:
+            for name in readyTasks():
+                if len(running) >= workers_: break
+                function, args, _ = tasks_[name]
+                running[pool.submit(function, *args)] = name
+
+            if len(running) == 0: break
+
+            finished, _ = wait(running, return_when = FIRST_COMPLETED)
+            for future in finished:
+                finish(running.pop(future), future.result)
+
+    return status
 
 
 def clipFeatures(inputFeaturePath:str, boundaryFeature:str, outputFeature:str, keepOnlyTypes = None, v = False) -> geopandas.GeoDataFrame:
@@ -140,6 +405,127 @@ def clipFeatures(inputFeaturePath:str, boundaryFeature:str, outputFeature:str, k
     return out_gdf
 
 
+def contentSignature(*fileNames_):
+    '''
+    returns the md5 hex digest of the contents of the files
+    '''
+    md5 = hashlib.md5()
+    for fileName in fileNames_:
+        with open(fileName, 'rb') as f:
+            for block in iter(lambda: f.read(1 << 20), b''): md5.update(block)
+
+    return md5.hexdigest()
+
+
+def arraySignature(*arrays_):
+    '''
+    returns the md5 hex digest of the values of the arrays
+    '''
+    md5 = hashlib.md5()
+    for array in arrays_: md5.update(numpy.ascontiguousarray(array).tobytes())
+
+    return md5.hexdigest()
+
+
+def weatherPointsGrid(resolution_:float, outputFeature:str = None) -> geopandas.GeoDataFrame:
+    '''
+    returns the global weather points (from -179.25, -85.25 every resolution_ degrees)
+    in EPSG:4326, built in one array operation in the row order of latitudes.
+    outputFeature is written as a GeoPackage, which keeps an R-tree spatial index
+    that clipWeatherPoints reads the points of a region through
+    '''
+    lonGrid, latGrid = numpy.meshgrid(numpy.arange(-179.25, 180.25, resolution_), numpy.arange(-85.25, 86.25, resolution_))
+    lonList, latList = lonGrid.ravel(), latGrid.ravel()
+
+    points = geopandas.GeoDataFrame({'longitude': lonList, 'latitude': latList}, geometry = geopandas.points_from_xy(lonList, latList), crs = 'EPSG:4326')
+
+    if not outputFeature is None:
+        createPath(f"{os.path.dirname(outputFeature)}/")
+        points.to_file(outputFeature, driver = 'GPKG', SPATIAL_INDEX = 'YES')
+
+    return points
+
+
+def clipWeatherPoints(pointsFeaturePath:str, cutline:str, outputFeature:str) -> geopandas.GeoDataFrame:
+    '''
+    clips the global weather points to a cutline. only the points in the bounds of the
+    cutline are read, through the spatial index of the points file, and they are kept
+    if they intersect the prepared cutline geometry, the points geopandas.clip keeps.
+    outputFeature is reused as long as the points file and the cutline are unchanged
+    since it was written, which is tracked with their signature in a .sig file next to it
+    '''
+    signature   = f"{files_signature([pointsFeaturePath])}{contentSignature(cutline)}"
+    sigFile     = f"{os.path.splitext(outputFeature)[0]}.sig"
+
+    if os.path.exists(outputFeature) and os.path.exists(sigFile) and readFile(sigFile)[0].strip() == signature:
+        return geopandas.read_file(outputFeature)
+
+    deleteFile(sigFile)
+
+    mask            = geopandas.read_file(cutline)
+    regionPoints    = geopandas.read_file(pointsFeaturePath, bbox = mask)
+    regionShape     = mask.to_crs(regionPoints.crs).geometry.unary_union
+    shapely.prepare(regionShape)
+
+    regionPoints    = regionPoints[shapely.intersects(regionShape, numpy.asarray(regionPoints.geometry.values))]
+
+    createPath(f"{os.path.dirname(outputFeature)}/")
+    regionPoints.to_file(outputFeature)
+    writeFile(sigFile, signature)
+
+    return regionPoints
+
+
+def extractRasterValues(rasterPath:str, latList, lonList, coordProj:str = 'EPSG:4326') -> numpy.ndarray:
+    '''
+    extracts the raster values at many coordinates with the raster opened once.
+    all points are projected and turned into pixel indexes in one array operation
+    (the same pixels as ccfx.extractRasterValue) and each raster block that has
+    points is read once, only over the window spanned by its points.
+
+    returns a float array in the order of the points, NaN for points outside the raster
+    '''
+    if not os.path.exists(rasterPath): raise ValueError(f"Raster file not found: {rasterPath}")
+
+    ds = gdal.Open(rasterPath)
+    if ds is None: raise ValueError(f"Could not open raster file: {rasterPath}")
+
+    rasterProj = ds.GetProjection()
+    if not rasterProj: raise ValueError("Raster has no projection information")
+
+    points          = geopandas.GeoSeries(geopandas.points_from_xy(lonList, latList), crs = coordProj.upper()).to_crs(rasterProj)
+    geotransform    = ds.GetGeoTransform()
+
+    # int() in extractRasterValue truncates towards zero
+    pxList  = numpy.trunc((points.x.values - geotransform[0]) / geotransform[1])
+    pyList  = numpy.trunc((points.y.values - geotransform[3]) / geotransform[5])
+    inside  = (pxList >= 0) & (pxList < ds.RasterXSize) & (pyList >= 0) & (pyList < ds.RasterYSize)
+
+    values  = numpy.full(len(pxList), numpy.nan)
+    indexes = numpy.nonzero(inside)[0]
+    pxList  = pxList[inside].astype(int)
+    pyList  = pyList[inside].astype(int)
+
+    band                = ds.GetRasterBand(1)
+    blockX, blockY      = band.GetBlockSize()
+    blockIds            = (pyList // blockY) * (ds.RasterXSize // blockX + 1) + pxList // blockX
+
+    order               = numpy.argsort(blockIds, kind = 'stable')
+    blockIds, starts    = numpy.unique(blockIds[order], return_index = True)
+
+    for group in numpy.split(order, starts[1:]):
+        if len(group) == 0: continue
+
+        xOff, yOff  = pxList[group].min(), pyList[group].min()
+        window      = band.ReadAsArray(int(xOff), int(yOff), int(pxList[group].max() - xOff + 1), int(pyList[group].max() - yOff + 1))
+
+        values[indexes[group]] = window[pyList[group] - yOff, pxList[group] - xOff]
+
+    ds = None
+
+    return values
+
+
 def mergeTsDataframes(dfList, startYear, endYear):
     """
     Merges a list of time series dataframes into a single dataframe with continuous dates.
@@ -226,31 +612,998 @@ def writeSWATPlusWeather(coordinates_, pointsDataFrame_, pointsDataFrameMin_, ex
     pointsDataFrameFiltered['year'] = pointsDataFrameFiltered['date'].dt.year
     pointsDataFrameFiltered['jday'] = pointsDataFrameFiltered['date'].dt.strftime('%j')
 
-    outFileName             = f"../model-data/{region_}/weather/swatplus/{scenario_}/{gcm_}/O{str(coordinates_.split(',')[0]).replace('.','').replace('-','M')}A{str(coordinates_.split(',')[1]).replace('.','').replace('-','M')}.{extType_}"
+    outFileName             = swatPlusWeatherFileName(coordinates_, extType_, scenario_, gcm_, region_)
     uniqueNumberofYears     = len(pointsDataFrameFiltered['date'].dt.year.unique())
-    climateHeader           = f"{getFileBaseName(outFileName, extension=True)}: {fullVarNames_[extType_]} climate data for CoSWAT-GM - code by Celray James CHAWANDA\n" + "nbyr     tstep       lat       lon      elev\n"
-    
-    latStr              = f"{lat_:.2f}"
-    lonStr              = f"{lon_:.2f}"
-    elevStr             = f"{elev_:.2f}"
-    
-    climateHeader += f"{str(uniqueNumberofYears).rjust(4)}         0{str(lonStr).rjust(10)}{str(latStr).rjust(10)}{str(elevStr).rjust(10)}\n"
+    climateHeader           = swatPlusWeatherHeader(outFileName, fullVarNames_[extType_], uniqueNumberofYears, lon_, lat_, elev_)
 
-    finalTs = ""
-    if extType_ == 'tem':
-        df = pointsDataFrameFiltered[['year', 'jday', currentVariables_[extType_], 'tasmin']]
-        finalTs = df.to_string(buf=None, columns=None, col_space=[4,6,10, 10], header=False, index=False, na_rep='-99', float_format='%.4f', formatters=None, sparsify=None, index_names=False, justify=None, max_rows=None, max_cols=None, show_dimensions=False, decimal='.', line_width=None, min_rows=None, max_colwidth=None, encoding=None)
-    else:
-        df = pointsDataFrameFiltered[['year', 'jday', currentVariables_[extType_]]]
-        finalTs = df.to_string(buf=None, columns=None, col_space=[4,6,10], header=False, index=False, na_rep='-99', float_format='%.4f', formatters=None, sparsify=None, index_names=False, justify=None, max_rows=None, max_cols=None, show_dimensions=False, decimal='.', line_width=None, min_rows=None, max_colwidth=None, encoding=None)
+    valueColumns = [pointsDataFrameFiltered[currentVariables_[extType_]].values]
+    if extType_ == 'tem': valueColumns.append(pointsDataFrameFiltered['tasmin'].values)
 
-    climateString = climateHeader + finalTs
+    finalTs = formatSWATPlusWeatherRows(pointsDataFrameFiltered['year'].values, pointsDataFrameFiltered['jday'].values, valueColumns)
 
     # print(f"\t\t- writing {extType_} data for point {coordinates_}...")
-    createPath(os.path.dirname(outFileName))
-    writeFile(outFileName, climateString, v = False)
-    
+    writeSWATPlusWeatherText(outFileName, climateHeader, finalTs)
 
     sys.stdout.write("\r\t> wrote {0}         \t".format(getFileBaseName(outFileName, extension=True)))
     sys.stdout.flush()
 
+
+def swatPlusWeatherFileName(coordinates_, extType_, scenario_, gcm_, region_):
+    '''
+    returns the path of the SWAT+ weather file for a "x,y,elev" coordinates string.
+    the name is built from the coordinate strings so it matches the .cli entries
+    '''
+    x_, y_ = coordinates_.split(',')[:2]
+    return f"../model-data/{region_}/weather/swatplus/{scenario_}/{gcm_}/O{x_.replace('.','').replace('-','M')}A{y_.replace('.','').replace('-','M')}.{extType_}"
+
+
+def swatPlusWeatherHeader(outFileName_, fullVarName_, nbyr_, lat_, lon_, elev_, tstep_ = 0):
+    '''
+    returns the three header lines of a SWAT+ weather file. tstep_ is 0 for daily
+    files and the number of time steps a day for sub-daily precipitation
+    '''
+    climateHeader  = f"{getFileBaseName(outFileName_, extension=True)}: {fullVarName_} climate data for CoSWAT-GM - code by Celray James CHAWANDA\n" + "nbyr     tstep       lat       lon      elev\n"
+    climateHeader += f"{str(nbyr_).rjust(4)}{str(tstep_).rjust(10)}{f'{lat_:.2f}'.rjust(10)}{f'{lon_:.2f}'.rjust(10)}{f'{elev_:.2f}'.rjust(10)}\n"
+    return climateHeader
+
+
+def formatSWATPlusWeatherColumn(column_):
+    '''
+    returns the values of a weather column and their printf conversion, NaN becomes -99
+    '''
+    column = numpy.asarray(column_, dtype = float)
+    nans   = numpy.isnan(column)
+
+    if not nans.any():
+        return column.tolist(), '.4f', max(len('%.4f' % column.max()), len('%.4f' % column.min())) if len(column) > 0 else 0
+
+    texts = numpy.where(nans, '-99', numpy.char.mod('%.4f', numpy.where(nans, 0, column)))
+    return texts.tolist(), 's', max(len(text) for text in texts)
+
+
+def formatSWATPlusWeatherRows(yearList_, jdayList_, valueColumns_):
+    '''
+    formats the daily rows of a SWAT+ weather file (year, jday, value[, value]) exactly like
+    DataFrame.to_string(col_space = [4, 6, 10(, 10)], float_format = '%.4f', na_rep = '-99')
+    did: every column is as wide as the larger of its col_space and its longest value,
+    columns are joined by one space and the last row has no newline.
+    the rows are formatted in one printf call instead of going through pandas
+    '''
+    years   = numpy.asarray(yearList_).tolist()
+    jdays   = [str(jday) for jday in jdayList_]
+    columns = [years, jdays]
+    formats = [f"%{max(4, max(len(str(year)) for year in years))}d", f"%{max(6, max(len(jday) for jday in jdays))}s"]
+
+    for column in valueColumns_:
+        values, conversion, width = formatSWATPlusWeatherColumn(column)
+        columns.append(values)
+        formats.append(f"%{max(10, width)}{conversion}")
+
+    # interleave the columns row by row for a single % over the whole file
+    cells = [None] * (len(years) * len(columns))
+    for index, column in enumerate(columns):
+        cells[index::len(columns)] = column
+
+    return ((" ".join(formats) + "\n") * len(years) % tuple(cells))[:-1]
+
+
+def writeSWATPlusWeatherText(outFileName_, climateHeader_, finalTs_):
+    '''
+    writes a weather file through one buffered handle.
+    returns the byte offset of the first data row and the size of the file
+    '''
+    createPath(os.path.dirname(outFileName_))
+    with open(outFileName_, 'w', buffering = 1 << 20) as outFile:
+        outFile.write(climateHeader_)
+        dataOffset = outFile.tell()
+        outFile.write(finalTs_)
+        return dataOffset, outFile.tell()
+
+
+def runPeriodCalendar(runPeriod_):
+    '''
+    returns the years and julian day strings of every day in the run period
+    '''
+    dateRange = pandas.date_range(start=pandas.Timestamp(f"{runPeriod_[0]}-01-01"), end=pandas.Timestamp(f"{runPeriod_[1]}-12-31"), freq='D')
+    return dateRange.year, dateRange.strftime('%j')
+
+
+def completeSWATPlusWeatherChannels(pointsSeries_, variableNames_, extType_, coordinates_, runPeriod_):
+    '''
+    returns the (channel, time, points) float array of the value columns of an extType
+    (tasmax and tasmin for tem) from a (variable, time, points) series, scaled with
+    varFactors and completed to the run period with -99 for missing days and values.
+    the channels are copied, scaled and completed in place in the one array they are
+    returned in, so a channel costs one float array of the run period and no more.
+    like the dataframe filter, a point only gets data if its nearest cell sits on its coordinates
+    '''
+    dateRange   = pandas.date_range(start=pandas.Timestamp(f"{runPeriod_[0]}-01-01"), end=pandas.Timestamp(f"{runPeriod_[1]}-12-31"), freq='D')
+    days        = dateRange.get_indexer(pandas.to_datetime(pointsSeries_['time'].values))
+    inPeriod    = days >= 0
+    days        = slice(days[inPeriod][0], days[inPeriod][-1] + 1) if inPeriod.all() and len(days) > 0 and (numpy.diff(days) == 1).all() else days[inPeriod]
+
+    xList = numpy.array([float(coordinates.split(',')[0]) for coordinates in coordinates_])
+    yList = numpy.array([float(coordinates.split(',')[1]) for coordinates in coordinates_])
+
+    values = numpy.full((len(variableNames_), len(dateRange), len(coordinates_)), numpy.nan)
+    for channel, varName in enumerate(variableNames_):
+        pointsData  = pointsSeries_.sel(variable = varName)
+        matched     = (pointsData['lon'].values == xList) & (pointsData['lat'].values == yList)
+
+        values[channel, days] = pointsData.values if isinstance(days, slice) else pointsData.values[inPeriod]
+        values[channel][:, ~matched] = numpy.nan
+
+        if extType_ == 'tem': values[channel] += varFactors[extType_]
+        else: values[channel] *= varFactors[extType_]
+
+    numpy.copyto(values, -99.0, where = numpy.isnan(values))
+    return values
+
+
+def writeSWATPlusWeatherColumns(valueArrays_, pointIndexes_, coordinates_, extType_, runPeriod_, scenario_, gcm_, region_, fullVarNames_, timeSteps_ = 0, v = True):
+    '''
+    writes the SWAT+ weather files of the given point indexes (columns of the arrays).
+    returns a record (file, name, lat, lon, elev, offset, size) for every file written
+
+    valueArrays_    : completed (channel, time, points) array, a channel per value column of the file
+    coordinates_    : "x,y,elev" strings of pointIndexes_, in the same order
+    timeSteps_      : 0 writes daily rows. more steps write every day as timeSteps_ equal
+                      parts of the daily value (sub-daily precipitation), -99 stays -99
+    '''
+    yearList, jdayList  = runPeriodCalendar(runPeriod_)
+    nbyr                = len(yearList.unique())
+    written             = []
+
+    for index, coordinates in zip(pointIndexes_, coordinates_):
+        x_, y_, elev_ = coordinates.split(',')
+        try: elev = float(elev_)
+        except ValueError:
+            print(f"\n\t! no elevation for {coordinates}, skipping")
+            continue
+
+        outFileName     = swatPlusWeatherFileName(coordinates, extType_, scenario_, gcm_, region_)
+        climateHeader   = swatPlusWeatherHeader(outFileName, fullVarNames_[extType_], nbyr, float(y_), float(x_), elev, timeSteps_)
+        valueColumns    = [values[:, index] for values in valueArrays_]
+        if timeSteps_ > 0:
+            valueColumns = [numpy.where(valueColumns[0] == -99.0, -99.0, valueColumns[0] / timeSteps_)] * timeSteps_
+
+        finalTs         = formatSWATPlusWeatherRows(yearList, jdayList, valueColumns)
+
+        dataOffset, size = writeSWATPlusWeatherText(outFileName, climateHeader, finalTs)
+        written.append({'file': getFileBaseName(outFileName, extension=True), 'name': getFileBaseName(outFileName, extension=False),
+            'lat': float(y_), 'lon': float(x_), 'elev': elev, 'offset': dataOffset, 'size': size})
+
+        if v:
+            sys.stdout.write("\r\t> wrote {0}         \t".format(getFileBaseName(outFileName, extension=True)))
+            sys.stdout.flush()
+
+    return written
+
+
+def sharePointsArray(values_, transport_, scratchDir_):
+    '''
+    puts an array where pool workers can attach to it by name.
+    transport_ is 'shared_memory' or 'memmap' (an .npy file in scratchDir_). 'shared_memory'
+    lives in /dev/shm, a copy larger than it kills the process with SIGBUS instead of raising
+    returns a picklable handle for attachPointsArray and the owner object for releasePointsArray
+    '''
+    if transport_ == 'shared_memory':
+        block   = shared_memory.SharedMemory(create=True, size=max(values_.nbytes, 1))
+        shared  = None
+        try:
+            shared  = numpy.ndarray(values_.shape, dtype=values_.dtype, buffer=block.buf)
+            shared[:] = values_
+        except BaseException:
+            # the block is not handed out yet, nobody else would unlink it. the view has to go first
+            shared = None
+            releasePointsArray(block)
+            raise
+        return {'transport': transport_, 'name': block.name, 'shape': values_.shape, 'dtype': values_.dtype.str}, block
+
+    if transport_ == 'memmap':
+        createPath(f"{scratchDir_}/")
+        fileName = f"{scratchDir_}/points-{os.getpid()}-{uuid.uuid4().hex}.npy"
+        numpy.save(fileName, values_)
+        return {'transport': transport_, 'name': fileName, 'shape': values_.shape, 'dtype': values_.dtype.str}, fileName
+
+    raise ValueError(f"unknown point data transport: {transport_}")
+
+
+def attachPointsArray(handle_):
+    '''
+    attaches to an array shared with sharePointsArray without copying it.
+    returns the array and the object to close when done (None for memmap)
+    '''
+    if handle_['transport'] == 'shared_memory':
+        block = shared_memory.SharedMemory(name=handle_['name'])
+        return numpy.ndarray(handle_['shape'], dtype=numpy.dtype(handle_['dtype']), buffer=block.buf), block
+
+    return numpy.load(handle_['name'], mmap_mode='r'), None
+
+
+def releasePointsArray(owner_):
+    '''
+    frees the shared memory block or scratch file created by sharePointsArray
+    '''
+    if isinstance(owner_, shared_memory.SharedMemory):
+        owner_.close()
+        owner_.unlink()
+    else:
+        try: os.remove(owner_)
+        except FileNotFoundError: pass
+
+
+def writeSWATPlusWeatherShared(handle_, pointIndexes_, coordinates_, extType_, runPeriod_, scenario_, gcm_, region_, fullVarNames_, timeSteps_ = 0):
+    '''
+    pool worker: attaches to the shared array and writes the files of its own points.
+    returns the records of writeSWATPlusWeatherColumns
+    '''
+    valueArrays, block = attachPointsArray(handle_)
+
+    try:
+        return writeSWATPlusWeatherColumns(valueArrays, pointIndexes_, coordinates_, extType_, runPeriod_, scenario_, gcm_, region_, fullVarNames_, timeSteps_)
+    finally:
+        # the array has to be dropped before the block can be closed
+        del valueArrays
+        if not block is None: block.close()
+
+
+def writeSWATPlusWeatherBatch(pointsSeries_, variableNames_, coordinates_, extType_, runPeriod_, scenario_, gcm_, region_, fullVarNames_, transport_ = None, processes_ = 1, scratchDir_ = './weather-ws/scratch', timeSteps_ = 0, v = True):
+    '''
+    writes the SWAT+ weather files for all points of a region from one (channel, time, points)
+    array. the variables are completed to the run period once, instead of filtering the long
+    dataframe again for every point as writeSWATPlusWeather does. output is the same.
+
+    pointsSeries_   : unscaled (variable, time, points) series from the nearest-neighbour .sel
+    variableNames_  : the variables of the value columns, [tasmax, tasmin] for tem
+    coordinates_    : "x,y,elev" strings in the order of the points dimension
+    transport_      : how a pool of processes_ writers gets the array. None sends every worker
+                      a copy of the columns of its points, 'shared_memory' or 'memmap' share
+                      the array once and the workers attach to it. processes_ 1 writes here
+    timeSteps_      : time steps a day of the files, 0 for daily (see writeSWATPlusWeatherColumns)
+    returns the records of the files written, in the order of the points
+    '''
+    valueArrays = completeSWATPlusWeatherChannels(pointsSeries_, variableNames_, extType_, coordinates_, runPeriod_)
+
+    if processes_ < 2:
+        return writeSWATPlusWeatherColumns(valueArrays, range(len(coordinates_)), coordinates_, extType_, runPeriod_, scenario_, gcm_, region_, fullVarNames_, timeSteps_, v = v)
+
+    pointGroups = [pointIndexes for pointIndexes in numpy.array_split(numpy.arange(len(coordinates_)), processes_) if len(pointIndexes) > 0]
+
+    if transport_ is None:
+        jobs = [[valueArrays[:, :, pointIndexes], range(len(pointIndexes)), [coordinates_[index] for index in pointIndexes], extType_, runPeriod_, scenario_, gcm_, region_, fullVarNames_, timeSteps_, False] for pointIndexes in pointGroups]
+        del valueArrays
+        with multiprocessing.Pool(processes=processes_) as pool:
+            return [record for records in pool.starmap(writeSWATPlusWeatherColumns, jobs) for record in records]
+
+    handle, owner = sharePointsArray(valueArrays, transport_, scratchDir_)
+    del valueArrays
+    try:
+        jobs = [[handle, pointIndexes.tolist(), [coordinates_[index] for index in pointIndexes], extType_, runPeriod_, scenario_, gcm_, region_, fullVarNames_, timeSteps_] for pointIndexes in pointGroups]
+
+        # leaving the with block terminates the workers, also when one of them raised
+        with multiprocessing.Pool(processes=processes_) as pool:
+            written = [record for records in pool.starmap(writeSWATPlusWeatherShared, jobs) for record in records]
+    finally:
+        releasePointsArray(owner)
+
+    return written
+
+
+def setWeatherVariableNames(fileNames_, varNames_, currentVariables_):
+    '''
+    sets, for every extType still missing in currentVariables_, the first of
+    its candidate variable names (varNames_) found in the file names
+    '''
+    for extType in varNames_:
+        for fname in fileNames_:
+            if extType in currentVariables_: break
+            for varName in varNames_[extType]:
+                if varName in getFileBaseName(fname):
+                    currentVariables_[extType] = varName
+                    break
+
+    return currentVariables_
+
+
+def groupWeatherFiles(fileNames_, currentVariables_):
+    '''
+    returns {variable name: sorted file names} for the variables in currentVariables_.
+    tem also gets its tasmin files. fileNames_ can also be a weatherFileCatalog
+    '''
+    catalog = fileNames_ if isinstance(fileNames_, pandas.DataFrame) else weatherFileCatalog(fileNames_)
+
+    groupedFiles = {}
+    for extType, varName in currentVariables_.items():
+        for name in [varName, 'tasmin'] if extType == 'tem' else [varName]:
+            # names the catalog could not parse are matched on the variable name as before
+            unparsed    = [fname for fname in catalog.loc[catalog['variable'].isna(), 'fileName'] if name in getFileBaseName(fname)]
+            files       = sorted(catalogFiles(catalog, variables_ = [name]) + unparsed)
+            if len(files) > 0: groupedFiles[name] = files
+
+    return groupedFiles
+
+
+def cropAndMergeWeather(groupedFiles_, regionBox_, dstDirCropped_, mergedPrefix_, processes_, threads_ = 1, retries_ = 0, timingFile_ = None):
+    '''
+    crops the files to regionBox_ (lon1, lon2, lat1, lat2) with cdo sellonlatbox and merges
+    the cropped files of each variable with cdo mergetime into {mergedPrefix_}{variable}.nc4.
+    the cdo jobs run with runCommandJobs, so a crop that fails after its retries stops
+    here with its cdo error. timingFile_ gets the timing table of the crop and merge jobs
+    returns {variable name: merged file}
+    '''
+    createPath(f"{dstDirCropped_}/")
+    createPath(f"{os.path.dirname(mergedPrefix_)}/")
+
+    jobsCrop = []
+    for varName in groupedFiles_:
+        for fname in groupedFiles_[varName]:
+            deleteFile(f"{dstDirCropped_}/{getFileBaseName(fname)}")
+            command = ['cdo', '-O', f"sellonlatbox,{','.join(regionBox_)}", fname, f"{dstDirCropped_}/{getFileBaseName(fname)}"]
+            jobsCrop.append({'name': f"crop {getFileBaseName(fname)}", 'command': command})
+
+    timings = [runCommandJobs(jobsCrop, processes_, threads_, retries_)]
+
+    jobsMerge = []
+    mergedFiles = {}
+    for varName in groupedFiles_:
+        mergedFiles[varName] = f"{mergedPrefix_}{varName}.nc4"
+        deleteFile(mergedFiles[varName])
+
+        croppedFiles = [f"{dstDirCropped_}/{getFileBaseName(fname)}" for fname in groupedFiles_[varName]]
+        command = ['cdo', '-O', 'mergetime'] + croppedFiles + [mergedFiles[varName]]
+        jobsMerge.append({'name': f"merge {getFileBaseName(mergedFiles[varName])}", 'command': command})
+
+    timings.append(runCommandJobs(jobsMerge, processes_, threads_, retries_))
+
+    if not timingFile_ is None:
+        createPath(f"{os.path.dirname(timingFile_)}/")
+        pandas.concat(timings, ignore_index = True).sort_values('seconds', ascending = False).to_csv(timingFile_, index = False)
+
+    return mergedFiles
+
+
+def openWeatherData(sources_, varName_, chunks_ = None):
+    '''
+    opens a variable from one netcdf file or lazily from a list of files along time.
+    chunks_ are the dask chunks ({'time': 366, 'lat': -1, 'lon': -1}), None opens a single
+    file without dask and a list of files with one chunk per file.
+    errors opening the files are raised with the variable they belong to
+    '''
+    try:
+        if isinstance(sources_, str): return xarray.open_dataset(sources_, chunks = chunks_)
+        return xarray.open_mfdataset(sources_, chunks = chunks_, combine='by_coords', data_vars='minimal', coords='minimal', compat='override', parallel=True)
+    except Exception as e:
+        raise RuntimeError(f"could not open {varName_} data from {sources_}: {e}") from e
+
+
+def writeSWATPlusWeatherFiles(pointsSeries_, coordinates_, currentVariables_, runPeriod_, scenario_, gcm_, region_, transport_ = None, processes_ = 1, scratchDir_ = './weather-ws/scratch', timeSteps_ = 0):
+    '''
+    writes the SWAT+ weather files and the .cli file of every extType from the
+    (variable, time, points) series of a region, and the station index next to
+    the output directory. the .cli files and the index are built from the files
+    the writers return, so the output directory is not listed again.
+    returns {extType: records of the files written}
+
+    currentVariables_   : {extType: variable name in the series}
+    timeSteps_          : time steps a day of the precipitation files, 0 for daily. SWAT+
+                          only reads sub-daily precipitation, the other files stay daily
+    '''
+    extractedVariables  = list(pointsSeries_['variable'].values)
+    outDir              = f"../model-data/{region_}/weather/swatplus/{scenario_}/{gcm_}"
+    writtenFiles        = {}
+
+    for extType in extTypes:
+        if not extType in currentVariables_:
+            print(f"  > no variable found for {extType}")
+            continue
+
+        if not currentVariables_[extType] in extractedVariables:
+            print(f"  > no {currentVariables_[extType]} data found for {region_}")
+            continue
+
+        if extType == "tem" and not "tasmin" in extractedVariables:
+            print(f"  > no tasmin data found for {region_}")
+            continue
+
+        # tasmax and tasmin go through as the two channels of one array
+        variableNames = [currentVariables_[extType], 'tasmin'] if extType == "tem" else [currentVariables_[extType]]
+
+        print(f"    - writing {fullVarNames[extType]} files")
+        writtenFiles[extType] = writeSWATPlusWeatherBatch(pointsSeries_, variableNames, coordinates_, extType, runPeriod_, scenario_, gcm_, region_, fullVarNames,
+            transport_ = transport_, processes_ = processes_, scratchDir_ = scratchDir_, timeSteps_ = timeSteps_ if extType == 'pcp' else 0)
+
+        cliString = f"""{extType}.cli: {fullVarNames[extType]} file names - file written by Celray James CHAWANDA\nfilename\n""" + \
+            "\n".join([record['file'] for record in writtenFiles[extType]]) + "\n"
+
+        writeFile(f"{outDir}/{extType}.cli", cliString)
+        print("\n\n")
+
+    if len(writtenFiles) > 0: writeStationIndex(writtenFiles, f"{outDir}-stations.csv")
+
+    return writtenFiles
+
+
+def writeStationIndex(writtenFiles_, indexFile_):
+    '''
+    writes one row per station (name, lat, lon, elev) with the data offset and size
+    in bytes of each of its weather files, from the records of writeSWATPlusWeatherFiles.
+    it sits next to the weather directory so it is not copied into the model with the files
+    '''
+    stations = {}
+    for extType, records in writtenFiles_.items():
+        for record in records:
+            station = stations.setdefault(record['name'], {'name': record['name'], 'lat': record['lat'], 'lon': record['lon'], 'elev': record['elev']})
+            station[f'{extType}_offset']    = record['offset']
+            station[f'{extType}_size']      = record['size']
+
+    stationIndex = pandas.DataFrame(list(stations.values()))
+    offsetColumns = [column for column in stationIndex.columns if column.endswith(('_offset', '_size'))]
+    stationIndex[offsetColumns] = stationIndex[offsetColumns].astype('Int64')
+
+    createPath(f"{os.path.dirname(indexFile_)}/")
+    stationIndex.to_csv(indexFile_, index = False)
+
+
+def writeWeatherStore(pointsSeries_, coordinates_, currentVariables_, storeFile_, timeChunk_ = 366, pointsChunk_ = 512):
+    '''
+    saves the extracted (variable, time, points) series of a region with its station
+    coordinates in a chunked, compressed netcdf. the SWAT+ files of any sub-period can
+    then be exported again without extracting (see exportSWATPlusWeather)
+    '''
+    xList, yList, elevations = [], [], []
+    for coordinates in coordinates_:
+        x_, y_, elev_ = coordinates.split(',')
+        xList.append(float(x_)); yList.append(float(y_))
+        elevations.append(numpy.nan if elev_ == 'None' else float(elev_))
+
+    store = xarray.Dataset({
+        'series'    : pointsSeries_,
+        'x'         : ('points', numpy.array(xList, dtype = float)),
+        'y'         : ('points', numpy.array(yList, dtype = float)),
+        'elevation' : ('points', numpy.array(elevations, dtype = float)),
+    })
+    store.attrs.update({f'ext_{extType}': varName for extType, varName in currentVariables_.items()})
+
+    chunkSizes  = (1, max(1, min(timeChunk_, pointsSeries_.sizes['time'])), max(1, min(pointsChunk_, pointsSeries_.sizes['points'])))
+    encoding    = {'series': {'zlib': True, 'complevel': 4, 'shuffle': True, 'chunksizes': chunkSizes}}
+
+    # written next to the store first so an interrupted run does not leave a broken store
+    createPath(os.path.dirname(storeFile_))
+    store.to_netcdf(f"{storeFile_}.tmp", encoding = encoding, format = 'NETCDF4')
+    os.replace(f"{storeFile_}.tmp", storeFile_)
+
+
+def readWeatherStore(storeFile_, runPeriod_ = None):
+    '''
+    reads a store written by writeWeatherStore, only the days of runPeriod_ if given.
+    returns the (variable, time, points) series, the "x,y,elev" coordinate strings
+    and the {extType: variable name} of the store
+    '''
+    with xarray.open_dataset(storeFile_) as store:
+        pointsSeries = store['series']
+        if not runPeriod_ is None:
+            pointsSeries = pointsSeries.sel(time = slice(f"{runPeriod_[0]}-01-01", f"{runPeriod_[1]}-12-31"))
+
+        pointsSeries        = pointsSeries.load()
+        coordinates         = [f"{float(x)},{float(y)},{None if numpy.isnan(elev) else float(elev)}" for x, y, elev in zip(store['x'].values, store['y'].values, store['elevation'].values)]
+        currentVariables    = {key[4:]: value for key, value in store.attrs.items() if key.startswith('ext_')}
+
+    return pointsSeries, coordinates, currentVariables
+
+
+def storedWeatherPeriod(storeFile_):
+    '''
+    returns the [first year, last year] of the series in a store written by writeWeatherStore
+    '''
+    with xarray.open_dataset(storeFile_) as store:
+        times = pandas.to_datetime(store['time'].values)
+
+    return [int(times.min().year), int(times.max().year)]
+
+
+def weatherExportName(gcm_, stationResolution_ = None, timeSteps_ = 0):
+    '''
+    returns the name of the directory an export is written to in place of the gcm,
+    so aggregated or sub-daily exports do not replace the files of the extraction
+    '''
+    exportName = gcm_
+    if not stationResolution_ is None: exportName += f"_{float(stationResolution_):g}deg"
+    if timeSteps_ > 0: exportName += f"_{int(timeSteps_)}steps"
+    return exportName
+
+
+def aggregateWeatherSeries(pointsSeries_, coordinates_, stationResolution_):
+    '''
+    returns the (variable, time, points) series and "x,y,elev" coordinates of stations at the
+    centres of a grid of stationResolution_ degrees (aligned at -180, -90). each station is
+    the block mean of the points in its cell, leaving out missing values and the points the
+    writer would not give data (nearest cell not on their coordinates). the elevation is
+    the mean of the point elevations, None when no point has one. coordinates and
+    elevations are rounded to 2 decimals like swatPlusWeatherHeader
+    '''
+    xList       = numpy.array([float(coordinates.split(',')[0]) for coordinates in coordinates_])
+    yList       = numpy.array([float(coordinates.split(',')[1]) for coordinates in coordinates_])
+    elevations  = numpy.array([numpy.nan if coordinates.split(',')[2] == 'None' else float(coordinates.split(',')[2]) for coordinates in coordinates_])
+
+    cells       = numpy.stack([numpy.floor((xList + 180) / stationResolution_), numpy.floor((yList + 90) / stationResolution_)], axis = 1)
+    cells, blockIndexes = numpy.unique(cells, axis = 0, return_inverse = True)
+    blockIndexes = blockIndexes.ravel()
+
+    # the points are sorted by block so each block is summed with one reduceat
+    order       = numpy.argsort(blockIndexes, kind = 'stable')
+    starts      = numpy.concatenate([[0], numpy.flatnonzero(numpy.diff(blockIndexes[order])) + 1])
+
+    def blockMean(values_):
+        valid   = ~numpy.isnan(values_)
+        sums    = numpy.add.reduceat(numpy.where(valid, values_, 0)[..., order], starts, axis = -1)
+        counts  = numpy.add.reduceat(valid[..., order].astype(int), starts, axis = -1)
+        with numpy.errstate(invalid = 'ignore', divide = 'ignore'):
+            return numpy.where(counts > 0, sums / numpy.maximum(counts, 1), numpy.nan)
+
+    aggregated = numpy.empty((pointsSeries_.sizes['variable'], pointsSeries_.sizes['time'], len(cells)))
+    for index, varName in enumerate(pointsSeries_['variable'].values):
+        pointsData  = pointsSeries_.sel(variable = varName)
+        matched     = (pointsData['lon'].values == xList) & (pointsData['lat'].values == yList)
+        values      = pointsData.values.astype(float)
+        values[:, ~matched] = numpy.nan
+        aggregated[index] = blockMean(values)
+
+    # rounded like the header of the weather files, so the station index matches the files
+    stationX    = numpy.round((cells[:, 0] + 0.5) * stationResolution_ - 180, 2)
+    stationY    = numpy.round((cells[:, 1] + 0.5) * stationResolution_ - 90, 2)
+    stationElev = numpy.round(blockMean(elevations), 2)
+
+    coordinates = [f"{float(x)},{float(y)},{None if numpy.isnan(elev) else float(elev)}" for x, y, elev in zip(stationX, stationY, stationElev)]
+    variableCount = pointsSeries_.sizes['variable']
+    stations    = xarray.DataArray(aggregated, dims = ('variable', 'time', 'points'), coords = {
+        'variable'  : pointsSeries_['variable'].values,
+        'time'      : pointsSeries_['time'].values,
+        'lon'       : (('variable', 'points'), numpy.tile(stationX, (variableCount, 1))),
+        'lat'       : (('variable', 'points'), numpy.tile(stationY, (variableCount, 1))),
+    })
+
+    return stations, coordinates
+
+
+def exportSWATPlusWeather(storeFile_, runPeriod_, scenario_, gcm_, region_, transport_ = None, processes_ = 1, scratchDir_ = './weather-ws/scratch', biasCorrection_ = None, stationResolution_ = None, timeSteps_ = 0):
+    '''
+    writes the SWAT+ weather files of runPeriod_ from a store written by writeWeatherStore.
+    biasCorrection_ is (observed store, reference store, tables file, quantiles) to
+    quantile map the series with biasCorrectWeatherSeries first.
+    stationResolution_ writes block means on a coarser station grid (aggregateWeatherSeries)
+    and timeSteps_ sub-daily precipitation. those exports go to the weatherExportName
+    directory instead of the gcm directory.
+    returns the records of the files written (see writeSWATPlusWeatherFiles).
+    raises ValueError when runPeriod_ is not inside the stored period, its missing years
+    would be written as -99
+    '''
+    storedPeriod = storedWeatherPeriod(storeFile_)
+    if int(runPeriod_[0]) < storedPeriod[0] or int(runPeriod_[1]) > storedPeriod[1]:
+        raise ValueError(f"{runPeriod_[0]}-{runPeriod_[1]} is not inside the period {storedPeriod[0]}-{storedPeriod[1]} stored in {storeFile_}")
+
+    pointsSeries, coordinates, currentVariables = readWeatherStore(storeFile_, runPeriod_)
+    if not biasCorrection_ is None:
+        pointsSeries = biasCorrectWeatherSeries(pointsSeries, coordinates, currentVariables, *biasCorrection_)
+    if not stationResolution_ is None:
+        pointsSeries, coordinates = aggregateWeatherSeries(pointsSeries, coordinates, stationResolution_)
+
+    return writeSWATPlusWeatherFiles(pointsSeries, coordinates, currentVariables, runPeriod_, scenario_, weatherExportName(gcm_, stationResolution_, timeSteps_), region_,
+        transport_ = transport_, processes_ = processes_, scratchDir_ = scratchDir_, timeSteps_ = timeSteps_)
+
+
+def filterWeatherFiles(groupedFiles_, runPeriod_):
+    '''
+    returns the grouped files whose years overlap the period, dropping variables without files
+    '''
+    filteredFiles = {varName: catalogFiles(weatherFileCatalog(files), runPeriod_) for varName, files in groupedFiles_.items()}
+
+    return {varName: files for varName, files in filteredFiles.items() if len(files) > 0}
+
+
+def weatherSourcesSignature(groupedFiles_, runPeriod_):
+    '''
+    returns a signature of the names and sizes of the source files used for a period
+    '''
+    md5 = hashlib.md5()
+    for varName, files in sorted(filterWeatherFiles(groupedFiles_, runPeriod_).items()):
+        for fname in sorted(files):
+            md5.update(f"{varName},{getFileBaseName(fname)},{os.path.getsize(fname)}\n".encode())
+
+    return md5.hexdigest()
+
+
+def weatherManifestInputs(coordinates_, cutline_, weatherResolution_, biasCorrection_ = None):
+    '''
+    returns the inputs other than the source files that the series of a region depend on.
+    biasCorrection_ is the (observed store, reference store, tables file, quantiles) the
+    weather files are corrected with, if any
+    '''
+    return {
+        'points'                : hashlib.md5("\n".join(coordinates_).encode()).hexdigest(),
+        'cutline'               : contentSignature(cutline_),
+        'weather_resolution'    : weatherResolution_,
+        'bias_correction'       : None if biasCorrection_ is None else f"{biasCorrection_[3]}:{files_signature(biasCorrection_[:2])}",
+    }
+
+
+def readWeatherManifest(manifestFile_):
+    if not os.path.exists(manifestFile_): return None
+    with open(manifestFile_) as f: return json.load(f)
+
+
+def writeWeatherManifest(manifestFile_, inputs_, groupedFiles_, storedPeriod_, exportedPeriod_, stored_ = True):
+    '''
+    records what a region's weather series and files were made from: the inputs, the
+    signature of the source files of the stored period, and the stored and exported periods.
+    stored_ is False when the series were not kept in a store
+    '''
+    manifest = dict(inputs_)
+    manifest['sources']     = weatherSourcesSignature(groupedFiles_, storedPeriod_)
+    manifest['run_period']  = f"{storedPeriod_[0]}-{storedPeriod_[1]}"
+    manifest['stored']      = stored_
+    manifest['exported']    = f"{exportedPeriod_[0]}-{exportedPeriod_[1]}"
+
+    createPath(os.path.dirname(manifestFile_))
+    with open(f"{manifestFile_}.tmp", 'w') as f: json.dump(manifest, f, indent = 4)
+    os.replace(f"{manifestFile_}.tmp", manifestFile_)
+
+
+def weatherFilesExist(outDir_):
+    '''
+    checks if the weather files of a region, scenario and gcm are all still there: the
+    station index next to outDir_, the .cli file of every extType in it and the station
+    files it lists. the files are looked up by name, the directory is not listed
+    '''
+    indexFile = f"{outDir_}-stations.csv"
+    if not os.path.exists(indexFile): return False
+
+    stationIndex = pandas.read_csv(indexFile)
+    extTypes = [column[:-len('_offset')] for column in stationIndex.columns if column.endswith('_offset')]
+    if len(extTypes) == 0: return False
+
+    for extType in extTypes:
+        if not os.path.exists(f"{outDir_}/{extType}.cli"): return False
+        stationNames = stationIndex.loc[stationIndex[f'{extType}_offset'].notna(), 'name']
+        if not all(os.path.exists(f"{outDir_}/{name}.{extType}") for name in stationNames): return False
+
+    return True
+
+
+def planWeatherUpdate(manifestFile_, storeFile_, inputs_, groupedFiles_, runPeriod_, outDir_ = None):
+    '''
+    decides what has to be redone for a region, scenario and gcm. returns (action, period):
+        'skip'      the weather files of runPeriod_ are up to date and still in outDir_
+        'export'    the store covers runPeriod_, only the weather files are written again,
+                    period is the stored period
+        'append'    the store is valid but runPeriod_ extends it on one side, period is
+                    the years to extract and add to the store
+        'extract'   everything is extracted again for period (runPeriod_)
+    '''
+    runPeriod   = [int(runPeriod_[0]), int(runPeriod_[1])]
+    manifest    = readWeatherManifest(manifestFile_)
+
+    if manifest is None or any(manifest.get(key) != value for key, value in inputs_.items()):
+        return 'extract', runPeriod
+
+    storedPeriod = [int(yr) for yr in manifest['run_period'].split('-')]
+    if manifest['sources'] != weatherSourcesSignature(groupedFiles_, storedPeriod):
+        return 'extract', runPeriod
+
+    # weather files that were deleted are written again, from the store when it covers the period
+    if manifest['exported'] == f"{runPeriod[0]}-{runPeriod[1]}" and (outDir_ is None or weatherFilesExist(outDir_)):
+        return 'skip', runPeriod
+
+    if not manifest['stored'] or not os.path.exists(storeFile_):
+        return 'extract', runPeriod
+
+    if storedPeriod[0] <= runPeriod[0] and runPeriod[1] <= storedPeriod[1]:
+        return 'export', storedPeriod
+
+    if runPeriod[0] == storedPeriod[0] and runPeriod[1] > storedPeriod[1]:
+        return 'append', [storedPeriod[1] + 1, runPeriod[1]]
+
+    if runPeriod[1] == storedPeriod[1] and runPeriod[0] < storedPeriod[0]:
+        return 'append', [runPeriod[0], storedPeriod[0] - 1]
+
+    return 'extract', runPeriod
+
+
+def appendWeatherSeries(storedSeries_, newSeries_):
+    '''
+    joins the series of new years to the stored series along time.
+    returns None when the two do not hold the same variables
+    '''
+    if list(storedSeries_['variable'].values) != list(newSeries_['variable'].values): return None
+
+    return xarray.concat([storedSeries_, newSeries_], dim = 'time', coords = 'minimal', compat = 'override').sortby('time')
+
+
+def weatherBiasCorrection(region_, scenario_, gcm_, observedGcm_, quantiles_ = 100):
+    '''
+    returns the (observed store, reference store, tables file, quantiles) that a region's
+    series of a gcm scenario are corrected with, None for the observed series
+    '''
+    if scenario_ == 'observed': return None
+
+    seriesDir = f"../model-data/{region_}/weather/series"
+    return (f"{seriesDir}/observed_{observedGcm_}.nc", f"{seriesDir}/historical_{gcm_}.nc", f"{seriesDir}/bias-{gcm_}.npz", quantiles_)
+
+
+def quantileMappingTables(observed_, observedTime_, modelled_, modelledTime_, quantiles_ = 100):
+    '''
+    returns the (month, quantile, point) quantiles of the modelled and the observed
+    (time, point) series over their reference periods, for every month of the year
+    '''
+    levels          = numpy.linspace(0, 1, quantiles_)
+    tables          = []
+
+    for series, time in [(modelled_, modelledTime_), (observed_, observedTime_)]:
+        months      = pandas.DatetimeIndex(time).month
+        quantiles   = numpy.full((12, quantiles_, series.shape[1]), numpy.nan)
+        for month in range(1, 13):
+            if not (months == month).any(): continue
+            with warnings.catch_warnings():
+                # points without data have NaN quantiles and are left as they are
+                warnings.simplefilter('ignore', RuntimeWarning)
+                quantiles[month - 1] = numpy.nanquantile(series[months == month].astype(float), levels, axis = 0)
+        tables.append(quantiles)
+
+    return tables[0], tables[1]
+
+
+def applyQuantileMapping(values_, time_, tables_, lowerBound_ = None, pointsChunk_ = 256):
+    '''
+    maps the (time, point) values_ through the quantileMappingTables of their month: a value
+    takes the observed value at its quantile in the modelled distribution, interpolated
+    linearly. values beyond the modelled range keep their distance to the nearest quantile.
+    points are done pointsChunk_ at a time to bound the memory of the comparison
+    '''
+    modelQuantiles, observedQuantiles = tables_
+    months      = pandas.DatetimeIndex(time_).month
+    corrected   = numpy.array(values_, dtype = float)
+    nQuantiles  = modelQuantiles.shape[1]
+
+    for month in range(1, 13):
+        rows = numpy.nonzero(months == month)[0]
+        if len(rows) == 0: continue
+
+        for pointsFrom in range(0, corrected.shape[1], pointsChunk_):
+            points  = slice(pointsFrom, pointsFrom + pointsChunk_)
+            x       = corrected[rows, points]
+            qm      = modelQuantiles[month - 1][:, points]
+            qo      = observedQuantiles[month - 1][:, points]
+            columns = numpy.arange(x.shape[1])[None, :]
+
+            # the modelled quantiles below or at each value give its interpolation segment
+            upper   = numpy.clip((x[:, None, :] >= qm[None, :, :]).sum(axis = 1), 1, nQuantiles - 1)
+            mLow    = qm[upper - 1, columns]
+            span    = qm[upper, columns] - mLow
+            weight  = numpy.divide(x - mLow, span, out = numpy.zeros_like(x), where = span > 0)
+
+            mapped  = qo[upper - 1, columns] + weight * (qo[upper, columns] - qo[upper - 1, columns])
+            mapped  = numpy.where(x < qm[0], qo[0] + x - qm[0], mapped)
+            mapped  = numpy.where(x > qm[-1], qo[-1] + x - qm[-1], mapped)
+            mapped  = numpy.where(numpy.isnan(qm).any(axis = 0) | numpy.isnan(qo).any(axis = 0), x, mapped)
+            mapped[numpy.isnan(x)] = numpy.nan
+
+            if not lowerBound_ is None: mapped = numpy.maximum(mapped, lowerBound_)
+            corrected[rows, points] = mapped
+
+    return corrected.astype(numpy.asarray(values_).dtype)
+
+
+def biasCorrectWeatherSeries(pointsSeries_, coordinates_, currentVariables_, observedStore_, referenceStore_, tablesFile_ = None, quantiles_ = 100, pointsChunk_ = 256):
+    '''
+    quantile maps a (variable, time, points) series of a gcm per point and month to the
+    observed series, with the gcm's historical series as reference. both are read from
+    their stores over the years they share, for the same points. the tables are kept in
+    tablesFile_ while both stores are unchanged, so the scenarios of a gcm reuse them.
+    temperatures may go below zero, the other variables are kept at or above it
+    '''
+    pairs = [(extType, name) for extType, varName in currentVariables_.items() for name in ([varName, 'tasmin'] if extType == 'tem' else [varName])]
+    pairs = [(extType, name) for extType, name in pairs if name in pointsSeries_['variable'].values]
+
+    signature   = f"{quantiles_}:{files_signature([observedStore_, referenceStore_])}"
+    tables      = None
+
+    if not tablesFile_ is None and os.path.exists(tablesFile_):
+        with numpy.load(tablesFile_) as cache:
+            if str(cache['signature']) == signature:
+                tables = {name: (cache[f"{name}_model"], cache[f"{name}_observed"]) for _, name in pairs if f"{name}_model" in cache}
+
+    if tables is None:
+        for store in [observedStore_, referenceStore_]:
+            if not os.path.exists(store): raise FileNotFoundError(f"bias correction needs the series store {store}, prepare it with weather_store = True")
+
+        observed, observedCoordinates, observedVariables    = readWeatherStore(observedStore_)
+        reference, referenceCoordinates, _                  = readWeatherStore(referenceStore_)
+
+        if observedCoordinates != list(coordinates_) or referenceCoordinates != list(coordinates_):
+            raise ValueError(f"the points of {observedStore_} or {referenceStore_} differ from the series to correct")
+
+        years = sorted(set(observed['time'].dt.year.values) & set(reference['time'].dt.year.values))
+        if len(years) == 0: raise ValueError(f"{observedStore_} and {referenceStore_} share no years to compare")
+
+        period      = slice(f"{years[0]}-01-01", f"{years[-1]}-12-31")
+        observed    = observed.sel(time = period)
+        reference   = reference.sel(time = period)
+
+        tables = {}
+        for extType, name in pairs:
+            observedName = 'tasmin' if name == 'tasmin' else observedVariables.get(extType)
+            if not observedName in observed['variable'].values or not name in reference['variable'].values:
+                print(f"\t! no observed or reference {name} to correct with, it is written as it is")
+                continue
+
+            tables[name] = quantileMappingTables(
+                observed.sel(variable = observedName).values, observed['time'].values,
+                reference.sel(variable = name).values, reference['time'].values, quantiles_)
+
+        if not tablesFile_ is None:
+            createPath(os.path.dirname(tablesFile_))
+            partFile = f"{tablesFile_[:-4]}-{uuid.uuid4().hex}.npz"
+            numpy.savez(partFile, signature = signature, **{f"{name}_{kind}": table for name, (model, obs) in tables.items() for kind, table in [('model', model), ('observed', obs)]})
+            os.replace(partFile, tablesFile_)
+
+    corrected = pointsSeries_.copy()
+    for extType, name in pairs:
+        if not name in tables: continue
+        index = list(pointsSeries_['variable'].values).index(name)
+        corrected.values[index] = applyQuantileMapping(pointsSeries_.values[index], pointsSeries_['time'].values, tables[name],
+            lowerBound_ = None if extType == 'tem' else 0, pointsChunk_ = pointsChunk_)
+
+    return corrected
+
+
+def nearestCellIndexes(gridValues_, pointValues_):
+    '''
+    returns the index of the nearest grid coordinate for every point value,
+    the same cell xarray picks with .sel(method="nearest")
+    '''
+    return pandas.Index(gridValues_).get_indexer(pointValues_, method='nearest')
+
+
+def cachedCellIndexes(gridLon_, gridLat_, lonList_, latList_, cachePrefix_ = None):
+    '''
+    returns the nearest (lat, lon) cell indexes of the points on a grid.
+    with cachePrefix_, they are kept in {cachePrefix_}-cells-{grid signature}.npz
+    and reused while the grid and the points are the same
+    '''
+    if cachePrefix_ is None:
+        return nearestCellIndexes(gridLat_, latList_), nearestCellIndexes(gridLon_, lonList_)
+
+    cacheFile       = f"{cachePrefix_}-cells-{arraySignature(gridLon_, gridLat_)[:16]}.npz"
+    pointsSignature = arraySignature(numpy.asarray(lonList_, dtype = float), numpy.asarray(latList_, dtype = float))
+
+    if os.path.exists(cacheFile):
+        with numpy.load(cacheFile) as cache:
+            if str(cache['points']) == pointsSignature: return cache['latIndexes'], cache['lonIndexes']
+
+    latIndexes, lonIndexes = nearestCellIndexes(gridLat_, latList_), nearestCellIndexes(gridLon_, lonList_)
+
+    # written aside and moved in place, runs in parallel may share the cache
+    createPath(os.path.dirname(cacheFile))
+    partFile = f"{cacheFile[:-4]}-{uuid.uuid4().hex}.npz"
+    numpy.savez(partFile, points = pointsSignature, latIndexes = latIndexes, lonIndexes = lonIndexes)
+    os.replace(partFile, cacheFile)
+
+    return latIndexes, lonIndexes
+
+
+def weatherChunks(timeChunk_, spaceChunk_ = None):
+    '''
+    returns the dask chunks for reading all points across a time window: timeChunk_ days and
+    spaceChunk_ cells along lat and lon, or the whole grid row when spaceChunk_ is None
+    '''
+    return {'time': timeChunk_, 'lat': -1 if spaceChunk_ is None else spaceChunk_, 'lon': -1 if spaceChunk_ is None else spaceChunk_}
+
+
+def extractPointsSeries(variableFiles_, lonList_, latList_, runPeriod_, timeChunk_ = 366, indexCache_ = None, chunks_ = None, scheduler_ = None, workers_ = None, memoryLimit_ = None, v = True):
+    '''
+    extracts the daily series of several variables at all points in one pass over time chunks.
+    the nearest cells are looked up once per grid and read with integer indexing from
+    the bounding window of the points, instead of a .sel and a long dataframe per variable.
+
+    variableFiles_  : {variable name: netcdf file, or list of files opened lazily along time}
+                      only the bounding window of the points and the days of the run period are read
+    indexCache_     : path prefix to keep the nearest cell indexes between runs (see cachedCellIndexes)
+    chunks_         : dask chunks to open the files with (see weatherChunks), None as openWeatherData
+    scheduler_      : dask scheduler ('threads', 'processes' or 'synchronous') and workers_ used to
+                      read the windows of dask-backed files, None uses the dask default
+    memoryLimit_    : bytes (or '16GB') the result and one window may take, the time window is
+                      shrunk to fit and a result that can not fit raises a MemoryError
+    returns a DataArray (variable, time, points) in the source dtype on the daily run period
+    calendar, NaN where a file has no data, with the lon/lat of the selected cells per variable
+    '''
+    dateRange   = pandas.date_range(start=pandas.Timestamp(f"{runPeriod_[0]}-01-01"), end=pandas.Timestamp(f"{runPeriod_[1]}-12-31"), freq='D')
+    datasets    = {varName: openWeatherData(sources, varName, chunks_) for varName, sources in variableFiles_.items()}
+    computeArgs = {} if scheduler_ is None else {'scheduler': scheduler_, 'num_workers': workers_}
+
+    # dask would start a new process pool for every window
+    if scheduler_ == 'processes':
+        from concurrent.futures import ProcessPoolExecutor
+        computeArgs['pool'] = ProcessPoolExecutor(max_workers = workers_)
+
+    try:
+        cellIndexes = {}
+        plans       = {}
+        for varName, dataset in datasets.items():
+            gridLon     = dataset['lon'].values
+            gridLat     = dataset['lat'].values
+
+            signature   = (gridLon.tobytes(), gridLat.tobytes())
+            if not signature in cellIndexes:
+                cellIndexes[signature] = cachedCellIndexes(gridLon, gridLat, lonList_, latList_, indexCache_)
+
+            latIndexes, lonIndexes = cellIndexes[signature]
+            positions = dateRange.get_indexer(pandas.to_datetime(dataset['time'].values))
+
+            plans[varName] = {
+                'data'      : dataset[varName],
+                'latIndexes': latIndexes,
+                'lonIndexes': lonIndexes,
+                'positions' : positions,
+                'lon'       : gridLon[lonIndexes],
+                'lat'       : gridLat[latIndexes],
+            }
+
+        dtype   = numpy.result_type(*[plan['data'].dtype for plan in plans.values()], numpy.float32)
+
+        # the largest window of a day, one variable's window is held at a time
+        dayBytes    = max([(plan['latIndexes'].max() - plan['latIndexes'].min() + 1) * (plan['lonIndexes'].max() - plan['lonIndexes'].min() + 1) * plan['data'].dtype.itemsize
+                           for plan in plans.values() if len(plan['latIndexes']) > 0] + [1])
+        resultBytes = len(plans) * len(dateRange) * len(lonList_) * numpy.dtype(dtype).itemsize
+        timeChunk   = timeChunk_
+
+        memoryLimit = memory_size(memoryLimit_)
+        if not memoryLimit is None:
+            if resultBytes + dayBytes > memoryLimit:
+                raise MemoryError(f"the series of {len(lonList_)} points take {resultBytes / 1024**2:.0f} MB, more than the {memoryLimit / 1024**2:.0f} MB memory limit")
+            timeChunk = max(1, min(timeChunk_, (memoryLimit - resultBytes) // dayBytes))
+            if v and timeChunk < timeChunk_: print(f"\t> reading {timeChunk} days at a time to stay under {memoryLimit / 1024**2:.0f} MB")
+
+        values      = numpy.full((len(plans), len(dateRange), len(lonList_)), numpy.nan, dtype = dtype)
+        readBytes   = 0
+        startTime   = datetime.now()
+
+        for chunkStart in range(0, len(dateRange), timeChunk):
+            chunkEnd = min(chunkStart + timeChunk, len(dateRange))
+            if v: print(f"\r\t> extracting {', '.join(plans)} for {dateRange[chunkStart].year} - {dateRange[chunkEnd - 1].year}   ", end = "")
+
+            for varIndex, plan in enumerate(plans.values()):
+                inChunk = (plan['positions'] >= chunkStart) & (plan['positions'] < chunkEnd)
+                if not inChunk.any(): continue
+
+                sourceIndexes   = numpy.nonzero(inChunk)[0]
+                timeFrom        = sourceIndexes.min()
+                latFrom         = plan['latIndexes'].min()
+                lonFrom         = plan['lonIndexes'].min()
+
+                window = plan['data'].isel(
+                    time = slice(timeFrom, sourceIndexes.max() + 1),
+                    lat  = slice(latFrom, plan['latIndexes'].max() + 1),
+                    lon  = slice(lonFrom, plan['lonIndexes'].max() + 1),
+                ).transpose('time', 'lat', 'lon').compute(**computeArgs).values
+
+                readBytes += window.nbytes
+                values[varIndex, plan['positions'][sourceIndexes], :] = window[(sourceIndexes - timeFrom)[:, None], (plan['latIndexes'] - latFrom)[None, :], (plan['lonIndexes'] - lonFrom)[None, :]]
+
+        if v:
+            seconds = max((datetime.now() - startTime).total_seconds(), 1e-9)
+            print(f"\n\t> read {readBytes / 1024**2:.1f} MB in {seconds:.1f} s ({readBytes / 1024**2 / seconds:.1f} MB/s, {values.size / seconds:.0f} point values/s)")
+
+    finally:
+        for dataset in datasets.values(): dataset.close()
+        if 'pool' in computeArgs: computeArgs['pool'].shutdown()
+
+    return xarray.DataArray(
+        values,
+        dims    = ('variable', 'time', 'points'),
+        coords  = {
+            'variable'  : list(plans),
+            'time'      : dateRange,
+            'lon'       : (('variable', 'points'), numpy.array([plan['lon'] for plan in plans.values()]).reshape(len(plans), len(lonList_))),
+            'lat'       : (('variable', 'points'), numpy.array([plan['lat'] for plan in plans.values()]).reshape(len(plans), len(latList_))),
+        }
+    )
@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+
+'''
+this script regenerates the SWAT+ weather files of regions from the series
+stores written by prepare-weather.py (weather_store = True), for any period
+inside the stored one (other periods are skipped), without downloading or extracting again.
+--res also writes the stations of coarser grids (block means of the points) and
+--steps sub-daily precipitation, each into its own directory next to the gcm one,
+with the time it took to write the stations. the stores only hold daily values, so
+the sub-daily files split each daily precipitation into equal time steps.
+
+usage: export-weather.py region [region ...] [--y 1981-1983] [--s scenario] [--g gcm] [--res 1 2] [--steps 24]
+'''
+
+import os, argparse
+from datetime import datetime
+from ccfx import exists, listFolders
+import datavariables as variables
+from instrumentation import instrument_script, span
+from coswatFX import exportSWATPlusWeather, weatherBiasCorrection, weatherExportName, storedWeatherPeriod
+
+weatherDir = './weather-ws'
+
+# change working directory
+me = os.path.realpath(__file__)
+os.chdir(os.path.dirname(me))
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description="a script to export SWAT+ weather files from the stored weather series")
+
+    parser.add_argument("r", help="the regions to export. If not specified, all regions will be processed.", nargs='*', default=[])
+    parser.add_argument("--y", help="the years to export, e.g. 1981-1983. If not specified, the datavariables value will be used.", nargs='?', default=None)
+    parser.add_argument("--s", help="the scenario to export. If not specified, all available scenarios will be exported.", nargs='?', default=None)
+    parser.add_argument("--g", help="the gcm to export. If not specified, all gcms of the scenarios will be exported.", nargs='?', default=None)
+    parser.add_argument("--res", help="station grid resolutions in degrees to aggregate the points to, e.g. 1 2. If not specified, the points are exported.", nargs='*', type=float, default=[])
+    parser.add_argument("--steps", help="time steps a day of the precipitation files, each step gets an equal part of the daily precipitation (the stores hold no sub-daily data). If not specified, they are daily.", nargs='?', type=int, default=0)
+
+    args = parser.parse_args()
+
+    with instrument_script():
+
+        regions     = args.r if len(args.r) > 0 else listFolders('./resources/regions/')
+        scenarios   = [args.s] if args.s else variables.available_scenarios
+        resolutions = args.res if len(args.res) > 0 else [None]
+
+        print('\n# exporting weather files from stored series\n')
+
+        for scenario in scenarios:
+            if args.y: period = args.y
+            elif scenario == 'observed': period = variables.run_period
+            elif scenario == 'historical': period = variables.historical_period
+            else: period = variables.future_period
+
+            runPeriod   = [int(yr) for yr in period.split('-')]
+            gcms        = [args.g] if args.g else list(variables.weather_pr_links_list.get(scenario, {}))
+
+            for gcm in gcms:
+                for region in regions:
+                    with span('export-weather', region, scenario = scenario, gcm = gcm, period = period):
+                        storeFile = f"../model-data/{region}/weather/series/{scenario}_{gcm}.nc"
+                        if not exists(storeFile):
+                            print(f"  ! no stored series for {region} {scenario}/{gcm}, run prepare-weather.py first")
+                            continue
+
+                        storedPeriod = storedWeatherPeriod(storeFile)
+                        if runPeriod[0] < storedPeriod[0] or runPeriod[1] > storedPeriod[1]:
+                            print(f"  ! {region} {scenario}/{gcm} is stored for {storedPeriod[0]}-{storedPeriod[1]}, {period} is not inside it, run prepare-weather.py for it first")
+                            continue
+
+                        biasCorrection = None
+                        if variables.weather_bias_correction:
+                            biasCorrection = weatherBiasCorrection(region, scenario, gcm, variables.scenariosData['observed'][0], variables.weather_bias_quantiles)
+
+                        for resolution in resolutions:
+                            exportName = weatherExportName(gcm, resolution, args.steps)
+                            print(f"  > exporting {region} {scenario}/{exportName} for {period}")
+
+                            startTime   = datetime.now()
+                            written     = exportSWATPlusWeather(storeFile, runPeriod, scenario, gcm, region,
+                                transport_ = variables.weather_transport, processes_ = variables.processes, scratchDir_ = f"{weatherDir}/scratch", biasCorrection_ = biasCorrection,
+                                stationResolution_ = resolution, timeSteps_ = args.steps)
+
+                            stations = len({record['name'] for records in written.values() for record in records})
+                            print(f"  > {stations} stations of {region} {scenario}/{exportName} written in {(datetime.now() - startTime).total_seconds():.2f} s\n")
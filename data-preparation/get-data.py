@@ -19,46 +19,58 @@ from cjfx import list_folders, ignore_warnings
 ignore_warnings()
 
 import datavariables as variables
+from instrumentation import instrument_script
 
-# functions
-def get_python_exe() -> str:
-    return "python" if os.name == "nt" else "python3"
+with instrument_script():
 
-# change directory to file location
-me = os.path.realpath(__file__)
-os.chdir(os.path.dirname(me))
+    # functions
+    def get_python_exe() -> str:
+        return "python" if os.name == "nt" else "python3"
 
-if not os.name == "nt":
-    pass
-    # os.system("clear")
+    def run_script(script_, regions_):
+        '''
+    runs a data preparation script for the regions, get-data stops with an error when it fails
+    so the steps after it do not run on missing data
+    '''
+        if os.system(f"{get_python_exe()} {script_} {regions_}") != 0:
+            print(f"! {script_} failed for {regions_}")
+            sys.exit(1)
 
-if len(sys.argv) >= 2: regions = sys.argv[1:]
-else: regions = list_folders("./resources/regions/")
+    # change directory to file location
+    me = os.path.realpath(__file__)
+    os.chdir(os.path.dirname(me))
 
-regions_ = ' '.join(regions)
+    if not os.name == "nt":
+        pass
+        # os.system("clear")
 
-# create bounding boxes and land-mass masks used in next steps
-os.system(f"{get_python_exe()} make-bounding-boxes.py {regions_}")
+    if len(sys.argv) >= 2: regions = sys.argv[1:]
+    else: regions = list_folders("./resources/regions/")
 
-# create dem
-os.system(f"{get_python_exe()} prepare-dem-aster.py {regions_}")
+    regions_ = ' '.join(regions)
 
-# create soil map based on dem
-os.system(f"{get_python_exe()} prepare-soils.py {regions_}")
+    # create bounding boxes and land-mass masks used in next steps
+    run_script("make-bounding-boxes.py", regions_)
 
-# create landuse map based on dem
-os.system(f"{get_python_exe()} prepare-landuse.py {regions_}")
+    # create dem
+    run_script("prepare-dem-aster.py", regions_)
 
-# create lake shapefile
-os.system(f"{get_python_exe()} prepare-lakes-data.py {regions_}")
+    # create soil map based on dem
+    run_script("prepare-soils.py", regions_)
 
-# create weather data
-os.system(f"{get_python_exe()} prepare-weather.py {regions_}")
+    # create landuse map based on dem
+    run_script("prepare-landuse.py", regions_)
 
-# get grdc stations
-os.system(f"{get_python_exe()} get-grdc-stations.py {regions_}")
+    # create lake shapefile
+    run_script("prepare-lakes-data.py", regions_)
 
+    # create weather data
+    run_script("prepare-weather.py", regions_)
 
-from cjfx import alert
-alert(f'Finished getting data for {regions_}', 'Data Preparation Complete')
-print()
+    # get grdc stations
+    run_script("get-grdc-stations.py", regions_)
+
+
+    from cjfx import alert
+    alert(f'Finished getting data for {regions_}', 'Data Preparation Complete')
+    print()
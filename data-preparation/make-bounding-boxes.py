@@ -17,72 +17,76 @@ me = os.path.realpath(__file__)
 os.chdir(os.path.dirname(me))
 
 import datavariables as variables
+from instrumentation import instrument_script, span
 
 if __name__ == '__main__':
+
+    with instrument_script():
     
-    print('\n# preparing bounding boxes')
-    if len(sys.argv) < 2:
-        print(f"! select a region for which to prepare the dataset. options are: {', '.join(list_folders('./resources/regions/'))}\n")
-        sys.exit()
+        print('\n# preparing bounding boxes')
+        if len(sys.argv) < 2:
+            print(f"! select a region for which to prepare the dataset. options are: {', '.join(list_folders('./resources/regions/'))}\n")
+            sys.exit()
 
-    regions = sys.argv[1:]
+        regions = sys.argv[1:]
     
-    details = {
-        'auth': variables.final_proj_auth,
-        'code': variables.final_proj_code,
-    }
+        details = {
+            'auth': variables.final_proj_auth,
+            'code': variables.final_proj_code,
+        }
 
-    if not exists("resources/regions/"):
-        # extract the regions.zip file
-        os.system("unzip resources/regions.zip -d resources/")
+        if not exists("resources/regions/"):
+            # extract the regions.zip file
+            os.system("unzip resources/regions.zip -d resources/")
 
-    for region in regions:
+        for region in regions:
+            with span('make-bounding-boxes', region):
 
-        report(f"\t> preparing bounding box for {region}                ")
-        details['region'] = region
+                report(f"\t> preparing bounding box for {region}                ")
+                details['region'] = region
 
-        if len(region.split('-')) < 2:
-            print(f"the region {region} is not named correctly, the naming structure is '[continent]-[zone]'")
-            quit()
+                if len(region.split('-')) < 2:
+                    print(f"the region {region} is not named correctly, the naming structure is '[continent]-[zone]'")
+                    quit()
 
-        details['continent'] = region.split('-')[0]
+                details['continent'] = region.split('-')[0]
 
-        fn = "./resources/regions/{region}/bounding-box-EPSG-4326.txt".format(**details)
-        if not exists(fn):
-            print(f"!the coordinate file does not exist:\n\t> {fn}")
-            quit()
+                fn = "./resources/regions/{region}/bounding-box-EPSG-4326.txt".format(**details)
+                if not exists(fn):
+                    print(f"!the coordinate file does not exist:\n\t> {fn}")
+                    quit()
 
-        fc = [line.strip().split(',') for line in read_from(fn)]
+                fc = [line.strip().split(',') for line in read_from(fn)]
 
-        lat_list = [fc[1][-2], fc[0][-2], fc[0][-2], fc[1][-2]]
-        lon_list = [fc[0][-1], fc[0][-1], fc[1][-1], fc[1][-1]]
+                lat_list = [fc[1][-2], fc[0][-2], fc[0][-2], fc[1][-2]]
+                lon_list = [fc[0][-1], fc[0][-1], fc[1][-1], fc[1][-1]]
 
-        lat_list, lon_list = [float(coord) for coord in lat_list], [float(coord) for coord in lon_list]
+                lat_list, lon_list = [float(coord) for coord in lat_list], [float(coord) for coord in lon_list]
 
-        gdf = create_polygon_geodataframe(lat_list, lon_list)
-        gdf.to_crs('{auth}:{code}'.format(**details))
+                gdf = create_polygon_geodataframe(lat_list, lon_list)
+                gdf.to_crs('{auth}:{code}'.format(**details))
 
-        mask_fn = "./resources/regions/{region}/bounding-box-{auth}-{code}.gpkg".format(**details)
-        gdf.to_file(mask_fn)
+                mask_fn = "./resources/regions/{region}/bounding-box-{auth}-{code}.gpkg".format(**details)
+                gdf.to_file(mask_fn)
 
-        create_path("../model-data/{region}/shapes/burn-shape-{auth}-{code}.shp".format(**details), v = False)
+                create_path("../model-data/{region}/shapes/burn-shape-{auth}-{code}.shp".format(**details), v = False)
 
-        if exists("./resources/continents/{continent}-{auth}-{code}.gpkg".format(**details)):
-            clip_features(
-                mask_fn,
-                "./resources/continents/{continent}-{auth}-{code}.gpkg".format(**details),
-                "./resources/regions/{region}/land_mass-{auth}-{code}.gpkg".format(**details),
-            )
-        else:
-            clip_features(
-                mask_fn,
-                "./resources/CoSWAT-GM-world-land-masses-{auth}-{code}.gpkg".format(**details),
-                "./resources/regions/{region}/land_mass-{auth}-{code}.gpkg".format(**details),
-            )
-        clip_features("./resources/regions/{region}/land_mass-{auth}-{code}.gpkg".format(**details), "resources/burn_shape-{auth}-{code}.shp".format(**details), "../model-data/{region}/shapes/burn-shape-{auth}-{code}.shp".format(**details))
+                if exists("./resources/continents/{continent}-{auth}-{code}.gpkg".format(**details)):
+                    clip_features(
+                        mask_fn,
+                        "./resources/continents/{continent}-{auth}-{code}.gpkg".format(**details),
+                        "./resources/regions/{region}/land_mass-{auth}-{code}.gpkg".format(**details),
+                    )
+                else:
+                    clip_features(
+                        mask_fn,
+                        "./resources/CoSWAT-GM-world-land-masses-{auth}-{code}.gpkg".format(**details),
+                        "./resources/regions/{region}/land_mass-{auth}-{code}.gpkg".format(**details),
+                    )
+                clip_features("./resources/regions/{region}/land_mass-{auth}-{code}.gpkg".format(**details), "resources/burn_shape-{auth}-{code}.shp".format(**details), "../model-data/{region}/shapes/burn-shape-{auth}-{code}.shp".format(**details))
 
-    print()
-    print()
+        print()
+        print()
 
 
 
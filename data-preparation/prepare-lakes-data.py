@@ -46,43 +46,47 @@ me = os.path.realpath(__file__)
 os.chdir(os.path.dirname(me))
 
 import datavariables as variables
+from instrumentation import instrument_script, span
 
-print('\n# preparing lakes data...\n')
-if len(sys.argv) < 2:
-    regions = list_folders('./resources/regions/')
-    print(f"  > using all regions: {', '.join(regions)}\n")
-else:
-    regions = sys.argv[1:]
-    print(f"  > using regions: {', '.join(regions)}\n")
+with instrument_script():
+
+    print('\n# preparing lakes data...\n')
+    if len(sys.argv) < 2:
+        regions = list_folders('./resources/regions/')
+        print(f"  > using all regions: {', '.join(regions)}\n")
+    else:
+        regions = sys.argv[1:]
+        print(f"  > using regions: {', '.join(regions)}\n")
     
 
 
-details = {
-    'auth': variables.final_proj_auth,
-    'code': variables.final_proj_code,
-}
+    details = {
+        'auth': variables.final_proj_auth,
+        'code': variables.final_proj_code,
+    }
 
-input_gdf               = geopandas.read_file(f"{variables.grand_and_lakes}")
+    input_gdf               = geopandas.read_file(f"{variables.grand_and_lakes}")
 
-for region in regions:
-    details['region'] = region
-    create_path(variables.grand_final_shp.format(**details))
+    for region in regions:
+        with span('prepare-lakes-data', region):
+            details['region'] = region
+            create_path(variables.grand_final_shp.format(**details))
 
-    regionfn                = "./resources/regions/{region}/bounding-box-{auth}-{code}.gpkg".format(**details)
-    regionfn                = "./resources/regions/{region}/outlets-buffer.gpkg".format(**details)
+            regionfn                = "./resources/regions/{region}/bounding-box-{auth}-{code}.gpkg".format(**details)
+            regionfn                = "./resources/regions/{region}/outlets-buffer.gpkg".format(**details)
 
-    mask_gdf                = geopandas.read_file(regionfn)
-    clippedReservoirs       = input_gdf.clip(mask_gdf.to_crs(input_gdf.crs))
+            mask_gdf                = geopandas.read_file(regionfn)
+            clippedReservoirs       = input_gdf.clip(mask_gdf.to_crs(input_gdf.crs))
 
-    clippedReservoirs               = clippedReservoirs.to_crs("{auth}:{code}".format(**details))
-    clippedReservoirs["calcAreas"]  = clippedReservoirs.geometry.area / 1000000
-    clippedReservoirs["calcVol"]    = clippedReservoirs.calcAreas * 2.1
-    clippedReservoirs["RES"]        = 1
+            clippedReservoirs               = clippedReservoirs.to_crs("{auth}:{code}".format(**details))
+            clippedReservoirs["calcAreas"]  = clippedReservoirs.geometry.area / 1000000
+            clippedReservoirs["calcVol"]    = clippedReservoirs.calcAreas * 2.1
+            clippedReservoirs["RES"]        = 1
 
-    clippedReservoirs = clippedReservoirs[clippedReservoirs.calcAreas > (variables.grand_lake_thres)]
+            clippedReservoirs = clippedReservoirs[clippedReservoirs.calcAreas > (variables.grand_lake_thres)]
 
-    # Assuming 'gdf' is your GeoDataFrame with polygons
-    clippedReservoirs['geometry'] = clippedReservoirs['geometry'].apply(removeHoles)
+            # Assuming 'gdf' is your GeoDataFrame with polygons
+            clippedReservoirs['geometry'] = clippedReservoirs['geometry'].apply(removeHoles)
 
-    clippedReservoirs.to_file(variables.grand_final_shp.format(**details))
-    clippedReservoirs.to_file(variables.grand_final_gpkg.format(**details), driver = 'GPKG')
+            clippedReservoirs.to_file(variables.grand_final_shp.format(**details))
+            clippedReservoirs.to_file(variables.grand_final_gpkg.format(**details), driver = 'GPKG')
@@ -27,82 +27,86 @@ me = os.path.realpath(__file__)
 os.chdir(os.path.dirname(me))
 
 import datavariables as variables
+from instrumentation import instrument_script, span
 
 
 
 if __name__ == "__main__":
 
-    print("# preparing land use data...")
-    # variables
-    single_year     = True
+    with instrument_script():
 
-    year_model      = variables.esa_landuse_year
-    years_download  = range(1992, 2016)
+        print("# preparing land use data...")
+        # variables
+        single_year     = True
 
-    final_raster    = variables.esa_final_raster
+        year_model      = variables.esa_landuse_year
+        years_download  = range(1992, 2016)
 
-    if len(sys.argv) < 2:
-        print(f"! select a region for which to prepare the dataset. options are: {', '.join(list_folders('./resources/regions/'))}\n")
-        sys.exit()
+        final_raster    = variables.esa_final_raster
+
+        if len(sys.argv) < 2:
+            print(f"! select a region for which to prepare the dataset. options are: {', '.join(list_folders('./resources/regions/'))}\n")
+            sys.exit()
     
-    regions = sys.argv[1:]
+        regions = sys.argv[1:]
 
-    details = {
-        'auth': variables.final_proj_auth,
-        'code': variables.final_proj_code,
-        'year_model': variables.esa_landuse_year,
-    }
+        details = {
+            'auth': variables.final_proj_auth,
+            'code': variables.final_proj_code,
+            'year_model': variables.esa_landuse_year,
+        }
 
-    # download
-    create_path('./landuse-ws/')
+        # download
+        create_path('./landuse-ws/')
     
-    if single_year:
-        link = variables.esa_base_path.format(year = year_model)
-        raster_fn = f"./landuse-ws/ESACCI-LC-L4-LCCS-Map-300m-P1Y-{year_model}-v2.0.7.tif"
-        if not exists(raster_fn):
-            wget.download(f'{variables.esa_base_url}/{link}', f'{raster_fn}')
-            print()
-    else:
-        pool = mp.Pool(variables.processes)
+        if single_year:
+            link = variables.esa_base_path.format(year = year_model)
+            raster_fn = f"./landuse-ws/ESACCI-LC-L4-LCCS-Map-300m-P1Y-{year_model}-v2.0.7.tif"
+            if not exists(raster_fn):
+                wget.download(f'{variables.esa_base_url}/{link}', f'{raster_fn}')
+                print()
+        else:
+            pool = mp.Pool(variables.processes)
 
-        jobs = []
-        for year in years_download:
-            link = variables.esa_base_path.format(year = year)
-            raster_fn = f"./landuse-ws/ESACCI-LC-L4-LCCS-Map-300m-P1Y-{year}-v2.0.7.tif"
+            jobs = []
+            for year in years_download:
+                link = variables.esa_base_path.format(year = year)
+                raster_fn = f"./landuse-ws/ESACCI-LC-L4-LCCS-Map-300m-P1Y-{year}-v2.0.7.tif"
 
-            if not exists(raster_fn):
-                jobs.append([f'{variables.esa_base_url}/{link}', f'{raster_fn}'])
-
-        results = pool.starmap_async(wget.download, jobs)
-        results.get()
-        print()
-
-    ds = None
-    for region in regions:
-
-        details['region'] = region
-
-        # gdal.WarpOptions()
-
-        print(f"\t# setting bounds to  {variables.cutline.format(**details)}")
-        print("\t> creating look up table")
-        # Use Warp with precise settings
-        ds = gdal.Warp(final_raster.format(**details), 
-               f"./landuse-ws/ESACCI-LC-L4-LCCS-Map-300m-P1Y-{year_model}-v2.0.7.tif", 
-               cropToCutline=True,
-               dstSRS='{auth}:{code}'.format(**details), 
-               resampleAlg="mode", 
-               srcNodata=0, 
-               dstNodata=-999,
-               outputType=gdal.GDT_Int16, 
-               xRes=variables.data_resolution, yRes=variables.data_resolution,
-               targetAlignedPixels=True,  # Ensure output pixels are aligned to the target coordinates
-               cutlineDSName=variables.cutline.format(**details)
-        )
-
-        copy_file('./resources/esa_land_use_lookup.csv', '../model-data/{region}/tables/worldLanduseLookup.csv'.format(**details), v = False)
-
-        ref_raster = None
-    ds = None
+                if not exists(raster_fn):
+                    jobs.append([f'{variables.esa_base_url}/{link}', f'{raster_fn}'])
+
+            results = pool.starmap_async(wget.download, jobs)
+            results.get()
+            print()
+
+        ds = None
+        for region in regions:
+            with span('prepare-landuse', region):
+
+                details['region'] = region
+
+                # gdal.WarpOptions()
+
+                print(f"\t# setting bounds to  {variables.cutline.format(**details)}")
+                print("\t> creating look up table")
+                # Use Warp with precise settings
+                ds = gdal.Warp(final_raster.format(**details), 
+                       f"./landuse-ws/ESACCI-LC-L4-LCCS-Map-300m-P1Y-{year_model}-v2.0.7.tif", 
+                       cropToCutline=True,
+                       dstSRS='{auth}:{code}'.format(**details), 
+                       resampleAlg="mode", 
+                       srcNodata=0, 
+                       dstNodata=-999,
+                       outputType=gdal.GDT_Int16, 
+                       xRes=variables.data_resolution, yRes=variables.data_resolution,
+                       targetAlignedPixels=True,  # Ensure output pixels are aligned to the target coordinates
+                       cutlineDSName=variables.cutline.format(**details)
+                )
+
+                copy_file('./resources/esa_land_use_lookup.csv', '../model-data/{region}/tables/worldLanduseLookup.csv'.format(**details), v = False)
+
+                ref_raster = None
+        ds = None
 
 
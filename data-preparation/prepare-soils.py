@@ -29,6 +29,7 @@ me = os.path.realpath(__file__)
 os.chdir(os.path.dirname(me))
 
 import datavariables as variables
+from instrumentation import instrument_script, span
 
 # functions
 def rasterise_shape(shape_file:str, column_name:str, destination_tif:str, template_tif:str, no_data:int = -999) -> None:
@@ -58,88 +59,91 @@ def rasterise_shape(shape_file:str, column_name:str, destination_tif:str, templa
 
 if __name__ == "__main__":
 
-    # rasterise shapefile and clip to land masses
-    if len(sys.argv) < 2:
-        print(f"! select a region for which to prepare the dataset. options are: {', '.join(list_folders('./resources/regions/'))}\n")
-        sys.exit()
-
-    print('# preparing soil data...')
-
-    regions = sys.argv[1:]
-
-    details = {
-        'auth': variables.final_proj_auth,
-        'code': variables.final_proj_code,
-    }
-
-
-    if not os.path.exists(variables.fao_tmp_raster):
-        print(f'\t> rasterising {variables.fao_soil_shape_fn.format(**details)}')
-        create_path(variables.fao_tmp_raster)
-        rasterise_shape(variables.fao_soil_shape_fn.format(**details), "SNUM", variables.fao_tmp_raster, variables.aster_tmp_tif)
-
-    for region in regions:
-        details['region'] = region
-
-        print(f'\t# setting bounds to  {variables.cutline.format(**details)}')
-        ds = gdal.Warp(variables.fao_final_raster.format(**details),
-                       variables.fao_tmp_raster,
-                       cropToCutline = True, 
-                       srcNodata=-999, dstNodata=variables.no_data_value, 
-                       outputType=gdal.GDT_Int16, 
-                       targetAlignedPixels=True,
-                       dstSRS='{auth}:{code}'.format(**details), 
-                       xRes=variables.data_resolution, yRes=variables.data_resolution,
-                       resampleAlg=f"mode",
-                       cutlineDSName = variables.cutline.format(**details))
-        ds = None
-
-        # get all values from tif
-        print('\t> getting all available soil values')
-        soil_array = open_tif_as_array(variables.fao_final_raster.format(**details), big_tif=False)
-
-        print('\t> sorting soil data')
-        # keep unique
-        soil_values = soil_array.flatten().tolist()
-
-        soil_values = list(dict.fromkeys(soil_values))
-
-        # create usersoil and soil lookup
-        usersoil_dict = {}
-        usersoil_fc = read_from(variables.fao_usersoil_db)
-
-        for line in usersoil_fc:
-            usersoil_dict[line.split(",")[2].replace('"', "")] = line
-
-        print('\t> creating tables\n')
-        usersoil_string = usersoil_fc[0]
-        lookup_string   = "VALUE,SNAM\n"
-        for value in soil_values:
-            if value == variables.no_data_value: continue
-            if value < 0: continue
-            snam = usersoil_dict[str(value)].split(',')[3].replace('"', "")
-
-            lookup_string +=f"{value},{snam}\n"
-            usersoil_string += usersoil_dict[str(value)]
-
-        write_to(variables.fao_lookup_fn.format(**details), lookup_string)
-        write_to(variables.fao_usersoil_fn.format(**details), usersoil_string)
-
-        # update dem incase there is no soil data
-        print('\t> updating dem bounds')
-        # Open raster files
-        with rasterio.open(variables.fao_final_raster.format(**details)) as srcA:
-            rasterA = srcA.read(1)  # Assuming single band
-
-        with rasterio.open(variables.aster_final_raster.format(**details)) as srcB:
-            rasterB = srcB.read(1)
-
-        # Set corresponding pixels to NaN
-        try:
-            rasterB[rasterA == -999] = -999
-        except:
-            pass #rasterB[rasterA == -999] = -999
-
-        # Save the modified raster B
-        with rasterio.open(variables.aster_final_raster.format(**details), 'w', **srcB.meta) as dst:
-            dst.write(rasterB, 1)
+    with instrument_script():
+
+        # rasterise shapefile and clip to land masses
+        if len(sys.argv) < 2:
+            print(f"! select a region for which to prepare the dataset. options are: {', '.join(list_folders('./resources/regions/'))}\n")
+            sys.exit()
+
+        print('# preparing soil data...')
+
+        regions = sys.argv[1:]
+
+        details = {
+            'auth': variables.final_proj_auth,
+            'code': variables.final_proj_code,
+        }
+
+
+        if not os.path.exists(variables.fao_tmp_raster):
+            print(f'\t> rasterising {variables.fao_soil_shape_fn.format(**details)}')
+            create_path(variables.fao_tmp_raster)
+            rasterise_shape(variables.fao_soil_shape_fn.format(**details), "SNUM", variables.fao_tmp_raster, variables.aster_tmp_tif)
+
+        for region in regions:
+            with span('prepare-soils', region):
+                details['region'] = region
+
+                print(f'\t# setting bounds to  {variables.cutline.format(**details)}')
+                ds = gdal.Warp(variables.fao_final_raster.format(**details),
+                               variables.fao_tmp_raster,
+                               cropToCutline = True, 
+                               srcNodata=-999, dstNodata=variables.no_data_value, 
+                               outputType=gdal.GDT_Int16, 
+                               targetAlignedPixels=True,
+                               dstSRS='{auth}:{code}'.format(**details), 
+                               xRes=variables.data_resolution, yRes=variables.data_resolution,
+                               resampleAlg=f"mode",
+                               cutlineDSName = variables.cutline.format(**details))
+                ds = None
+
+                # get all values from tif
+                print('\t> getting all available soil values')
+                soil_array = open_tif_as_array(variables.fao_final_raster.format(**details), big_tif=False)
+
+                print('\t> sorting soil data')
+                # keep unique
+                soil_values = soil_array.flatten().tolist()
+
+                soil_values = list(dict.fromkeys(soil_values))
+
+                # create usersoil and soil lookup
+                usersoil_dict = {}
+                usersoil_fc = read_from(variables.fao_usersoil_db)
+
+                for line in usersoil_fc:
+                    usersoil_dict[line.split(",")[2].replace('"', "")] = line
+
+                print('\t> creating tables\n')
+                usersoil_string = usersoil_fc[0]
+                lookup_string   = "VALUE,SNAM\n"
+                for value in soil_values:
+                    if value == variables.no_data_value: continue
+                    if value < 0: continue
+                    snam = usersoil_dict[str(value)].split(',')[3].replace('"', "")
+
+                    lookup_string +=f"{value},{snam}\n"
+                    usersoil_string += usersoil_dict[str(value)]
+
+                write_to(variables.fao_lookup_fn.format(**details), lookup_string)
+                write_to(variables.fao_usersoil_fn.format(**details), usersoil_string)
+
+                # update dem incase there is no soil data
+                print('\t> updating dem bounds')
+                # Open raster files
+                with rasterio.open(variables.fao_final_raster.format(**details)) as srcA:
+                    rasterA = srcA.read(1)  # Assuming single band
+
+                with rasterio.open(variables.aster_final_raster.format(**details)) as srcB:
+                    rasterB = srcB.read(1)
+
+                # Set corresponding pixels to NaN
+                try:
+                    rasterB[rasterA == -999] = -999
+                except:
+                    pass #rasterB[rasterA == -999] = -999
+
+                # Save the modified raster B
+                with rasterio.open(variables.aster_final_raster.format(**details), 'w', **srcB.meta) as dst:
+                    dst.write(rasterB, 1)
@@ -3,9 +3,10 @@
 import os, sys
 from ccfx import *
 import datavariables as variables
-from coswatFX import shouldKeep, writeSWATPlusWeather
-import xarray
-import time
+from instrumentation import instrument_script, span
+from coswatFX import weatherFileCatalog, catalogFiles, writeSWATPlusWeatherFiles, writeWeatherStore, readWeatherStore, extractPointsSeries, setWeatherVariableNames, groupWeatherFiles, cropAndMergeWeather, weatherPointsGrid, clipWeatherPoints, extractRasterValues
+from coswatFX import downloadFiles, runTaskGraph, weatherChunks, weatherBiasCorrection, biasCorrectWeatherSeries, filterWeatherFiles, weatherManifestInputs, planWeatherUpdate, writeWeatherManifest, appendWeatherSeries
+from coswatFX import varNames
 
 regionPointsDir = "./regionPoints"
 weatherDir = './weather-ws'
@@ -15,25 +16,188 @@ details         = {
     'code': variables.final_proj_code,
 }
 
-extTypes         = ["tem", "pcp", "slr", "hmd", "wnd", ]
+def extractWeatherSeries(groupedFiles, regionBox, selectedCoordinates, regionName, scenario, gcm, runPeriod, indexCache = None, processes = variables.processes):
+    '''
+    gets the (variable, time, points) series of the selected coordinates with the configured backend
+    '''
+    if variables.weather_backend == 'xarray':
+        # the downloaded files are opened lazily by the extraction, no cropped or merged files are written
+        variableFiles = groupedFiles
+    else:
+        # do sellatlon and mergetime
+        dstDirCropped   = f"{weatherDir}/cropped/{regionName}/{scenario}/{gcm}"
+        dstDirMerged    = f"{weatherDir}/merged/{regionName}"
+        variableFiles   = cropAndMergeWeather(groupedFiles, regionBox, dstDirCropped, f"{dstDirMerged}/{scenario}_{gcm}_", processes,
+            threads_ = variables.weather_cdo_threads, retries_ = variables.weather_cdo_retries, timingFile_ = f"{weatherDir}/timings/{regionName}_{scenario}_{gcm}.csv")
+
+    lonArray = numpy.array([float(s.split(',')[0]) for s in selectedCoordinates])
+    latArray = numpy.array([float(s.split(',')[1]) for s in selectedCoordinates])
+
+    print(f"  > extracting points data for {', '.join(variableFiles)} using xarray ({variables.weather_backend} backend)")
+    return extractPointsSeries(variableFiles, lonArray, latArray, runPeriod, timeChunk_ = variables.weather_time_chunk, indexCache_ = indexCache,
+        chunks_ = weatherChunks(variables.weather_time_chunk, variables.weather_space_chunk), scheduler_ = variables.weather_dask_scheduler,
+        workers_ = processes, memoryLimit_ = variables.weather_memory_limit)
+
+
+def regionBiasCorrection(region, scenario, gcm):
+    '''
+    returns what the weather files of a region are bias corrected with, None when they are not
+    '''
+    if not variables.weather_bias_correction: return None
+    return weatherBiasCorrection(region, scenario, gcm, variables.scenariosData['observed'][0], variables.weather_bias_quantiles)
+
+
+def downloadWeather(scenario, gcm):
+    '''
+    downloads the files of a scenario and gcm that fall in the scenario's period
+    '''
+    with span('weather-download', scenario = scenario, gcm = gcm):
+        print(f"  > downloading {scenario}/{gcm}")
+
+        lines = []
+        lines += readFile(variables.weather_pr_links_list[scenario][gcm])
+        lines += readFile(variables.weather_hurs_links_list[scenario][gcm])
+        lines += readFile(variables.weather_tasmin_links_list[scenario][gcm])
+        lines += readFile(variables.weather_tasmax_links_list[scenario][gcm])
+        lines += readFile(variables.weather_wind_links_list[scenario][gcm])
+        lines += readFile(variables.weather_rlds_links_list[scenario][gcm])
+
+        # filter lines
+        downloadPeriod = variables.run_period
+        if scenario == 'historical': downloadPeriod = variables.historical_period
+        elif scenario != 'observed': downloadPeriod = variables.future_period
+
+        downloadDir     = f'{weatherDir}/download/{scenario}/{gcm}'
+        downloadLinks   = list(dict.fromkeys(catalogFiles(weatherFileCatalog([line for line in lines if line.strip() != '']), downloadPeriod)))
+
+        downloadString  = 'this file is created automatically so the user can see which files are downloaded\n\n'
+        for line in downloadLinks:
+            if variables.weather_redownload or not exists(f'{downloadDir}/{getFileBaseName(line, extension = True)}'):
+                downloadString += f'{line}\n'
+
+        writeFile(f"{weatherDir}/download_links.txt", downloadString)
+
+        # download weather, a run waits for a file another run is fetching instead of fetching it again.
+        # a file that fails to download fails the unit, so its weather is not prepared without it
+        downloadFiles(downloadLinks, downloadDir, variables.weather_download_processes, verify_ = variables.weather_redownload)
+        print()
+
+
+def prepareWeather(scenario, gcm, unitRegions, regionCoordinates, regionBoxes, processes):
+    '''
+    extracts and writes the weather of a scenario and gcm for the regions of a work unit
+    from the downloaded files, using at most processes for its cdo and writer pools
+    '''
+    print(f"  > preparing {scenario}/{gcm} for {', '.join(unitRegions)}")
+
+    currentVariables = {}
+    runPeriod = [int(yr) for yr in variables.run_period.split('-')]
+    if scenario == 'historical': runPeriod = [int(yr) for yr in variables.historical_period.split('-')]
+    elif scenario != 'observed': runPeriod = [int(yr) for yr in variables.future_period.split('-')]
+
+    ds_f_names  = listFiles(f'{weatherDir}/download/{scenario}/{gcm}/', 'nc')
+    ds_f_names  += listFiles(f'{weatherDir}/download/{scenario}/{gcm}/', 'nc4')
+
+    # every file whose years overlap the run period, not only those holding its first or last year
+    catalog         = weatherFileCatalog(ds_f_names)
+    keptFileNames   = catalogFiles(catalog, runPeriod)
+
+    setWeatherVariableNames(keptFileNames, varNames, currentVariables)
+    groupedFiles = groupWeatherFiles(catalog[catalog['fileName'].isin(keptFileNames)], currentVariables)
+
+    # the manifests check the downloaded files of the stored period, which may reach beyond this run
+    sourceFiles  = groupWeatherFiles(catalog, currentVariables)
+
+    # work out per region what has changed since the last run
+    plans = {}
+    for region in unitRegions:
+        details['region'] = region
+        storeFile       = f"../model-data/{region}/weather/series/{scenario}_{gcm}.nc"
+        manifestInputs  = weatherManifestInputs(regionCoordinates[region], variables.cutline.format(**details), variables.weather_resolution, regionBiasCorrection(region, scenario, gcm))
+
+        if variables.weather_incremental and not variables.redo_weather:
+            plans[region] = planWeatherUpdate(f"{storeFile[:-3]}.json", storeFile, manifestInputs, sourceFiles, runPeriod, f"../model-data/{region}/weather/swatplus/{scenario}/{gcm}")
+        else:
+            plans[region] = ('extract', runPeriod)
+
+        plans[region] = plans[region] + (manifestInputs, storeFile)
+
+    extractRegions = [region for region in unitRegions if plans[region][0] in ['extract', 'append']]
+
+    if variables.weather_multi_region and len(extractRegions) > 0:
+        # read every time slice once for the points of all regions, then hand each region its own points
+        allCoordinates  = [coordinates for region in extractRegions for coordinates in regionCoordinates[region]]
+        boxRegions      = [region for region in extractRegions if len(regionCoordinates[region]) > 0]
+        allBox          = [
+            str(min(float(regionBoxes[region][0]) for region in boxRegions)), str(max(float(regionBoxes[region][1]) for region in boxRegions)),
+            str(min(float(regionBoxes[region][2]) for region in boxRegions)), str(max(float(regionBoxes[region][3]) for region in boxRegions)),
+        ]
+        allPeriod       = [min(plans[region][1][0] for region in extractRegions), max(plans[region][1][1] for region in extractRegions)]
+
+        print(f"    - extracting points data of {len(extractRegions)} regions ({len(allCoordinates)} points) in one pass")
+        allPointsSeries = extractWeatherSeries(filterWeatherFiles(groupedFiles, allPeriod), allBox, allCoordinates, "all-regions", scenario, gcm, allPeriod, f"{weatherDir}/all-regions-weatherPoints", processes)
+
+        regionOffsets   = dict(zip(extractRegions, numpy.cumsum([0] + [len(regionCoordinates[region]) for region in extractRegions])))
+        regionCounts    = {region: len(regionCoordinates[region]) for region in extractRegions}
+
+    for region in unitRegions:
+        with span('prepare-weather', region, scenario = scenario, gcm = gcm):
+            print(f"    - region: {region}")
+
+            details['region']   = region
+            details['scenario'] = scenario
+            details['gcm']      = gcm
+
+            selectedCoordinates = regionCoordinates[region]
+            action, period, manifestInputs, storeFile = plans[region]
+
+            if action == 'skip':
+                print(f"  > weather files for {runPeriod[0]}-{runPeriod[1]} are up to date, skipping")
+                continue
+
+            if action == 'export':
+                print(f"  > inputs unchanged, writing {runPeriod[0]}-{runPeriod[1]} from the stored series")
+                pointsSeries, _, _  = readWeatherStore(storeFile, runPeriod)
+
+            else:
+                if action == 'append': print(f"  > inputs unchanged, extracting only {period[0]}-{period[1]}")
 
-varNames         = {'pcp': ['pr',],
-                    'tem': ['tasmax', 'tasmin'],
-                    'wnd': ['wnd', 'sfcwind', 'sfcWind', 'wind'],
-                    'hmd': ['hurs', 'rhs'],
-                    'slr': ['rlds',]}
+                if variables.weather_multi_region:
+                    offset          = regionOffsets[region]
+                    pointsSeries    = allPointsSeries.isel(points = slice(offset, offset + regionCounts[region]))
+                    pointsSeries    = pointsSeries.sel(time = slice(f"{period[0]}-01-01", f"{period[1]}-12-31"))
+                else:
+                    pointsSeries = extractWeatherSeries(filterWeatherFiles(groupedFiles, period), regionBoxes[region], selectedCoordinates, region, scenario, gcm, period, f'../model-data/{region}/weather/swatplus/{region}-weatherPoints', processes)
+
+                if action == 'append':
+                    storedSeries, _, _  = readWeatherStore(storeFile)
+                    appendedSeries      = appendWeatherSeries(storedSeries, pointsSeries)
+
+                    if appendedSeries is None:
+                        # the variables changed, the stored years can not be reused
+                        print(f"  > the stored variables differ, extracting {runPeriod[0]}-{runPeriod[1]} again")
+                        period          = runPeriod
+                        pointsSeries    = extractWeatherSeries(groupedFiles, regionBoxes[region], selectedCoordinates, region, scenario, gcm, runPeriod, f'../model-data/{region}/weather/swatplus/{region}-weatherPoints', processes)
+                    else:
+                        pointsSeries    = appendedSeries
 
-fullVarNames     = {'pcp': "precipitation",
-                    'tem': "temperature",
-                    'wnd': "wind speed",
-                    'hmd': "relative humidity",
-                    'slr': "solar radiation"}
+                if variables.weather_store:
+                    writeWeatherStore(pointsSeries, selectedCoordinates, currentVariables, storeFile)
 
-varFactors       = {'pcp': 86400.0000,
-                    'tem':  -273.1500,
-                    'slr':     0.0864,
-                    'hmd':     0.0100,
-                    'wnd':     1.0000}
+            # the store keeps the series as extracted, only the weather files are corrected
+            biasCorrection = regionBiasCorrection(region, scenario, gcm)
+            if not biasCorrection is None:
+                print(f"  > quantile mapping {scenario}/{gcm} to the observed series")
+                pointsSeries = biasCorrectWeatherSeries(pointsSeries, selectedCoordinates, currentVariables, *biasCorrection)
+
+            writeSWATPlusWeatherFiles(pointsSeries, selectedCoordinates, currentVariables, runPeriod, scenario, gcm, region,
+                transport_ = variables.weather_transport, processes_ = processes, scratchDir_ = f"{weatherDir}/scratch")
+
+            # an export leaves the store, and the period it covers, as it was. the inputs are taken
+            # again as a historical store the correction depends on may just have been rewritten
+            storedPeriod    = period if action == 'export' else runPeriod
+            manifestInputs  = weatherManifestInputs(selectedCoordinates, variables.cutline.format(**details), variables.weather_resolution, biasCorrection)
+            writeWeatherManifest(f"{storeFile[:-3]}.json", manifestInputs, sourceFiles, storedPeriod, runPeriod, variables.weather_store)
 
 
 # change working directory
@@ -53,286 +217,80 @@ print('\n# preparing climate data...\n')
 
 if __name__ == "__main__":
 
-    counter = 0
-    skipWeatherDownload = False
-    while exists(f'{weatherDir}/download/downloadLock'):
-        time.sleep(5)
-        print(f"\r  > waiting for download lock to be released... ({counter * 5} seconds)", end=""); sys.stdout.flush()
-        counter += 1; skipWeatherDownload = True
-
-    writeFile(f'{weatherDir}/download/downloadLock', 'locked')
+    with instrument_script():
 
-    if variables.prepare_weather:
-        data = []
-        for latitude in numpy.arange(-85.25, 86.25, variables.weather_resolution):
-            for longitude in numpy.arange(-179.25,180.25, variables.weather_resolution):
-                data.append([latitude, longitude])
-
-        cols = ['longitude', 'latitude']
-
-        if variables.redo_weather:
+        if variables.prepare_weather:
+            # the points are made again when the resolution is not the one they were made with
+            pointsSigFile = f"{os.path.splitext(variables.weather_points_all)[0]}.sig"
+            if variables.redo_weather or not exists(pointsSigFile) or readFile(pointsSigFile)[0].strip() != str(variables.weather_resolution):
                 deleteFile(variables.weather_points_all)
 
-        if not exists(variables.weather_points_all):
-            pointsToGeodataframe(data, out_shape=variables.weather_points_all, columns=cols)
-            print(f"  > created points file: {variables.weather_points_all}")
-
-    # loop through scenarios
-    for scenario in variables.available_scenarios:
-        print(f"processing scenario: {scenario}")
-
-        runPeriod = [int(yr) for yr in variables.run_period.split('-')]
-        gcms = variables.weather_pr_links_list[scenario]
-
-        for gcm in gcms:
-            currentVariables = {}
-
-            print(f"  > processing gcm: {gcm}")
-
-            if not exists(f"./resources/weather-lists/"):
-                os.system(f"unzip ./resources/weather-lists.zip -d ./resources")
-            lines = []
-            lines += readFile(variables.weather_pr_links_list[scenario][gcm])
-            lines += readFile(variables.weather_hurs_links_list[scenario][gcm])
-            lines += readFile(variables.weather_tasmin_links_list[scenario][gcm])
-            lines += readFile(variables.weather_tasmax_links_list[scenario][gcm])
-            lines += readFile(variables.weather_wind_links_list[scenario][gcm])
-            lines += readFile(variables.weather_rlds_links_list[scenario][gcm])
-
-            # filter lines
-            downloadList = []
-            downloadString = 'this file is created automatically so the user can see which files are downloaded\n\n'
-            
-            for line in lines:
-                line = line.strip()
-                baseFn = getFileBaseName(line)
-
-                downloadPeriod = variables.run_period
-                if scenario == 'observed':
-                    downloadPeriod = variables.run_period
-                elif scenario == 'historical':
-                    downloadPeriod = variables.historical_period
-                else:
-                    downloadPeriod = variables.future_period
-            
-                cannotDownload = not shouldKeep(baseFn, downloadPeriod)
-
-                if cannotDownload:
-                    # print(f'! skipping {line} - not in range ({downloadPeriod})')
-                    continue
-                        
-                if variables.weather_redownload:
-                    downloadList.append([f'{line}', f'{weatherDir}/download/{scenario}/{gcm}/', "resume", 2])
-                    downloadString += f'{line}\n'
-                elif not exists(f'{weatherDir}/download/{scenario}/{gcm}/{getFileBaseName(line, extension = True)}'):
-                    downloadList.append([f'{line}', f'{weatherDir}/download/{scenario}/{gcm}/', "resume", 2])
-                    downloadString += f'{line}\n'
-
-                downloadList.append([f'{line}', f'{weatherDir}/download/{scenario}/{gcm}/', "resume", 2])
-                createPath(f'{weatherDir}/download/{scenario}/{gcm}/')
-
-            writeFile(f"{weatherDir}/download_links.txt", downloadString)
-            
-            # download weather
-            createPath(f'{weatherDir}/download/{scenario}/')
-            # pool = multiprocessing.Pool(variables.processes)
-
-            # results = pool.starmap_async(downloadFile, downloadList)
-            # results.get()
-
-            # pool.close()
-
-            if variables.weather_redownload:
-                for link in downloadList:
-                    print(f"  > downloading \n\t-{link[0]} \n\t-to {link[1]}")
-                    # we will use wget to download the files
-                    command = f"wget -c -P {link[1]} {link[0]} --no-check-certificate"
-                    if link[2] == "resume":
-                        command += " --continue -q --show-progress"
-                    if link[3] == 2:
-                        command += " --retry-connrefused --tries=2"
-                    if not skipWeatherDownload: os.system(command)
-            print()
-
-            if exists(f'{weatherDir}/download/downloadLock'):
-                deleteFile(f'{weatherDir}/download/downloadLock')
-
-
-            for region in regions:
-                print(f"    - region: {region}")
-
-                details['region']   = region
-                details['scenario'] = scenario
-                details['gcm']      = gcm
-
-                ds_f_names  = listFiles(f'{weatherDir}/download/{scenario}/{gcm}/', 'nc')
-                ds_f_names  += listFiles(f'{weatherDir}/download/{scenario}/{gcm}/', 'nc4')
-
-                keptFileNames = []
-
-                for f in ds_f_names:
-                    if scenario == 'observed':
-                        if shouldKeep(f, variables.run_period): keptFileNames.append(f)
-                    elif scenario == 'historical':
-                        runPeriod = [variables.historical_period.split('-')[0], variables.historical_period.split('-')[1]]
-                        if shouldKeep(f, variables.historical_period): keptFileNames.append(f)
-                    else:
-                        runPeriod = [variables.future_period.split('-')[0], variables.future_period.split('-')[1]]
-                        if shouldKeep(f, variables.future_period): keptFileNames.append(f)
+            if not exists(variables.weather_points_all):
+                weatherPointsGrid(variables.weather_resolution, variables.weather_points_all)
+                writeFile(pointsSigFile, str(variables.weather_resolution))
+                print(f"  > created points file: {variables.weather_points_all}")
 
-                # get region extents
-                regionPoints = clipFeatures(
+        # get the points of every region once, they are the same for all scenarios and gcms
+        regionCoordinates = {}
+        regionBoxes       = {}
+        for region in regions:
+            with span('weather-points', region):
+                details['region'] = region
+
+                # get region extents, the clip is reused while the points and cutline are unchanged
+                regionPoints = clipWeatherPoints(
                     variables.weather_points_all,
                     variables.cutline.format(**details),
                     f'../model-data/{region}/weather/swatplus/{region}-weatherPoints.gpkg')
-                
+        
                 regionPoints = regionPoints.to_crs(epsg=4326)
                 regionExtents =regionPoints.total_bounds
-                regionBox = [str(float(coord)) for coord in [regionExtents[0], regionExtents[2], regionExtents[1], regionExtents[3]]]
-
-                # do sellatlon
-                dstDirCropped = f"{weatherDir}/cropped/{region}/{scenario}/{gcm}"
-                createPath(f"{dstDirCropped}/")
-                jobsCrop = []
-                for fname in keptFileNames:
-                    if exists(f"{dstDirCropped}/{getFileBaseName(fname)}"):
-                        deleteFile(f"{dstDirCropped}/{getFileBaseName(fname)}")
-                        try: os.remove(f"{dstDirCropped}/{getFileBaseName(fname)}")
-                        except: pass
-                    command = f"cdo -O sellonlatbox,{','.join(regionBox)} {fname} {dstDirCropped}/{getFileBaseName(fname)} > /dev/null"
-                    jobsCrop.append([command,])
-  
-                pool = multiprocessing.Pool(processes=variables.processes)
-                pool.starmap_async(os.system, jobsCrop)
-                pool.close()
-                pool.join()
-
-                croppedRegionFiles = listFiles(dstDirCropped, 'nc')
-                croppedRegionFiles += listFiles(dstDirCropped, 'nc4')
-
-                dstDirMerged = f"{weatherDir}/merged/{region}"
-                dstDirTxt = f"{weatherDir}/text/{region}"
-
-                jobsMerge = []
-                for extType in extTypes:
-                    
-                    mergeTimeFiles = []
-                    mergeTimeFilesMin = []
-                    
-                    # set the variable name
-                    for fname in croppedRegionFiles:
-                        if not extType in currentVariables:
-                            for varName in varNames[extType]:
-                                if varName in fname:
-                                    currentVariables[extType] = varName
-                                    break
-                        
-                    for fname in croppedRegionFiles:
-                        if currentVariables[extType] in fname:
-                            mergeTimeFiles.append(fname)
-                        if extType == "tem" and "tasmin" in fname:
-                            mergeTimeFilesMin.append(fname)
-
-                    if len(mergeTimeFiles) == 0: continue
-                    
-                    createPath(f"{dstDirMerged}/")
-
-                    # merge files
-                    mergedFileName = f"{dstDirMerged}/{scenario}_{gcm}_{currentVariables[extType]}.nc4"
-
-                    if extType == "tem":
-                        mergedFileNameMin = mergedFileName.replace("tasmax", "tasmin")
-                    
-                    deleteFile(mergedFileName)
-                    deleteFile(mergedFileNameMin)
-
-                    try: os.remove(mergedFileName)
-                    except: pass
-                    try: os.remove(mergedFileNameMin)
-                    except: pass
-
-                    command = f"cdo -O mergetime {' '.join(mergeTimeFiles)} {mergedFileName} > /dev/null"
-                    jobsMerge.append([command,])
-
-                    if extType == "tem":
-                        commandMin = f"cdo -O mergetime {' '.join(mergeTimeFilesMin)} {mergedFileNameMin} > /dev/null"
-                        jobsMerge.append([commandMin,])
-
-                pool = multiprocessing.Pool(processes=variables.processes)
-                pool.starmap_async(os.system, jobsMerge)
-                pool.close()
-                pool.join()
+                regionBoxes[region] = [str(float(coord)) for coord in [regionExtents[0], regionExtents[2], regionExtents[1], regionExtents[3]]]
+
+                xList       = regionPoints.geometry.x.values
+                yList       = regionPoints.geometry.y.values
+                elevations  = extractRasterValues(variables.aster_tmp_tif, yList, xList)
 
+                # points outside the dem have no elevation and are skipped by the writer
                 selectedCoordinates = []
-                for index, row in regionPoints.iterrows():
-                    selectedCoordinates.append(f"{row['geometry'].x},{row['geometry'].y},{extractRasterValue(variables.aster_tmp_tif, row['geometry'].y, row['geometry'].x)}")
-                
-                for extType in extTypes:
-                    if not extType in currentVariables:
-                        print(f"  > no variable found for {extType}")
-                        continue
-
-                    mergedFileName = f"{dstDirMerged}/{scenario}_{gcm}_{currentVariables[extType]}.nc4"
-                    if not exists(mergedFileName):
-                        print(f"  > file not found: {mergedFileName}")
-                        continue
-                    
-                    # extract data
-                    lonList, latList = zip(*[(float(s.split(',')[0]), float(s.split(',')[1])) for s in selectedCoordinates])
-                    # Convert to NumPy arrays with shape (points,)
-                    lonArray = numpy.array(lonList)
-                    latArray = numpy.array(latList)
-                    
-                    print(f"  > getting {currentVariables[extType]} from {mergedFileName} using xarray")
-                    dataset = xarray.open_dataset(mergedFileName, chunks={})
-
-                    print(f"    - extracting points data")
-                    pointsData = dataset[currentVariables[extType]].sel(
-                        lon=xarray.DataArray(lonArray, dims="points"),
-                        lat=xarray.DataArray(latArray, dims="points"),
-                        method="nearest"
-                    )
-
-                    pointsDataFrameMin = None
-
-                    if extType == "tem":
-                        print(f"    - getting minimum temperature")
-                        datasetTemMin = xarray.open_dataset(mergedFileName.replace("tasmax", "tasmin"), chunks={})
-                        pointsDataTemMin = datasetTemMin["tasmin"].sel(
-                            lon=xarray.DataArray(lonArray, dims="points"),
-                            lat=xarray.DataArray(latArray, dims="points"),
-                            method="nearest"
-                        )
-
-                        pointsDataFrameMin = pointsDataTemMin.to_dataframe().reset_index()
-
-                    pointsDataFrame = pointsData.to_dataframe().reset_index()
-
-                    pointsDataFrame[currentVariables[extType]] = pointsDataFrame[currentVariables[extType]].astype(float)
-
-                    if extType == "tem":
-                        pointsDataFrame[currentVariables[extType]]  = pointsDataFrame[currentVariables[extType]] + varFactors[extType]
-                        
-                        pointsDataFrameMin['tasmin']                = pointsDataFrameMin['tasmin'].astype(float)
-                        pointsDataFrameMin['tasmin']                = pointsDataFrameMin['tasmin'] + varFactors[extType]
-                    else:
-                        pointsDataFrame[currentVariables[extType]]  = pointsDataFrame[currentVariables[extType]] * varFactors[extType]
-                    
-                    jobs = []
-                    for coordinates in selectedCoordinates:
-                        jobs.append([
-                            coordinates, pointsDataFrame, pointsDataFrameMin, extType, runPeriod, scenario, gcm, region, currentVariables, fullVarNames
-                        ])
-
-                    pool = multiprocessing.Pool(processes=variables.processes)
-                    pool.starmap_async(writeSWATPlusWeather, jobs)
-                    pool.close()
-                    pool.join()
-
-                    filesList = listFiles(f"../model-data/{region}/weather/swatplus/{scenario}/{gcm}/", extType)
-
-                    cliString = f"""{extType}.cli: {fullVarNames[extType]} file names - file written by Celray James CHAWANDA\nfilename\n""" + \
-                        "\n".join([f"{getFileBaseName(f)}" for f in filesList]) + "\n"
-                    
-                    writeFile(f"../model-data/{region}/weather/swatplus/{scenario}/{gcm}/{extType}.cli", cliString)
-                    print("\n\n")
\ No newline at end of file
+                for x, y, elevation in zip(xList, yList, elevations):
+                    selectedCoordinates.append(f"{float(x)},{float(y)},{None if numpy.isnan(elevation) else float(elevation)}")
+
+                regionCoordinates[region] = selectedCoordinates
+
+        if not exists(f"./resources/weather-lists/"):
+            os.system(f"unzip ./resources/weather-lists.zip -d ./resources")
+
+        # scenario x gcm x region work units: each scenario and gcm is downloaded once, then its
+        # regions (all of them in one unit with weather_multi_region) are prepared. the units
+        # share the processes, so their cdo and writer pools do not oversubscribe the cores
+        parallelUnits   = max(1, min(variables.weather_parallel_units, variables.processes))
+        unitProcesses   = max(1, variables.processes // parallelUnits)
+        regionGroups    = [regions] if variables.weather_multi_region else [[region] for region in regions]
+
+        # with bias correction the gcm scenarios also wait for the observed and historical series of their regions
+        observedGcm = variables.scenariosData['observed'][0]
+        tasks = {}
+        for scenario in variables.available_scenarios:
+            for gcm in variables.weather_pr_links_list[scenario]:
+                tasks[f"download {scenario}/{gcm}"] = (downloadWeather, (scenario, gcm), [])
+                for unitRegions in regionGroups:
+                    unitName        = ','.join(unitRegions)
+                    dependencies    = [f"download {scenario}/{gcm}"]
+                    if variables.weather_bias_correction and scenario != 'observed':
+                        dependencies.append(f"prepare observed/{observedGcm}/{unitName}")
+                        if scenario != 'historical': dependencies.append(f"prepare historical/{gcm}/{unitName}")
+
+                    tasks[f"prepare {scenario}/{gcm}/{unitName}"] = (
+                        prepareWeather, (scenario, gcm, unitRegions, regionCoordinates, regionBoxes, unitProcesses), dependencies)
+
+        # series that are not prepared in this run have to be in their stores already
+        tasks = {name: (function, args, [dependency for dependency in dependencies if dependency in tasks]) for name, (function, args, dependencies) in tasks.items()}
+
+        print(f"  > running {len(tasks)} weather tasks, {parallelUnits} at a time with {unitProcesses} processes each\n")
+        taskStatus = runTaskGraph(tasks, parallelUnits)
+
+        failedTasks = [name for name, status in taskStatus.items() if status != 'done']
+        if len(failedTasks) > 0:
+            print(f"\n! {len(failedTasks)} weather tasks did not finish: {', '.join(failedTasks)}")
+            sys.exit(1)
@@ -8,6 +8,7 @@ from shapely.wkt import loads
 from shapely.geometry import Point, Polygon
 
 import datavariables as variables
+from instrumentation import instrument_script
 
 def min_distance(point, lines):
     return lines.distance(point).min()
@@ -121,210 +122,212 @@ if len(args) < 3:
 version = args[1]
 region  = args[2]
 
-proj_auth = variables.final_proj_auth
-proj_code = variables.final_proj_code
+with instrument_script(region, version = version):
 
-channels_fn = f'../model-setup/CoSWATv{version}/{region}/Watershed/Shapes/dem-aster-{proj_auth.lower()}-{proj_code}channel/dem-aster-{proj_auth.upper()}-{proj_code}channel.shp'
-channels_fn = f'../model-setup/CoSWATv{version}/{region}/Watershed/Shapes/dem-aster-{proj_auth.lower()}-{proj_code}channel/dem-aster-{proj_auth.upper()}-{proj_code}channel.shp'
-grdc_shp_fn = f'../model-data/{region}/shapes/grdc_stations-{proj_auth.upper()}-{proj_code}.gpkg'
+    proj_auth = variables.final_proj_auth
+    proj_code = variables.final_proj_code
+
+    channels_fn = f'../model-setup/CoSWATv{version}/{region}/Watershed/Shapes/dem-aster-{proj_auth.lower()}-{proj_code}channel/dem-aster-{proj_auth.upper()}-{proj_code}channel.shp'
+    channels_fn = f'../model-setup/CoSWATv{version}/{region}/Watershed/Shapes/dem-aster-{proj_auth.lower()}-{proj_code}channel/dem-aster-{proj_auth.upper()}-{proj_code}channel.shp'
+    grdc_shp_fn = f'../model-data/{region}/shapes/grdc_stations-{proj_auth.upper()}-{proj_code}.gpkg'
 
 
-if not exists(channels_fn):
-    channels_fn = f'../model-setup/CoSWATv{version}/{region}/Watershed/Shapes/dem-aster-{proj_auth.upper()}-{proj_code}channel.shp'
     if not exists(channels_fn):
-        print(f"! the channels file ({file_name(channels_fn)}) was not found")
-        quit()
+        channels_fn = f'../model-setup/CoSWATv{version}/{region}/Watershed/Shapes/dem-aster-{proj_auth.upper()}-{proj_code}channel.shp'
+        if not exists(channels_fn):
+            print(f"! the channels file ({file_name(channels_fn)}) was not found")
+            quit()
 
-points_template_fn = f"../data-preparation/resources/outlet-template-{proj_auth}-{proj_code}.gpkg"
+    points_template_fn = f"../data-preparation/resources/outlet-template-{proj_auth}-{proj_code}.gpkg"
 
-channels_gdf = geopandas.read_file(channels_fn)
-points_template_gdf = geopandas.read_file(points_template_fn)
+    channels_gdf = geopandas.read_file(channels_fn)
+    points_template_gdf = geopandas.read_file(points_template_fn)
 
 
-points_template_gdf = points_template_gdf[0:0]
+    points_template_gdf = points_template_gdf[0:0]
 
 
-points = []
+    points = []
 
-workit = True
-while workit:
-    for index, row in channels_gdf.iterrows():
-        if not row['DSLINKNO'] == -1: continue
+    workit = True
+    while workit:
+        for index, row in channels_gdf.iterrows():
+            if not row['DSLINKNO'] == -1: continue
 
-        linestring = loads(str(row['geometry']))
-        if len(linestring.coords) < 3:
-            report("stepping inner due to short channel shenanigans")
+            linestring = loads(str(row['geometry']))
+            if len(linestring.coords) < 3:
+                report("stepping inner due to short channel shenanigans")
             
-            for indx_, rw in channels_gdf.iterrows():
-                if rw['DSLINKNO'] == row['LINKNO']:
-                    channels_gdf.loc[indx_, "DSLINKNO"] = -1
+                for indx_, rw in channels_gdf.iterrows():
+                    if rw['DSLINKNO'] == row['LINKNO']:
+                        channels_gdf.loc[indx_, "DSLINKNO"] = -1
 
-            channels_gdf.loc[index, "DSLINKNO"] = -99
-            workit = True
-            break
+                channels_gdf.loc[index, "DSLINKNO"] = -99
+                workit = True
+                break
 
-        point_coords = linestring.coords[1]
-        report(f"processing channel {row['LINKNO']}{' ' * 30}")
+            point_coords = linestring.coords[1]
+            report(f"processing channel {row['LINKNO']}{' ' * 30}")
 
-        list_of_points = [float(x) for x in point_coords]
+            list_of_points = [float(x) for x in point_coords]
 
-        if not list_of_points in points:
-            points.append(list_of_points)
-        workit = False
+            if not list_of_points in points:
+                points.append(list_of_points)
+            workit = False
 
 
-# fetch more points using the grdc dataset
-grdc_point_gdf      = geopandas.read_file(grdc_shp_fn)
+    # fetch more points using the grdc dataset
+    grdc_point_gdf      = geopandas.read_file(grdc_shp_fn)
 
-grdc_point_gdf['min_dist_to_lines'] = grdc_point_gdf.geometry.apply(min_distance, args=(channels_gdf,))
+    grdc_point_gdf['min_dist_to_lines'] = grdc_point_gdf.geometry.apply(min_distance, args=(channels_gdf,))
 
-re_evaluate = True
+    re_evaluate = True
 
-print('\n\t> dropping points')
-checked_indices = []
-while re_evaluate:
-    re_evaluate = False
-    for index, row in grdc_point_gdf.iterrows():
-        if index in checked_indices:
-            continue
+    print('\n\t> dropping points')
+    checked_indices = []
+    while re_evaluate:
+        re_evaluate = False
+        for index, row in grdc_point_gdf.iterrows():
+            if index in checked_indices:
+                continue
 
-        checked_indices.append(index)
-        if row.min_dist_to_lines > variables.channel_snap_thres:
-            grdc_point_gdf = grdc_point_gdf.drop(index)
-            report(f"dropping {row.grdc_no}      ")
-            re_evaluate = True
-            break
+            checked_indices.append(index)
+            if row.min_dist_to_lines > variables.channel_snap_thres:
+                grdc_point_gdf = grdc_point_gdf.drop(index)
+                report(f"dropping {row.grdc_no}      ")
+                re_evaluate = True
+                break
 
-grdc_point_gdf['X'] = grdc_point_gdf.geometry.x
-grdc_point_gdf['Y'] = grdc_point_gdf.geometry.y
+    grdc_point_gdf['X'] = grdc_point_gdf.geometry.x
+    grdc_point_gdf['Y'] = grdc_point_gdf.geometry.y
 
 
-print(f'\n\t> removing points that are too close to another')
-# get closest points
-kept_points    = []
-skipped_points  = []
+    print(f'\n\t> removing points that are too close to another')
+    # get closest points
+    kept_points    = []
+    skipped_points  = []
 
-for index, row in grdc_point_gdf.iterrows():
-    if row.name in skipped_points:
-        continue
-    if row.name in kept_points:
-        continue
+    for index, row in grdc_point_gdf.iterrows():
+        if row.name in skipped_points:
+            continue
+        if row.name in kept_points:
+            continue
 
-    closest_points = []
-    for inner_idx, inner_row in grdc_point_gdf.iterrows():
-        if distance([inner_row.X, inner_row.Y], [row.X, row.Y]) <= variables.proximity_thres:
-            closest_points.append(inner_row)
+        closest_points = []
+        for inner_idx, inner_row in grdc_point_gdf.iterrows():
+            if distance([inner_row.X, inner_row.Y], [row.X, row.Y]) <= variables.proximity_thres:
+                closest_points.append(inner_row)
 
-    if len(closest_points) >= 2:
-        kept_index          = closest_points[0].name
-        kept_index_dist     = closest_points[0].min_dist_to_lines
+        if len(closest_points) >= 2:
+            kept_index          = closest_points[0].name
+            kept_index_dist     = closest_points[0].min_dist_to_lines
 
-        for close_pt in closest_points:
-            if close_pt.min_dist_to_lines < kept_index_dist:
-                kept_index      = close_pt.name
-                kept_index_dist = close_pt.min_dist_to_lines            
+            for close_pt in closest_points:
+                if close_pt.min_dist_to_lines < kept_index_dist:
+                    kept_index      = close_pt.name
+                    kept_index_dist = close_pt.min_dist_to_lines            
 
-        kept_points.append(kept_index)
+            kept_points.append(kept_index)
 
-        for close_pt in closest_points:
-            if (not close_pt.name in skipped_points) and (not close_pt.name in kept_points):
-                skipped_points.append(close_pt.name)
-    else:
-        kept_points.append(index)
+            for close_pt in closest_points:
+                if (not close_pt.name in skipped_points) and (not close_pt.name in kept_points):
+                    skipped_points.append(close_pt.name)
+        else:
+            kept_points.append(index)
 
 
 
-for index in skipped_points:
-    grdc_point_gdf = grdc_point_gdf.drop(index)
+    for index in skipped_points:
+        grdc_point_gdf = grdc_point_gdf.drop(index)
 
 
-grdc_point_gdf.reset_index(inplace=True)
-channels_gdf.reset_index(inplace=True)
+    grdc_point_gdf.reset_index(inplace=True)
+    channels_gdf.reset_index(inplace=True)
 
 
-print('\t> attaching points to channels')
-# find cloest feature
+    print('\t> attaching points to channels')
+    # find cloest feature
 
-close_features = {}
+    close_features = {}
 
-for index, row in grdc_point_gdf.iterrows():
+    for index, row in grdc_point_gdf.iterrows():
     
-    close_features[row.name]    = None
-    current_distance            = None
+        close_features[row.name]    = None
+        current_distance            = None
 
-    for inner_index, inner_row in channels_gdf.iterrows():
-        if close_features[row.name] is None:
-            close_features[row.name] = inner_index
-            current_distance = inner_row.geometry.distance(row.geometry)
-        else:
-            if inner_row.geometry.distance(row.geometry) < current_distance:
+        for inner_index, inner_row in channels_gdf.iterrows():
+            if close_features[row.name] is None:
                 close_features[row.name] = inner_index
                 current_distance = inner_row.geometry.distance(row.geometry)
+            else:
+                if inner_row.geometry.distance(row.geometry) < current_distance:
+                    close_features[row.name] = inner_index
+                    current_distance = inner_row.geometry.distance(row.geometry)
 
 
-outlet_snap_data = []
+    outlet_snap_data = []
 
-print('\t> snapping points to channels safely')
-for index in close_features:
-    ref_x, ref_y = grdc_point_gdf.loc[index,:].geometry.coords.xy
+    print('\t> snapping points to channels safely')
+    for index in close_features:
+        ref_x, ref_y = grdc_point_gdf.loc[index,:].geometry.coords.xy
 
-    point_coords = [ref_x[0], ref_y[0]]
+        point_coords = [ref_x[0], ref_y[0]]
 
-    x_array, y_array = channels_gdf.loc[close_features[index],:].geometry.coords.xy
+        x_array, y_array = channels_gdf.loc[close_features[index],:].geometry.coords.xy
         
-    # print(channels_gdf.loc[close_features[index],:].LINKNO)
+        # print(channels_gdf.loc[close_features[index],:].LINKNO)
 
-    # print(ref_x,ref_y)
-    x_array = [coord_ for coord_ in x_array]
-    y_array = [coord_ for coord_ in y_array]
+        # print(ref_x,ref_y)
+        x_array = [coord_ for coord_ in x_array]
+        y_array = [coord_ for coord_ in y_array]
 
-    start_coords = [x_array[0], y_array[0]]
-    end_coords = [x_array[-1], y_array[-1]]
+        start_coords = [x_array[0], y_array[0]]
+        end_coords = [x_array[-1], y_array[-1]]
 
-    if len(x_array) < variables.minimum_channel_segments:
-        continue
+        if len(x_array) < variables.minimum_channel_segments:
+            continue
 
-    current_snap = [x_array[variables.start_index_value], y_array[variables.start_index_value]]
-    current_distance = distance(point_coords, current_snap)
+        current_snap = [x_array[variables.start_index_value], y_array[variables.start_index_value]]
+        current_distance = distance(point_coords, current_snap)
 
-    for i in range(variables.start_index_value, len(x_array) - variables.end_index_value):
-        if distance(point_coords, [x_array[i], y_array[i]]) < current_distance:
-            current_snap = [x_array[i], y_array[i]]
-            current_distance = distance(point_coords, current_snap)
+        for i in range(variables.start_index_value, len(x_array) - variables.end_index_value):
+            if distance(point_coords, [x_array[i], y_array[i]]) < current_distance:
+                current_snap = [x_array[i], y_array[i]]
+                current_distance = distance(point_coords, current_snap)
 
 
-    outlet_snap_data.append(current_snap)
+        outlet_snap_data.append(current_snap)
 
 
-# print()
-point_data = points_to_geodataframe(outlet_snap_data + points, auth = proj_auth, code = proj_code, out_shape = f'../model-setup/CoSWATv{version}/{region}/Watershed/Shapes/outlets_tmp.gpkg')
+    # print()
+    point_data = points_to_geodataframe(outlet_snap_data + points, auth = proj_auth, code = proj_code, out_shape = f'../model-setup/CoSWATv{version}/{region}/Watershed/Shapes/outlets_tmp.gpkg')
 
-# print()
-counter = 1
-for index, row in point_data.iterrows():
+    # print()
+    counter = 1
+    for index, row in point_data.iterrows():
 
-    report(f"processing point {index}       ")
+        report(f"processing point {index}       ")
     
-    new_row = {'PTSOURCE':0, 'RES': 0, 'INLET': 0, 'ID': counter, 'PointId': counter, 'geometry': row['geometry']}
-    new_row_df = pandas.DataFrame([new_row])
+        new_row = {'PTSOURCE':0, 'RES': 0, 'INLET': 0, 'ID': counter, 'PointId': counter, 'geometry': row['geometry']}
+        new_row_df = pandas.DataFrame([new_row])
 
-    points_template_gdf = geopandas.GeoDataFrame(pandas.concat([points_template_gdf, new_row_df], ignore_index=True), crs = points_template_gdf.crs, geometry='geometry')
+        points_template_gdf = geopandas.GeoDataFrame(pandas.concat([points_template_gdf, new_row_df], ignore_index=True), crs = points_template_gdf.crs, geometry='geometry')
 
-    # points_template_gdf = points_template_gdf.append(
-    #     {'PTSOURCE':0, 'RES': 0, 'INLET': 0, 'ID': counter, 'PointId': counter, 'geometry': row['geometry']},
-    #     ignore_index = True
-    # )
+        # points_template_gdf = points_template_gdf.append(
+        #     {'PTSOURCE':0, 'RES': 0, 'INLET': 0, 'ID': counter, 'PointId': counter, 'geometry': row['geometry']},
+        #     ignore_index = True
+        # )
 
-    counter += 1
+        counter += 1
 
-points_template_gdf.crs = f"{proj_auth}:{proj_code}".lower()
+    points_template_gdf.crs = f"{proj_auth}:{proj_code}".lower()
 
-lakesFN                 = geopandas.read_file(f'../model-setup/CoSWATv{version}/{region}/Watershed/Shapes/lakes-grand-{proj_auth}-{proj_code}.shp')
-buffered_polygons       = lakesFN.geometry.buffer(variables.data_resolution * 10)     # Create a buffer around the polygons
-union_buffer            = buffered_polygons.unary_union    # Combine all buffered polygons into a single geometry
+    lakesFN                 = geopandas.read_file(f'../model-setup/CoSWATv{version}/{region}/Watershed/Shapes/lakes-grand-{proj_auth}-{proj_code}.shp')
+    buffered_polygons       = lakesFN.geometry.buffer(variables.data_resolution * 10)     # Create a buffer around the polygons
+    union_buffer            = buffered_polygons.unary_union    # Combine all buffered polygons into a single geometry
 
-# Select points that are not within the buffered area
-points_template_gdf = points_template_gdf[~points_template_gdf.geometry.within(union_buffer)]
+    # Select points that are not within the buffered area
+    points_template_gdf = points_template_gdf[~points_template_gdf.geometry.within(union_buffer)]
 
-points_template_gdf.to_file(f'../model-setup/CoSWATv{version}/{region}/Watershed/Shapes/outlets.shp', driver = 'ESRI Shapefile')
-print()
+    points_template_gdf.to_file(f'../model-setup/CoSWATv{version}/{region}/Watershed/Shapes/outlets.shp', driver = 'ESRI Shapefile')
+    print()
@@ -16,6 +16,23 @@ processes                   = 20
 taudemProcesses             = 5
 no_data_value               = -999
 
+# model set up pipeline, the stages of all regions share these cores and memory
+pipeline_cores              = None     # None uses all cores of the machine
+pipeline_memory             = '64GB'
+pipeline_ledger             = '../model-setup/.pipeline/ledger.sqlite'   # stage status of all versions, see setup-status.py
+pipeline_lease_seconds      = 300      # a worker renews the lease of its stages every third of this, stages of a worker that is gone go to others
+pipeline_lease_attempts     = 3        # times a stage is leased to workers before it counts as failed
+pipeline_poll_seconds       = 10       # how often an idle worker looks for ready stages in the queue
+pipeline_spans              = '../model-setup/.pipeline/spans/{host}.jsonl'   # timing and resource spans of every script, None turns them off, see span-summary.py
+pipeline_stage_costs        = {        # cores and memory one stage of a region takes
+    'get-data'          : {'cores': processes,          'memory': '16GB'},  # cdo and writer pools of 'processes'
+    'init-model'        : {'cores': 1,                  'memory': '2GB'},
+    'run-qswatplus'     : {'cores': taudemProcesses,    'memory': '8GB'},   # TauDEM MPI ranks, then the QGIS HRUs
+    'edit-model'        : {'cores': 1,                  'memory': '2GB'},
+    'run-model'         : {'cores': 1,                  'memory': '2GB'},   # the SWAT+ executable
+    'evaluate-model'    : {'cores': 1,                  'memory': '2GB'},
+}
+
 # dem variables
 re_resample                 = False
 redownload_dem              = False
@@ -76,7 +93,27 @@ weather_resolution          = 0.5      # decimal degrees was 5
 
 prepare_weather             = True
 redo_weather                = False
-weather_redownload          = False
+weather_redownload          = False    # check downloaded files against the server sizes and complete or replace them
+weather_download_processes  = 4        # weather files downloaded at the same time
+weather_backend             = 'cdo'    # 'cdo' crops and merges files on disk, 'xarray' reads the downloaded files lazily in process
+weather_cdo_threads         = 1        # threads of each cdo job, the jobs themselves run 'processes' at a time
+weather_cdo_retries         = 2        # times a failed cdo job is run again before the unit fails
+weather_multi_region        = False    # extract the points of all requested regions in one pass over the weather files
+weather_store               = True     # keep the extracted series in ../model-data/{region}/weather/series/ for export-weather.py
+weather_incremental         = True     # skip regions whose inputs and period are unchanged since the last run, and only extract
+                                       # the new years when the period is extended (needs weather_store)
+weather_transport           = None     # how the pool of 'processes' weather writers gets the extracted arrays: None sends every
+                                       # writer a copy of its points, 'memmap' or 'shared_memory' share them once ('shared_memory'
+                                       # needs a /dev/shm larger than the arrays, docker run --shm-size, see data-collection.md)
+weather_parallel_units      = 1        # scenario x gcm x region weather units run at the same time, they share 'processes'
+weather_time_chunk          = 366      # days read at a time for all points of a region when extracting
+weather_space_chunk         = None     # lat/lon cells per dask chunk, None reads whole grid rows
+weather_dask_scheduler      = 'threads'# 'threads', 'processes' or 'synchronous' dask scheduler for reading the weather files
+weather_memory_limit        = None     # extraction memory per work unit (like '16GB'), the time window shrinks to fit. the whole
+                                       # series is still held, so a unit whose series is larger fails with a MemoryError
+weather_bias_correction     = False    # quantile map the gcm weather per point and month to the observed series, using the
+                                       # historical series of the gcm as reference (both need weather_store)
+weather_bias_quantiles      = 100      # quantiles of the bias correction
 
 # run settings
 run_period                  = '1981-1985'
@@ -0,0 +1,39 @@
+'''
+this module has the helpers the run ledger (pipeline.py) and the weather manifests
+(coswatFX.py) share to read memory sizes and to tell if files changed, so both
+read sizes and sign files the same way. it needs no gdal, so the pipeline can
+use it without the data preparation packages.
+
+Author  : Celray James CHAWANDA
+Contact : celray@chawanda.com
+Licence : MIT
+GitHub  : github.com/celray
+'''
+
+import os, re, hashlib
+
+
+def memory_size(size_):
+    '''
+    returns the bytes of a size like 16GB, 512MB or a number of bytes. None stays None
+    '''
+    if size_ is None or isinstance(size_, (int, float)): return size_
+
+    match = re.fullmatch(r'\s*([\d.]+)\s*([KMGT]?)i?B?\s*', str(size_), flags = re.IGNORECASE)
+    if match is None: raise ValueError(f"could not read the memory size {size_}")
+
+    return int(float(match.group(1)) * 1024 ** ' KMGT'.index(match.group(2).upper() or ' '))
+
+
+def files_signature(files_, base_dir_ = None):
+    '''
+    returns a signature of the size and modification time of the files, without reading them.
+    relative file names are looked up in base_dir_ when given, the signature uses the names as given
+    '''
+    md5 = hashlib.md5()
+    for file_name in files_:
+        path  = file_name if base_dir_ is None else os.path.join(base_dir_, file_name)
+        state = os.stat(path) if os.path.exists(path) else None
+        md5.update(f"{file_name},{'missing' if state is None else f'{state.st_size},{state.st_mtime_ns}'}\n".encode())
+
+    return md5.hexdigest()
@@ -0,0 +1,214 @@
+'''
+this module records how long the stages of the scripts take and what they use
+as spans, one json line per stage of a region in pipeline_spans (a file per
+machine, so workers on several machines do not write to the same file).
+
+a span has the stage, region, start, seconds, cpu seconds of the process and of
+the child processes it waited for, peak rss and the bytes read from and written
+to disk. rusage is per process, so spans of threads that run at the same time
+share their cpu and bytes, and the peak rss is the peak of the process so far.
+
+spans nest: the span of a script is the parent of its spans and of the spans of
+the scripts it starts, and every span of one run of set-up-model.py (or of any
+script started on its own) has the same run id. span-summary.py ranks the
+slowest regions and stages of a run.
+
+Author  : Celray James CHAWANDA
+Contact : celray@chawanda.com
+Licence : MIT
+GitHub  : github.com/celray
+'''
+
+import os, sys, glob, json, time, uuid, socket, threading, subprocess
+from datetime import datetime
+from contextlib import contextmanager
+
+try: import resource
+except ImportError: resource = None     # windows has no rusage, spans only have times there
+
+import datavariables as variables
+
+scripts_dir     = os.path.dirname(os.path.realpath(__file__))
+open_spans      = threading.local()
+failed_writes   = 0     # spans that could not be written, only the first failure is reported
+
+
+def spans_file(host_ = None):
+    '''
+    returns the spans file of a machine, None when spans are turned off. COSWAT_SPANS overrides pipeline_spans
+    '''
+    file_name = os.environ.get('COSWAT_SPANS', getattr(variables, 'pipeline_spans', None))
+    if not file_name: return None
+
+    return os.path.join(scripts_dir, file_name.format(host = host_ if host_ else socket.gethostname()))
+
+
+def run_id():
+    '''
+    returns the id of the run this process belongs to, made by the first script of the run and passed on to the scripts it starts
+    '''
+    if not 'COSWAT_RUN' in os.environ:
+        os.environ['COSWAT_RUN'] = f"{datetime.now().strftime('%Y%m%dT%H%M%S')}-{socket.gethostname()}-{os.getpid()}"
+
+    return os.environ['COSWAT_RUN']
+
+
+def process_usage():
+    '''
+    returns the cpu seconds, cpu seconds of the waited for child processes, peak rss bytes and
+    bytes read and written of this process so far
+    '''
+    if resource is None: return {'cpu_seconds': 0.0, 'child_cpu_seconds': 0.0, 'peak_rss': 0, 'read_bytes': 0, 'written_bytes': 0}
+
+    own         = resource.getrusage(resource.RUSAGE_SELF)
+    children    = resource.getrusage(resource.RUSAGE_CHILDREN)
+    rss_unit    = 1 if sys.platform == 'darwin' else 1024
+
+    return {
+        'cpu_seconds'       : own.ru_utime + own.ru_stime,
+        'child_cpu_seconds' : children.ru_utime + children.ru_stime,
+        'peak_rss'          : max(own.ru_maxrss, children.ru_maxrss) * rss_unit,
+        'read_bytes'        : (own.ru_inblock + children.ru_inblock) * 512,
+        'written_bytes'     : (own.ru_oublock + children.ru_oublock) * 512,
+    }
+
+
+def write_span(record_):
+    '''
+    appends a span to the spans file of this machine. a line is written in one call, so
+    processes of the machine can share the file. spans never stop a run, failures are reported once
+    '''
+    file_name = spans_file()
+    if file_name is None: return
+
+    try:
+        os.makedirs(os.path.dirname(file_name), exist_ok = True)
+        descriptor = os.open(file_name, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o664)
+        try: os.write(descriptor, (json.dumps(record_) + '\n').encode())
+        finally: os.close(descriptor)
+    except OSError as error:
+        global failed_writes
+        if failed_writes == 0: print(f"\t! could not write spans to {file_name}: {error}")
+        failed_writes += 1
+
+
+def open_span(stage_, region_ = None, **fields_):
+    '''
+    starts a span, the parent is the innermost open span of this thread or else the span of the script.
+    returns the span record, fields set on it before close_span are kept
+    '''
+    stack   = open_spans.__dict__.setdefault('stack', [])
+    record  = {
+        'run'       : run_id(),
+        'id'        : uuid.uuid4().hex[:16],
+        'parent'    : stack[-1]['id'] if len(stack) > 0 else os.environ.get('COSWAT_SPAN_PARENT'),
+        'stage'     : stage_,
+        'region'    : region_,
+        'script'    : os.path.basename(sys.argv[0]) if len(sys.argv) > 0 else None,
+        'host'      : socket.gethostname(),
+        'pid'       : os.getpid(),
+        'start'     : datetime.now().isoformat(timespec = 'milliseconds'),
+        **fields_,
+    }
+    stack.append(record)
+
+    return record, time.perf_counter(), process_usage()
+
+
+def close_span(span_, status_ = 'done'):
+    '''
+    ends a span from open_span and writes it. usage a caller measured itself (like the rusage
+    of a child process) is kept, the rest is the change of the usage of this process
+    '''
+    record, start, before = span_
+    after = process_usage()
+
+    record['seconds'] = round(time.perf_counter() - start, 3)
+    record['status']  = record.get('status', status_)
+    for key in ['cpu_seconds', 'child_cpu_seconds', 'read_bytes', 'written_bytes']:
+        if not key in record: record[key] = round(after[key] - before[key], 3) if 'seconds' in key else after[key] - before[key]
+    if not 'peak_rss' in record: record['peak_rss'] = after['peak_rss']
+
+    stack = open_spans.__dict__.setdefault('stack', [])
+    stack[:] = [opened for opened in stack if not opened is record]
+
+    write_span(record)
+    return record
+
+
+@contextmanager
+def span(stage_, region_ = None, **fields_):
+    '''
+    records the code of a with block as a span of a stage of a region, failed when it raises
+    (a SystemExit keeps its exit_code and only fails with an error code).
+    yields the span record, so the block can add fields to it (like the number of points)
+    '''
+    opened = open_span(stage_, region_, **fields_)
+    status = 'failed'
+    try:
+        yield opened[0]
+        status = 'done'
+    except SystemExit as error:
+        # sys.exit('message') exits with 1
+        opened[0]['exit_code'] = 0 if error.code is None else error.code if isinstance(error.code, int) else 1
+        status = 'done' if opened[0]['exit_code'] == 0 else 'failed'
+        raise
+    finally:
+        close_span(opened, status)
+
+
+@contextmanager
+def instrument_script(region_ = None, **fields_):
+    '''
+    records the with block around the main code of a script as a span named after the script,
+    failed when it raises or exits with an error code. the scripts it starts get it as their parent
+    '''
+    stage = os.path.splitext(os.path.basename(sys.argv[0]))[0] if len(sys.argv) > 0 else 'python'
+    with span(stage, region_, argv = sys.argv[1:], **fields_) as record:
+        os.environ['COSWAT_SPAN_PARENT'] = record['id']
+        yield record
+
+
+def run_process(command_, stage_, region_ = None, fields_ = None, **popen_):
+    '''
+    runs a command as a span of a stage with the cpu, peak rss and bytes of the child process itself
+    (from wait4), so commands run by threads at the same time are measured apart. the command gets
+    the span as the parent of its own spans.
+    returns the return code
+    '''
+    opened  = open_span(stage_, region_, **(fields_ or {}))
+    popen_['env'] = dict(popen_.get('env') or os.environ, COSWAT_SPAN_PARENT = opened[0]['id'], COSWAT_RUN = run_id())
+
+    returncode = -1
+    try:
+        process = subprocess.Popen(command_, **popen_)
+        if hasattr(os, 'wait4'):
+            pid, status, usage = os.wait4(process.pid, 0)
+            process.returncode = os.waitstatus_to_exitcode(status)
+            opened[0].update({'cpu_seconds': 0.0, 'child_cpu_seconds': round(usage.ru_utime + usage.ru_stime, 3),
+                'peak_rss': usage.ru_maxrss * (1 if sys.platform == 'darwin' else 1024), 'read_bytes': usage.ru_inblock * 512, 'written_bytes': usage.ru_oublock * 512})
+        returncode = process.wait()
+    finally:
+        opened[0]['returncode'] = returncode
+        close_span(opened, 'done' if returncode == 0 else 'failed')
+
+    return returncode
+
+
+def read_spans(files_ = None):
+    '''
+    returns the spans of the given files, by default of all machines, in the order they ended
+    '''
+    if files_ is None:
+        pattern = spans_file('*')
+        files_  = [] if pattern is None else sorted(glob.glob(pattern))
+
+    spans = []
+    for file_name in files_:
+        with open(file_name) as spans_lines:
+            for line in spans_lines:
+                # a line cut by a machine that went down is skipped
+                try: spans.append(json.loads(line))
+                except json.JSONDecodeError: continue
+
+    return spans
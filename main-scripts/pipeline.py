@@ -0,0 +1,523 @@
+'''
+this module runs the model set up stages of the regions (get-data, init-model,
+run-qswatplus, edit-model, run-model and evaluate-model) as a pipeline.
+
+every stage of a region is a task with the files it reads and writes. a stage
+is skipped while its outputs exist and its inputs and command are the ones of
+its last successful run, a failed stage stops the stages that depend on it, and
+the wall time of every stage is reported. the stage scripts run as child
+processes, so QGIS, GDAL and SWAT+ stay out of the process that schedules them.
+
+every stage type has a cost in cores and memory (pipeline_stage_costs). stages
+of all regions are packed under one core and memory budget, the stages of the
+largest regions first so the long ones do not start last.
+
+the status, times, input signature and outputs of every region, version and
+stage are kept in a sqlite ledger (pipeline_ledger). a run that stopped is
+resumed from it, and setup-status.py lists the stages that failed or stalled.
+
+the ledger also holds a queue of tasks (submit_tasks) that workers on several
+machines sharing the model folders run (run_worker). a worker leases the ready
+tasks that fit on its machine and renews the leases while they run, so the
+tasks of a worker that is gone are leased to another one when their lease runs out.
+
+Author  : Celray James CHAWANDA
+Contact : celray@chawanda.com
+Licence : MIT
+GitHub  : github.com/celray
+'''
+
+import os, sys, json, time, socket, sqlite3, hashlib, threading, subprocess
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+import datavariables as variables
+from instrumentation import run_process
+from filestate import memory_size, files_signature
+
+scripts_dir = os.path.dirname(os.path.realpath(__file__))
+
+
+def region_size(region_):
+    '''
+    returns the size of a region to order the regions by: the bytes of its dem when it
+    has been prepared, else of its land mass cutline, 0 when it has neither yet
+    '''
+    details = {'region': region_, 'auth': variables.final_proj_auth, 'code': variables.final_proj_code}
+    for file_name in [
+            "../model-data/{region}/raster/dem-aster-{auth}-{code}.tif".format(**details),
+            "../data-preparation/resources/regions/{region}/land_mass-{auth}-{code}.gpkg".format(**details)]:
+        path = os.path.join(scripts_dir, file_name)
+        if os.path.exists(path): return os.path.getsize(path)
+
+    return 0
+
+
+def region_stages(region_, version_, period_, get_data_ = True):
+    '''
+    returns the stages of a region as {task name: task}, in the order they run.
+    a task is {'region', 'version', 'stage', 'command', 'inputs', 'outputs', 'depends', 'cores',
+    'memory', 'priority'}, with paths relative to main-scripts, depends holding the task
+    names it needs, the cost of the stage type and the size of the region as priority
+    '''
+    details     = {'region': region_, 'auth': variables.final_proj_auth, 'code': variables.final_proj_code}
+    model_dir   = f'../model-setup/CoSWATv{version_}/{region_}'
+    data_dir    = f'../model-data/{region_}'
+    txtinout    = f'{model_dir}/Scenarios/Default/TxtInOut'
+
+    data_files  = [
+        f"{data_dir}/raster/dem-aster-{details['auth']}-{details['code']}.tif",
+        f"{data_dir}/raster/landuse-esa-{variables.esa_landuse_year}-{details['auth']}-{details['code']}.tif",
+        f"{data_dir}/raster/soils-fao-{details['auth']}-{details['code']}.tif",
+        f"{data_dir}/shapes/lakes-grand-{details['auth']}-{details['code']}.shp",
+    ]
+
+    # get-data also writes the weather files of every scenario and gcm that edit-model and run-model read
+    weather_files = []
+    if variables.prepare_weather:
+        weather_files = [f"{data_dir}/weather/swatplus/{scenario}/{gcm}/pcp.cli" for scenario in variables.available_scenarios for gcm in variables.weather_pr_links_list.get(scenario, {})]
+
+    stages = [
+        ('get-data',        ['../data-preparation/get-data.py', region_],
+            [f"../data-preparation/resources/regions/{region_}/land_mass-{details['auth']}-{details['code']}.gpkg"], data_files + weather_files),
+        ('init-model',      ['init-model.py', region_, '--v', version_],
+            data_files, [f'{model_dir}/{region_}.qgs']),
+        ('run-qswatplus',   ['run-qswatplus.py', region_, '--v', version_],
+            [f'{model_dir}/{region_}.qgs'], [f'{model_dir}/{region_}.sqlite']),
+        ('edit-model',      ['edit-model.py', region_, '--v', version_],
+            [f'{model_dir}/{region_}.sqlite'], [f'{txtinout}/file.cio']),
+        ('run-model',       ['run-model.py', region_, '--v', version_, '--y', period_],
+            [f'{txtinout}/file.cio'], [f'{txtinout}/channel_sdmorph_mon.txt', f'{txtinout}/hru_wb_aa.txt']),
+        ('evaluate-model',  ['evaluate-model.py', region_, '--v', version_],
+            [f'{txtinout}/channel_sdmorph_mon.txt'], [f'{model_dir}/Evaluation/Text/grdc_observations_lookup.csv']),
+    ]
+
+    if not get_data_: stages = stages[1:]
+
+    tasks       = {}
+    previous    = None
+    priority    = region_size(region_)
+    for stage, command, inputs, outputs in stages:
+        cost = variables.pipeline_stage_costs.get(stage, {'cores': 1, 'memory': 0})
+        tasks[f'{region_}:{stage}'] = {
+            'region'    : region_,
+            'version'   : version_,
+            'stage'     : stage,
+            'command'   : [sys.executable] + command,
+            'inputs'    : inputs,
+            'outputs'   : outputs,
+            'depends'   : [] if previous is None else [previous],
+            'cores'     : int(cost['cores']),
+            'memory'    : memory_size(cost['memory']),
+            'priority'  : priority,
+        }
+        previous = f'{region_}:{stage}'
+
+    return tasks
+
+
+def task_signature(task_):
+    '''
+    returns the signature a successful run of a task is recorded with: its command and the state of its inputs
+    '''
+    return hashlib.md5(f"{' '.join(task_['command'][1:])}\n{files_signature(task_['inputs'], scripts_dir)}".encode()).hexdigest()
+
+
+def log_file(task_, state_dir_):
+    '''
+    returns the log file of a task in the state directory
+    '''
+    return os.path.join(scripts_dir, state_dir_, task_['region'], f"{task_['stage']}.log")
+
+
+def open_ledger(ledger_file_):
+    '''
+    opens the sqlite run ledger, with a row per region, version and stage holding the
+    status, times, input signature and outputs of the last run of the stage, and the
+    queue of tasks for workers with their status, lease and attempts
+    '''
+    path = os.path.join(scripts_dir, ledger_file_)
+    os.makedirs(os.path.dirname(path), exist_ok = True)
+
+    ledger = sqlite3.connect(path, timeout = 60)
+    ledger.execute('''CREATE TABLE IF NOT EXISTS stages (
+        region TEXT, version TEXT, stage TEXT, status TEXT, started TEXT, finished TEXT, seconds REAL,
+        signature TEXT, outputs TEXT, message TEXT, host TEXT, pid INTEGER,
+        PRIMARY KEY (region, version, stage))''')
+    ledger.execute('''CREATE TABLE IF NOT EXISTS queue (
+        version TEXT, name TEXT, task TEXT, status TEXT, worker TEXT, lease_until REAL, attempts INTEGER, message TEXT,
+        PRIMARY KEY (version, name))''')
+    ledger.commit()
+
+    return ledger
+
+
+def ledger_record(ledger_, task_, **values_):
+    '''
+    writes the given columns of the ledger row of a task, creating the row if needed
+    '''
+    key     = {'region': task_['region'], 'version': task_['version'], 'stage': task_['stage']}
+    columns = {**key, **values_}
+    ledger_.execute(
+        f"INSERT INTO stages ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))}) "
+        f"ON CONFLICT (region, version, stage) DO UPDATE SET {', '.join(f'{column} = excluded.{column}' for column in values_)}",
+        list(columns.values()))
+    ledger_.commit()
+
+
+def up_to_date(task_, ledger_):
+    '''
+    checks if the outputs of a task exist and the ledger has a successful run of it with the current inputs and command
+    '''
+    row = ledger_.execute("SELECT status, signature FROM stages WHERE region = ? AND version = ? AND stage = ?",
+        [task_['region'], task_['version'], task_['stage']]).fetchone()
+
+    if row is None or row[0] != 'done': return False
+    if not all(os.path.exists(os.path.join(scripts_dir, output)) for output in task_['outputs']): return False
+
+    return row[1] == task_signature(task_)
+
+
+def process_alive(pid_):
+    '''
+    checks if a process of this machine is still running
+    '''
+    try: os.kill(pid_, 0)
+    except ProcessLookupError: return False
+    except (PermissionError, OSError): return True
+    return True
+
+
+def stalled_stages(ledger_, stall_hours_ = None):
+    '''
+    returns the ledger rows (region, version, stage, started, host, pid) of the stages left running
+    by a run that is gone: its process is not alive on this machine, or it started more than
+    stall_hours_ ago on any machine
+    '''
+    stalled = []
+    rows    = ledger_.execute("SELECT region, version, stage, started, host, pid FROM stages WHERE status = 'running' ORDER BY started").fetchall()
+    for region, version, stage, started, host, pid in rows:
+        hours = (datetime.now() - datetime.fromisoformat(started)).total_seconds() / 3600
+        if (host == socket.gethostname() and not process_alive(pid)) or (not stall_hours_ is None and hours > stall_hours_):
+            stalled.append((region, version, stage, started, host, pid))
+
+    return stalled
+
+
+def run_stage(task_, state_dir_):
+    '''
+    runs the command of a task with its output going to the log of the task, recorded as a span
+    with the resources of the stage. a stage fails when it exits with an error or does not write its outputs.
+    returns (ok, seconds, message, signature of the inputs after the run)
+    '''
+    log_name = log_file(task_, state_dir_)
+    os.makedirs(os.path.dirname(log_name), exist_ok = True)
+
+    # threaded libraries in the stage get the cores it was given
+    threads     = str(max(1, task_.get('cores', 1)))
+    environment = dict(os.environ, OMP_NUM_THREADS = threads, OPENBLAS_NUM_THREADS = threads, MKL_NUM_THREADS = threads, GDAL_NUM_THREADS = threads)
+
+    start_time = datetime.now()
+    with open(log_name, 'w') as log:
+        try: returncode = run_process(task_['command'], task_['stage'], task_['region'], {'version': task_['version'], 'cores': task_.get('cores', 1)},
+            stdout = log, stderr = subprocess.STDOUT, cwd = scripts_dir, env = environment)
+        except OSError as error:
+            log.write(f'{error}\n')
+            returncode = -1
+    seconds = (datetime.now() - start_time).total_seconds()
+
+    if returncode != 0: return False, seconds, f'exited with {returncode}', None
+
+    missing = [output for output in task_['outputs'] if not os.path.exists(os.path.join(scripts_dir, output))]
+    if len(missing) > 0: return False, seconds, f"did not write {', '.join(missing)}", None
+
+    # the inputs are signed after the run because some stages update their inputs
+    return True, seconds, 'done', task_signature(task_)
+
+
+def run_pipeline(tasks_, cores_ = None, memory_ = None, state_dir_ = None, ledger_file_ = None, force_ = False):
+    '''
+    runs the tasks of region_stages, each as soon as the stages it depends on are done or up
+    to date and its cores and memory fit in what the running stages leave of cores_ (None for
+    all cores of the machine) and memory_ (None for no limit). ready stages start by the
+    priority of their region, largest first, and smaller ones fill the cores that are left.
+    a stage that costs more than the whole budget runs on its own.
+    force_ runs stages that are up to date again.
+    state_dir_ (relative to main-scripts) keeps the logs of the stages and ledger_file_ the
+    ledger, so a run that stopped goes on from the stages it had not finished.
+    returns {task name: {'status': 'done', 'up-to-date', 'failed' or 'blocked', 'seconds'}}
+    '''
+    state_dir_  = state_dir_ if state_dir_ else f'../model-setup/.pipeline/CoSWATv{variables.version}'
+    cores_      = cores_ if cores_ else (os.cpu_count() or 1)
+    memory_     = memory_size(memory_)
+    ledger      = open_ledger(ledger_file_ if ledger_file_ else variables.pipeline_ledger)
+    results     = {}
+    running     = {}
+
+    left = [f"{region}:{stage}" for region, version, stage, started, host, pid in stalled_stages(ledger) if f"{region}:{stage}" in tasks_]
+    if len(left) > 0: print(f"\t> resuming, an earlier run stopped during {', '.join(left)}")
+
+    def fits(task):
+        used_cores  = sum(tasks_[name].get('cores', 1) for name in running.values())
+        used_memory = sum(tasks_[name].get('memory', 0) for name in running.values())
+        if len(running) == 0: return True
+        if used_cores + task.get('cores', 1) > cores_: return False
+        return memory_ is None or used_memory + task.get('memory', 0) <= memory_
+
+    def schedule(pool):
+        # up-to-date and blocked stages settle at once and can free others, so look again until nothing changes
+        changed = True
+        while changed:
+            changed = False
+            ordered = sorted(tasks_.items(), key = lambda item: -item[1].get('priority', 0))
+            for name, task in ordered:
+                if name in results or name in running.values(): continue
+
+                if any(results.get(dependency, {}).get('status') in ['failed', 'blocked'] for dependency in task['depends']):
+                    print(f"\t! {name} blocked, a stage it depends on did not finish")
+                    results[name] = {'status': 'blocked', 'seconds': 0.0}
+                    ledger_record(ledger, task, status = 'blocked', started = None, finished = None, seconds = None, message = 'a stage it depends on did not finish')
+                    changed = True
+                elif all(results.get(dependency, {}).get('status') in ['done', 'up-to-date'] for dependency in task['depends']):
+                    if not force_ and up_to_date(task, ledger):
+                        print(f"\t> {name} is up to date")
+                        results[name] = {'status': 'up-to-date', 'seconds': 0.0}
+                        changed = True
+                    elif fits(task):
+                        print(f"\t> {name} started ({task.get('cores', 1)} cores, {task.get('memory', 0) / 1024 ** 3:.1f} GB)")
+                        ledger_record(ledger, task, status = 'running', started = datetime.now().isoformat(timespec = 'seconds'), finished = None, seconds = None,
+                            signature = None, outputs = json.dumps(task['outputs']), message = None, host = socket.gethostname(), pid = os.getpid())
+                        running[pool.submit(run_stage, task, state_dir_)] = name
+
+    with ThreadPoolExecutor(max_workers = max(1, len(tasks_))) as pool:
+        while True:
+            schedule(pool)
+            if len(running) == 0: break
+
+            finished, _ = wait(running, return_when = FIRST_COMPLETED)
+            for future in finished:
+                name = running.pop(future)
+                try: ok, seconds, message, signature = future.result()
+                except Exception as error: ok, seconds, message, signature = False, 0.0, str(error), None
+
+                results[name] = {'status': 'done' if ok else 'failed', 'seconds': seconds}
+                ledger_record(ledger, tasks_[name], status = results[name]['status'], finished = datetime.now().isoformat(timespec = 'seconds'),
+                    seconds = seconds, signature = signature, message = message)
+
+                if ok: print(f"\t> {name} done in {seconds:.1f} s")
+                else: print(f"\t! {name} failed after {seconds:.1f} s: {message}, see {log_file(tasks_[name], state_dir_)}")
+
+    ledger.close()
+    return results
+
+
+def report_pipeline(tasks_, results_):
+    '''
+    prints the status and wall time of every stage, per region
+    '''
+    print(f"\n{'region':<30}{'stage':<18}{'status':<12}{'cores':>6}{'seconds':>10}")
+    for name, task in tasks_.items():
+        result = results_.get(name, {'status': 'not run', 'seconds': 0.0})
+        print(f"{task['region']:<30}{task['stage']:<18}{result['status']:<12}{task.get('cores', 1):>6}{result['seconds']:>10.1f}")
+    print()
+
+
+def submit_tasks(tasks_, ledger_file_ = None):
+    '''
+    puts the tasks of region_stages in the queue of the ledger for run_worker. tasks that
+    are queued or leased stay as they are, the others are queued again.
+    returns the number of tasks queued
+    '''
+    ledger = open_ledger(ledger_file_ if ledger_file_ else variables.pipeline_ledger)
+    queued = 0
+
+    ledger.execute('BEGIN IMMEDIATE')
+    for name, task in tasks_.items():
+        row = ledger.execute("SELECT status FROM queue WHERE version = ? AND name = ?", [task['version'], name]).fetchone()
+        if not row is None and row[0] in ['queued', 'leased']: continue
+
+        ledger.execute("INSERT OR REPLACE INTO queue (version, name, task, status, worker, lease_until, attempts, message) VALUES (?, ?, ?, 'queued', NULL, NULL, 0, NULL)",
+            [task['version'], name, json.dumps(task)])
+        queued += 1
+    ledger.commit()
+
+    ledger.close()
+    return queued
+
+
+def claim_task(ledger_, worker_, cores_, memory_, running_, lease_seconds_, attempts_):
+    '''
+    leases the next ready task of the queue to a worker: the task of the largest region whose
+    stages it depends on are done and whose cores and memory fit in what running_ ({task name:
+    task} the worker runs) leaves of cores_ and memory_. tasks whose lease ran out, because their
+    worker is gone, are queued again or fail after attempts_ leases, and the tasks after a failed
+    stage are blocked. this happens in one transaction, so two workers never lease the same task.
+    returns (task name, task) or None when no task is ready
+    '''
+    now     = time.time()
+    settled = []
+
+    ledger_.execute('BEGIN IMMEDIATE')
+    try:
+        rows    = ledger_.execute("SELECT version, name, task, status, worker, lease_until, attempts FROM queue").fetchall()
+        tasks   = {(version, name): json.loads(task) for version, name, task, status, worker, lease_until, attempts in rows}
+        status  = {(version, name): state for version, name, task, state, worker, lease_until, attempts in rows}
+
+        for version, name, task, state, worker, lease_until, attempts in rows:
+            if state != 'leased' or lease_until >= now: continue
+
+            state   = 'failed' if attempts >= attempts_ else 'queued'
+            message = f'the lease of {worker} ran out ({attempts} of {attempts_} attempts)'
+            ledger_.execute("UPDATE queue SET status = ?, worker = NULL, lease_until = NULL, message = ? WHERE version = ? AND name = ?", [state, message, version, name])
+            status[(version, name)] = state
+            print(f"\t! {name} {'failed' if state == 'failed' else 'queued again'}, {message}")
+            if state == 'failed': settled.append((tasks[(version, name)], {'status': 'failed', 'finished': datetime.now().isoformat(timespec = 'seconds'), 'message': message}))
+
+        # a task that is not in the queue has nothing to wait for
+        def dependencies(key):
+            return [status.get((key[0], dependency), 'done') for dependency in tasks[key]['depends']]
+
+        changed = True
+        while changed:
+            changed = False
+            for key, state in status.items():
+                if state == 'queued' and any(dependency in ['failed', 'blocked'] for dependency in dependencies(key)):
+                    message = 'a stage it depends on did not finish'
+                    ledger_.execute("UPDATE queue SET status = 'blocked', message = ? WHERE version = ? AND name = ?", [message, key[0], key[1]])
+                    status[key] = 'blocked'
+                    settled.append((tasks[key], {'status': 'blocked', 'started': None, 'finished': None, 'seconds': None, 'message': message}))
+                    changed = True
+
+        used_cores  = sum(task.get('cores', 1) for task in running_.values())
+        used_memory = sum(task.get('memory', 0) for task in running_.values())
+        claimed     = None
+        ready       = [key for key, state in status.items() if state == 'queued' and all(dependency == 'done' for dependency in dependencies(key))]
+        for key in sorted(ready, key = lambda key: (-tasks[key].get('priority', 0), key)):
+            task = tasks[key]
+            if len(running_) > 0 and used_cores + task.get('cores', 1) > cores_: continue
+            if len(running_) > 0 and not memory_ is None and used_memory + task.get('memory', 0) > memory_: continue
+
+            ledger_.execute("UPDATE queue SET status = 'leased', worker = ?, lease_until = ?, attempts = attempts + 1, message = NULL WHERE version = ? AND name = ?",
+                [worker_, now + lease_seconds_, key[0], key[1]])
+            claimed = (key[1], task)
+            break
+
+        ledger_.commit()
+    except BaseException:
+        ledger_.rollback()
+        raise
+
+    for task, values in settled: ledger_record(ledger_, task, **values)
+    return claimed
+
+
+def finish_task(ledger_, name_, task_, worker_, status_, message_):
+    '''
+    settles a task a worker leased as done or failed, unless its lease ran out and the queue
+    took it back meanwhile. returns True when the worker still held the lease
+    '''
+    cursor = ledger_.execute("UPDATE queue SET status = ?, lease_until = NULL, message = ? WHERE version = ? AND name = ? AND worker = ? AND status = 'leased'",
+        [status_, message_, task_['version'], name_, worker_])
+    ledger_.commit()
+
+    return cursor.rowcount == 1
+
+
+def renew_leases(ledger_file_, worker_, lease_seconds_, stop_):
+    '''
+    renews the leases of the tasks a worker runs every third of lease_seconds_ until stop_ is set
+    '''
+    ledger = open_ledger(ledger_file_)
+    while not stop_.wait(lease_seconds_ / 3):
+        try:
+            ledger.execute("UPDATE queue SET lease_until = ? WHERE worker = ? AND status = 'leased'", [time.time() + lease_seconds_, worker_])
+            ledger.commit()
+        except sqlite3.OperationalError as error:
+            print(f"\t! could not renew the leases of {worker_}: {error}")
+    ledger.close()
+
+
+def run_worker(cores_ = None, memory_ = None, state_dir_ = None, ledger_file_ = None, force_ = False, lease_seconds_ = None, attempts_ = None, poll_seconds_ = None):
+    '''
+    runs tasks from the queue of the ledger (see submit_tasks) until no task is queued or leased
+    any more. any number of workers, on this machine or others that share the model folders and
+    the ledger, lease the ready tasks that fit in their cores_ (None for all cores of the machine)
+    and memory_ (None for no limit), largest region first, and run them like run_pipeline.
+    a worker renews its leases while the tasks run, a task whose lease ran out for lease_seconds_
+    goes to another worker, up to attempts_ times. an idle worker looks for ready tasks every
+    poll_seconds_. force_ runs tasks that are up to date again. the logs go to state_dir_, by
+    default the pipeline folder of the version of each task.
+    returns ({task name: task}, {task name: result}) of the tasks this worker leased
+    '''
+    ledger_file_    = ledger_file_ if ledger_file_ else variables.pipeline_ledger
+    cores_          = cores_ if cores_ else (os.cpu_count() or 1)
+    memory_         = memory_size(memory_)
+    lease_seconds_  = lease_seconds_ if lease_seconds_ else variables.pipeline_lease_seconds
+    attempts_       = attempts_ if attempts_ else variables.pipeline_lease_attempts
+    poll_seconds_   = poll_seconds_ if poll_seconds_ else variables.pipeline_poll_seconds
+    worker          = f'{socket.gethostname()}:{os.getpid()}'
+    ledger          = open_ledger(ledger_file_)
+    tasks           = {}
+    results         = {}
+    running         = {}
+
+    def stage_dir(task):
+        return state_dir_ if state_dir_ else f"../model-setup/.pipeline/CoSWATv{task['version']}"
+
+    stop        = threading.Event()
+    heartbeat   = threading.Thread(target = renew_leases, args = (ledger_file_, worker, lease_seconds_, stop), daemon = True)
+    heartbeat.start()
+
+    print(f"\t> worker {worker} started ({cores_} cores, {'no' if memory_ is None else f'{memory_ / 1024 ** 3:.1f} GB'} memory limit)")
+    with ThreadPoolExecutor(max_workers = max(1, cores_)) as pool:
+        while True:
+            while True:
+                claimed = claim_task(ledger, worker, cores_, memory_, {name: tasks[name] for name in running.values()}, lease_seconds_, attempts_)
+                if claimed is None: break
+
+                # the command runs with the python of this machine
+                name, task  = claimed
+                task        = dict(task, command = [sys.executable] + task['command'][1:])
+                tasks[name] = task
+
+                if not force_ and up_to_date(task, ledger):
+                    print(f"\t> {name} is up to date")
+                    results[name] = {'status': 'up-to-date', 'seconds': 0.0}
+                    finish_task(ledger, name, task, worker, 'done', 'up to date')
+                    continue
+
+                print(f"\t> {name} started ({task.get('cores', 1)} cores, {task.get('memory', 0) / 1024 ** 3:.1f} GB)")
+                ledger_record(ledger, task, status = 'running', started = datetime.now().isoformat(timespec = 'seconds'), finished = None, seconds = None,
+                    signature = None, outputs = json.dumps(task['outputs']), message = None, host = socket.gethostname(), pid = os.getpid())
+                running[pool.submit(run_stage, task, stage_dir(task))] = name
+
+            if len(running) == 0:
+                if ledger.execute("SELECT COUNT(*) FROM queue WHERE status IN ('queued', 'leased')").fetchone()[0] == 0: break
+                time.sleep(poll_seconds_)
+                continue
+
+            # look for tasks that became ready on other workers while these run
+            finished, _ = wait(running, timeout = poll_seconds_, return_when = FIRST_COMPLETED)
+            for future in finished:
+                name = running.pop(future)
+                try: ok, seconds, message, signature = future.result()
+                except Exception as error: ok, seconds, message, signature = False, 0.0, str(error), None
+
+                results[name] = {'status': 'done' if ok else 'failed', 'seconds': seconds}
+                if not finish_task(ledger, name, tasks[name], worker, results[name]['status'], message):
+                    print(f"\t! {name} was taken back by the queue, the lease of {worker} ran out")
+                    results[name]['status'] = 'lease lost'
+                    continue
+
+                ledger_record(ledger, tasks[name], status = results[name]['status'], finished = datetime.now().isoformat(timespec = 'seconds'),
+                    seconds = seconds, signature = signature, message = message)
+
+                if ok: print(f"\t> {name} done in {seconds:.1f} s")
+                else: print(f"\t! {name} failed after {seconds:.1f} s: {message}, see {log_file(tasks[name], stage_dir(tasks[name]))}")
+
+    stop.set()
+    heartbeat.join()
+    ledger.close()
+
+    print(f"\t> worker {worker} stopped, the queue is empty")
+    return tasks, results
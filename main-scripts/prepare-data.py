@@ -19,33 +19,37 @@ import sys, os
 me = os.path.realpath(__file__)
 os.chdir(os.path.dirname(me))
 
+from instrumentation import instrument_script
 
-if len(sys.argv) >= 2: regions = sys.argv[1:]
-else: regions = listFolders("../data-preparation/resources/regions/")
-regions = [region for region in regions if not "test" in region]  # exclude global region
+with instrument_script():
 
-regions_ = ' '.join(regions)
 
-print(regions_)
+    if len(sys.argv) >= 2: regions = sys.argv[1:]
+    else: regions = listFolders("../data-preparation/resources/regions/")
+    regions = [region for region in regions if not "test" in region]  # exclude global region
 
-# create bounding boxes and land-mass masks used in next steps
-os.system(f"make-bounding-boxes.py {regions_}")
+    regions_ = ' '.join(regions)
 
-# create dem
-os.system(f"prepare-dem-aster.py {regions_}")
+    print(regions_)
 
-# create soil map based on dem
-os.system(f"prepare-soils.py {regions_}")
+    # create bounding boxes and land-mass masks used in next steps
+    os.system(f"make-bounding-boxes.py {regions_}")
 
-# create landuse map based on dem
-os.system(f"prepare-landuse.py {regions_}")
+    # create dem
+    os.system(f"prepare-dem-aster.py {regions_}")
 
-# create lake shapefile
-os.system(f"prepare-lakes-data.py {regions_}")
+    # create soil map based on dem
+    os.system(f"prepare-soils.py {regions_}")
 
-# create weather data
-os.system(f"prepare-weather.py {regions_}")
+    # create landuse map based on dem
+    os.system(f"prepare-landuse.py {regions_}")
 
-# get grdc stations
-os.system(f"get-grdc-stations.py {regions_}")
+    # create lake shapefile
+    os.system(f"prepare-lakes-data.py {regions_}")
+
+    # create weather data
+    os.system(f"prepare-weather.py {regions_}")
+
+    # get grdc stations
+    os.system(f"get-grdc-stations.py {regions_}")
 
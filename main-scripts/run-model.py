@@ -22,6 +22,7 @@ me = os.path.realpath(__file__)
 os.chdir(os.path.dirname(me))
 
 import datavariables as variables
+from instrumentation import instrument_script, span
 from resources.print_file import print_prt
 
 if __name__ == "__main__":
@@ -33,40 +34,42 @@ if __name__ == "__main__":
     parser.add_argument("--y", help="the years to run the model for. If not specified, the datavariables value will be used.", nargs='?', default=None)
 
     args = parser.parse_args()
-
-    # get years
-    if args.y is None: years = variables.run_period
-    else: years = args.y
-    yr_fro, yr_to = years.split("-")
-
-    # get model setup version
-    if args.v is None: version = variables.version
-    else: version = args.v  
-
-    if not exists(f"../model-setup/CoSWATv{version}"):
-        print(f'\t! the version, CoSWATv{version}, does not exist, the following versions are available:')
-        for v in list_folders('../model-setup/'):
-            if v.startswith('CoSWATv'):
-                print(f'\t\t- {v}')
-        print(f'\t> please specify a valid version using the --v argument')
-        sys.exit(1)
-
-    # get regions
-    if len(args.r) > 0: regions = args.r
-    else: regions = list_folders(f"../model-setup/CoSWATv{version}/")
-
-    for region in regions:
-        txtDir = f"{os.path.dirname(me)}/../model-setup/CoSWATv{version}/{region}/Scenarios/Default/TxtInOut"
-
-        write_to(f"{txtDir}/time.sim", f"time.sim: written by CoSWAT Data Writer\nday_start  yrc_start   day_end   yrc_end      step  \n       0      {yr_fro}         0      {yr_to}         0  ")
-        write_to(f"{txtDir}/print.prt", print_prt)
-        if exists(f"{txtDir}/file.cio"):
-            end_section = '\n' if platform.system() == 'Windows' else ''
-            print(f"\n\n# running SWAT+ for {region}{end_section}")
-            runSWATPlus(txtDir, executable_path = variables.executable_path, modelName = region)
-            if platform.system() == "Windows": print()
-        else:
-            print(f"\n\n! cannot run SWAT+ for {region}")
+    with instrument_script():
+
+        # get years
+        if args.y is None: years = variables.run_period
+        else: years = args.y
+        yr_fro, yr_to = years.split("-")
+
+        # get model setup version
+        if args.v is None: version = variables.version
+        else: version = args.v  
+
+        if not exists(f"../model-setup/CoSWATv{version}"):
+            print(f'\t! the version, CoSWATv{version}, does not exist, the following versions are available:')
+            for v in list_folders('../model-setup/'):
+                if v.startswith('CoSWATv'):
+                    print(f'\t\t- {v}')
+            print(f'\t> please specify a valid version using the --v argument')
+            sys.exit(1)
+
+        # get regions
+        if len(args.r) > 0: regions = args.r
+        else: regions = list_folders(f"../model-setup/CoSWATv{version}/")
+
+        for region in regions:
+            with span('run-model', region, version = version, period = years):
+                txtDir = f"{os.path.dirname(me)}/../model-setup/CoSWATv{version}/{region}/Scenarios/Default/TxtInOut"
+
+                write_to(f"{txtDir}/time.sim", f"time.sim: written by CoSWAT Data Writer\nday_start  yrc_start   day_end   yrc_end      step  \n       0      {yr_fro}         0      {yr_to}         0  ")
+                write_to(f"{txtDir}/print.prt", print_prt)
+                if exists(f"{txtDir}/file.cio"):
+                    end_section = '\n' if platform.system() == 'Windows' else ''
+                    print(f"\n\n# running SWAT+ for {region}{end_section}")
+                    runSWATPlus(txtDir, executable_path = variables.executable_path, modelName = region)
+                    if platform.system() == "Windows": print()
+                else:
+                    print(f"\n\n! cannot run SWAT+ for {region}")
     
 
 
@@ -131,6 +131,7 @@ from resources.QSWATPlus.QSWATUtils import QSWATUtils
 from resources.QSWATPlus.parameters import Parameters
 
 import datavariables as variables
+from instrumentation import instrument_script, span
 
 from glob import glob
 
@@ -178,188 +179,190 @@ if __name__ == '__main__':
     parser.add_argument("--v", help="the version of the model setup to use. If not specified, the datavariables value will be used.", nargs='?', default=None)
 
     args = parser.parse_args()
+    with instrument_script():
+
+        # get model setup version
+        if args.v is None: version = variables.version
+        else: version = args.v  
+
+        # get regions
+        if len(args.r) > 0: regions = args.r
+        else: regions = list_folders(f"../model-setup/CoSWATv{version}/")
+
+        if not exists(f"../model-setup/CoSWATv{version}"):
+            print(f'\t! the version, CoSWATv{version}, does not exist, the following versions are available:')
+            for v in list_folders('../model-setup/'):
+                if v.startswith('CoSWATv'):
+                    print(f'\t\t- {v}')
+            print(f'\t> please specify a valid version using the --v argument')
+            sys.exit(1)
+
+        print(f"\nregions to run: {', '.join(regions)}")
+        print(f"CoSWAT version: {version}")
 
-    # get model setup version
-    if args.v is None: version = variables.version
-    else: version = args.v  
-
-    # get regions
-    if len(args.r) > 0: regions = args.r
-    else: regions = list_folders(f"../model-setup/CoSWATv{version}/")
-
-    if not exists(f"../model-setup/CoSWATv{version}"):
-        print(f'\t! the version, CoSWATv{version}, does not exist, the following versions are available:')
-        for v in list_folders('../model-setup/'):
-            if v.startswith('CoSWATv'):
-                print(f'\t\t- {v}')
-        print(f'\t> please specify a valid version using the --v argument')
-        sys.exit(1)
-
-    print(f"\nregions to run: {', '.join(regions)}")
-    print(f"CoSWAT version: {version}")
-
-    for region in regions:
-        print(f'\n\nrunning QSWAT+ for region: {region} ({version})')
-        iface   = DummyInterface()
-        plugin  = QSWATPlus(iface)
-        dlg     = plugin._odlg  # useful shorthand for later
+        for region in regions:
+            with span('run-qswatplus', region, version = version):
+                print(f'\n\nrunning QSWAT+ for region: {region} ({version})')
+                iface   = DummyInterface()
+                plugin  = QSWATPlus(iface)
+                dlg     = plugin._odlg  # useful shorthand for later
         
-        projDir = f'../model-setup/CoSWATv{version}/{region}'
-        data_dir= f'../model-data/{region}'
+                projDir = f'../model-setup/CoSWATv{version}/{region}'
+                data_dir= f'../model-data/{region}'
 
-        if not os.path.exists(projDir):
-            QSWATUtils.error('Project directory {0} not found'.format(projDir), True)
-            sys.exit(1)
+                if not os.path.exists(projDir):
+                    QSWATUtils.error('Project directory {0} not found'.format(projDir), True)
+                    sys.exit(1)
 
-        projFile = f"{projDir}/{region}.qgs"
+                projFile = f"{projDir}/{region}.qgs"
 
-        proj = QgsProject.instance()
+                proj = QgsProject.instance()
         
-        proj.read(projFile)
+                proj.read(projFile)
 
-        plugin.setupProject(proj, True)
+                plugin.setupProject(proj, True)
 
-        # make connection and load tables
-        landuse_table   = f"{data_dir}/tables/worldLanduseLookup.csv"
-        soil_table      = f"{data_dir}/tables/worldSoilsLookup.csv"
-        user_soil_table = f"{data_dir}/tables/worldSoilsUsersoil.csv"
+                # make connection and load tables
+                landuse_table   = f"{data_dir}/tables/worldLanduseLookup.csv"
+                soil_table      = f"{data_dir}/tables/worldSoilsLookup.csv"
+                user_soil_table = f"{data_dir}/tables/worldSoilsUsersoil.csv"
 
-        landuse_df      = pandas.read_csv(landuse_table, names=["LANDUSE_ID", "SWAT_CODE"], skiprows=1)
-        soil_df         = pandas.read_csv(soil_table, names=["SOIL_ID", "NAME"], skiprows=1)
-        user_soil_df    = pandas.read_csv(user_soil_table)
+                landuse_df      = pandas.read_csv(landuse_table, names=["LANDUSE_ID", "SWAT_CODE"], skiprows=1)
+                soil_df         = pandas.read_csv(soil_table, names=["SOIL_ID", "NAME"], skiprows=1)
+                user_soil_df    = pandas.read_csv(user_soil_table)
 
-        user_soil_df            = user_soil_df.fillna("")
-        user_soil_df['SEQN']    = user_soil_df['SEQN'].astype(str)
+                user_soil_df            = user_soil_df.fillna("")
+                user_soil_df['SEQN']    = user_soil_df['SEQN'].astype(str)
 
-        db = sqlalchemy.create_engine(f'sqlite:///{projDir}/{region}.sqlite')
+                db = sqlalchemy.create_engine(f'sqlite:///{projDir}/{region}.sqlite')
 
-        landuse_df.to_sql('landuse_lookup', db, if_exists="replace", index=False)
-        soil_df.to_sql('soil_lookup', db, if_exists="replace", index=False)
-        user_soil_df.to_sql('usersoil', db, if_exists="replace", index=False, )
+                landuse_df.to_sql('landuse_lookup', db, if_exists="replace", index=False)
+                soil_df.to_sql('soil_lookup', db, if_exists="replace", index=False)
+                user_soil_df.to_sql('usersoil', db, if_exists="replace", index=False, )
 
-        plugin._gv.db.clearTable('BASINSDATA')
-        plugin.setupProject(proj, True)
+                plugin._gv.db.clearTable('BASINSDATA')
+                plugin.setupProject(proj, True)
 
-        if not (os.path.exists(plugin._gv.textDir) and os.path.exists(plugin._gv.landuseDir)):
-            QSWATUtils.error('Directories not created', True)
-            sys.exit(1)
+                if not (os.path.exists(plugin._gv.textDir) and os.path.exists(plugin._gv.landuseDir)):
+                    QSWATUtils.error('Directories not created', True)
+                    sys.exit(1)
 
-        if not dlg.delinButton.isEnabled():
-            QSWATUtils.error('Delineate button not enabled', True)
-            sys.exit(1)
+                if not dlg.delinButton.isEnabled():
+                    QSWATUtils.error('Delineate button not enabled', True)
+                    sys.exit(1)
 
-        delin = Delineation(plugin._gv, plugin._demIsProcessed)
-        delin.init()
-        delin._dlg.numProcesses.setValue(variables.taudemProcesses)
+                delin = Delineation(plugin._gv, plugin._demIsProcessed)
+                delin.init()
+                delin._dlg.numProcesses.setValue(variables.taudemProcesses)
 
-        QSWATUtils.information('DEM: {0}'.format(os.path.split(plugin._gv.demFile)[1]), True)
-        delin.addHillshade(plugin._gv.demFile, None, None, None)
-        QSWATUtils.information('Inlets/outlets file: {0}'.format(os.path.split(plugin._gv.outletFile)[1]), True)
+                QSWATUtils.information('DEM: {0}'.format(os.path.split(plugin._gv.demFile)[1]), True)
+                delin.addHillshade(plugin._gv.demFile, None, None, None)
+                QSWATUtils.information('Inlets/outlets file: {0}'.format(os.path.split(plugin._gv.outletFile)[1]), True)
 
-        outlets_buffer_gpd  = geopandas.read_file(f"../data-preparation/resources/regions/{region}/outlets-buffer.gpkg").to_crs('{auth}:{code}'.format(**details))
+                outlets_buffer_gpd  = geopandas.read_file(f"../data-preparation/resources/regions/{region}/outlets-buffer.gpkg").to_crs('{auth}:{code}'.format(**details))
         
-        delin.runTauDEM2(ver = version, reg = region,
-            in_outlet_path = os.path.abspath(f'../model-setup/CoSWATv{version}/{region}/Watershed/Shapes/outlets.shp'),
-            Mask_gpd    = outlets_buffer_gpd,
-            sel_file    = os.path.abspath(f'../model-setup/CoSWATv{version}/{region}/Watershed/Shapes/outlets_sel.shp')
-        )
-
-        lakesShapefn    = os.path.abspath(f'../model-setup/CoSWATv{version}/{region}/Watershed/Shapes/lakes-grand-{variables.final_proj_auth}-{variables.final_proj_code}.shp')
-        rivsShapefn     = os.path.abspath(f'../model-setup/CoSWATv{version}/{region}/Watershed/Shapes/dem-aster-{variables.final_proj_auth}-{variables.final_proj_code}channel.shp')
-
-        print("Running floodplain...")
-        createPath(f'../model-setup/CoSWATv{version}/{region}/Watershed/Rasters/Landscape/Flood/')
-        writeFile(f'../model-setup/CoSWATv{version}/{region}/Watershed/Rasters/Landscape/Flood/creatingFloodPlain', 'Creating floodplain...\nThis is just an indicator file\nit will be removed when the floodplain is created')
-        fxObj           = outFX('Running floodplain...')
-        floodPlain      = Floodplain(plugin._gv, fxObj, 1)
-        landScape       = Landscape(plugin._gv, fxObj, 1, fxObj)
-
-        landScape.clipperFile = plugin._gv.subbasinsFile
-        landScape.calcHillslopes(variables.thresholdCh, landScape.clipperFile, proj.layerTreeRoot())
-
-        landScape.calcFloodplain(True, proj.layerTreeRoot())
-        plugin._gv.floodFile = os.path.abspath(f'../model-setup/CoSWATv{version}/{region}/Watershed/Rasters/Landscape/Flood/invflood0_00.tif')
-        deleteFile(f'../model-setup/CoSWATv{version}/{region}/Watershed/Rasters/Landscape/Flood/creatingFloodPlain')
-
-        print("Filtering reservoirs...")
-        try:
-            clippedReservoirs = geopandas.read_file(lakesShapefn)
-            streams = geopandas.read_file(rivsShapefn)
-
-            # save a copy of the original reservoirs
-            clippedReservoirs.to_file(os.path.abspath(f'../model-setup/CoSWATv{version}/{region}/Watershed/Shapes/lakesOriginal.shp'))
-            streams.to_file(os.path.abspath(f'../model-setup/CoSWATv{version}/{region}/Watershed/Shapes/rivsOriginal.shp'))
-
-            # Ensure both datasets are in the same CRS
-            if clippedReservoirs.crs != streams.crs:
-                streams = streams.to_crs(clippedReservoirs.crs)
-
-            # Perform spatial join to find polygons that intersect with any line in streams
-            intersecting = geopandas.sjoin(clippedReservoirs, streams, how="inner", predicate="intersects")
-
-            # Get the indices of intersecting polygons
-            intersecting_indices = intersecting.index.unique()
-
-            # Remove the intersecting polygons from clippedReservoirs
-            clippedReservoirs = clippedReservoirs[clippedReservoirs.index.isin(intersecting_indices)]
-
-            lakesGDF = clippedReservoirs
-            lakes_to_remove = []
-
-            for index, stream in streams.iterrows():
-                start_point = Point(stream['geometry'].coords[0])
-                end_point = Point(stream['geometry'].coords[-1])
-                line = stream['geometry']
+                delin.runTauDEM2(ver = version, reg = region,
+                    in_outlet_path = os.path.abspath(f'../model-setup/CoSWATv{version}/{region}/Watershed/Shapes/outlets.shp'),
+                    Mask_gpd    = outlets_buffer_gpd,
+                    sel_file    = os.path.abspath(f'../model-setup/CoSWATv{version}/{region}/Watershed/Shapes/outlets_sel.shp')
+                )
+
+                lakesShapefn    = os.path.abspath(f'../model-setup/CoSWATv{version}/{region}/Watershed/Shapes/lakes-grand-{variables.final_proj_auth}-{variables.final_proj_code}.shp')
+                rivsShapefn     = os.path.abspath(f'../model-setup/CoSWATv{version}/{region}/Watershed/Shapes/dem-aster-{variables.final_proj_auth}-{variables.final_proj_code}channel.shp')
+
+                print("Running floodplain...")
+                createPath(f'../model-setup/CoSWATv{version}/{region}/Watershed/Rasters/Landscape/Flood/')
+                writeFile(f'../model-setup/CoSWATv{version}/{region}/Watershed/Rasters/Landscape/Flood/creatingFloodPlain', 'Creating floodplain...\nThis is just an indicator file\nit will be removed when the floodplain is created')
+                fxObj           = outFX('Running floodplain...')
+                floodPlain      = Floodplain(plugin._gv, fxObj, 1)
+                landScape       = Landscape(plugin._gv, fxObj, 1, fxObj)
+
+                landScape.clipperFile = plugin._gv.subbasinsFile
+                landScape.calcHillslopes(variables.thresholdCh, landScape.clipperFile, proj.layerTreeRoot())
+
+                landScape.calcFloodplain(True, proj.layerTreeRoot())
+                plugin._gv.floodFile = os.path.abspath(f'../model-setup/CoSWATv{version}/{region}/Watershed/Rasters/Landscape/Flood/invflood0_00.tif')
+                deleteFile(f'../model-setup/CoSWATv{version}/{region}/Watershed/Rasters/Landscape/Flood/creatingFloodPlain')
+
+                print("Filtering reservoirs...")
+                try:
+                    clippedReservoirs = geopandas.read_file(lakesShapefn)
+                    streams = geopandas.read_file(rivsShapefn)
+
+                    # save a copy of the original reservoirs
+                    clippedReservoirs.to_file(os.path.abspath(f'../model-setup/CoSWATv{version}/{region}/Watershed/Shapes/lakesOriginal.shp'))
+                    streams.to_file(os.path.abspath(f'../model-setup/CoSWATv{version}/{region}/Watershed/Shapes/rivsOriginal.shp'))
+
+                    # Ensure both datasets are in the same CRS
+                    if clippedReservoirs.crs != streams.crs:
+                        streams = streams.to_crs(clippedReservoirs.crs)
+
+                    # Perform spatial join to find polygons that intersect with any line in streams
+                    intersecting = geopandas.sjoin(clippedReservoirs, streams, how="inner", predicate="intersects")
+
+                    # Get the indices of intersecting polygons
+                    intersecting_indices = intersecting.index.unique()
+
+                    # Remove the intersecting polygons from clippedReservoirs
+                    clippedReservoirs = clippedReservoirs[clippedReservoirs.index.isin(intersecting_indices)]
+
+                    lakesGDF = clippedReservoirs
+                    lakes_to_remove = []
+
+                    for index, stream in streams.iterrows():
+                        start_point = Point(stream['geometry'].coords[0])
+                        end_point = Point(stream['geometry'].coords[-1])
+                        line = stream['geometry']
                 
-                for lake_index, lake in lakesGDF.iterrows():
-                    if lake.geometry.contains(end_point) and not lake.geometry.contains(start_point):
+                        for lake_index, lake in lakesGDF.iterrows():
+                            if lake.geometry.contains(end_point) and not lake.geometry.contains(start_point):
                         
-                        intersections = count_intersections(line, lake.geometry)
-                        if intersections >= 2: lakes_to_remove.append(lake_index)
-
-            # Remove the identified lakes
-            lakesGDF = lakesGDF.drop(lakes_to_remove)
-            lakesGDF.to_file(lakesShapefn)
-        except:
-            print("Error filtering reservoirs - will not be used in the model")
-            raise
+                                intersections = count_intersections(line, lake.geometry)
+                                if intersections >= 2: lakes_to_remove.append(lake_index)
+
+                    # Remove the identified lakes
+                    lakesGDF = lakesGDF.drop(lakes_to_remove)
+                    lakesGDF.to_file(lakesShapefn)
+                except:
+                    print("Error filtering reservoirs - will not be used in the model")
+                    raise
             
-        delin.finishDelineation()
-
-        if not dlg.hrusButton.isEnabled():
-            QSWATUtils.error('\t ! HRUs button not enabled', True)
-            sys.exit(1)
-
-        hrus = HRUs(plugin._gv, dlg.reportsBox)
-        hrus.init()
-        hrus._gv.useLandscapes = True
-        hrus._dlg.generateFullHRUs.setEnabled(True)
-        hrus.fullHRUsWanted = True
-        hrus.initFloodplain()
-        hrus.readFiles()
-
-        if not os.path.exists(QSWATUtils.join(plugin._gv.textDir, Parameters._TOPOREPORT)):
-            QSWATUtils.error('\t ! Elevation report not created \n\n\t   Have you run Delineation?\n', True)
-            sys.exit(1)
-
-        if not os.path.exists(QSWATUtils.join(plugin._gv.textDir, Parameters._BASINREPORT)):
-            QSWATUtils.error('\t ! Landuse and soil report not created', True)
-            sys.exit(1)
-
-        hrus.calcHRUs()
-        if not os.path.exists(QSWATUtils.join(plugin._gv.textDir, Parameters._HRUSREPORT)):
-            QSWATUtils.error('\t ! HRUs report not created', True)
-            sys.exit(1)
-
-        if not os.path.exists(QSWATUtils.join(projDir, r'Watershed/Shapes/rivs1.shp')):
-            QSWATUtils.error('\t ! Streams shapefile not created', True)
-            sys.exit(1)
-
-        if not os.path.exists(QSWATUtils.join(projDir, r'Watershed/Shapes/subs1.shp')):
-            QSWATUtils.error('\t ! Subbasins shapefile not created', True)
-            sys.exit(1)
-
-        QSWATUtils.information('\t - finished creating HRUs\n', True)
-        print()
-        print(f'done with running qswat+ for region {region}', '\nQSWAT+ run complete')
+                delin.finishDelineation()
+
+                if not dlg.hrusButton.isEnabled():
+                    QSWATUtils.error('\t ! HRUs button not enabled', True)
+                    sys.exit(1)
+
+                hrus = HRUs(plugin._gv, dlg.reportsBox)
+                hrus.init()
+                hrus._gv.useLandscapes = True
+                hrus._dlg.generateFullHRUs.setEnabled(True)
+                hrus.fullHRUsWanted = True
+                hrus.initFloodplain()
+                hrus.readFiles()
+
+                if not os.path.exists(QSWATUtils.join(plugin._gv.textDir, Parameters._TOPOREPORT)):
+                    QSWATUtils.error('\t ! Elevation report not created \n\n\t   Have you run Delineation?\n', True)
+                    sys.exit(1)
+
+                if not os.path.exists(QSWATUtils.join(plugin._gv.textDir, Parameters._BASINREPORT)):
+                    QSWATUtils.error('\t ! Landuse and soil report not created', True)
+                    sys.exit(1)
+
+                hrus.calcHRUs()
+                if not os.path.exists(QSWATUtils.join(plugin._gv.textDir, Parameters._HRUSREPORT)):
+                    QSWATUtils.error('\t ! HRUs report not created', True)
+                    sys.exit(1)
+
+                if not os.path.exists(QSWATUtils.join(projDir, r'Watershed/Shapes/rivs1.shp')):
+                    QSWATUtils.error('\t ! Streams shapefile not created', True)
+                    sys.exit(1)
+
+                if not os.path.exists(QSWATUtils.join(projDir, r'Watershed/Shapes/subs1.shp')):
+                    QSWATUtils.error('\t ! Subbasins shapefile not created', True)
+                    sys.exit(1)
+
+                QSWATUtils.information('\t - finished creating HRUs\n', True)
+                print()
+                print(f'done with running qswat+ for region {region}', '\nQSWAT+ run complete')
 
@@ -18,7 +18,6 @@ GitHub  : github.com/celray
 import os
 import sys
 from cjfx import list_folders, ignore_warnings, alert
-import multiprocessing
 import argparse
 
 ignore_warnings()
@@ -28,20 +27,8 @@ me = os.path.realpath(__file__)
 os.chdir(os.path.dirname(me))
 
 import datavariables as variables
-
-def set_up_model(region_, version_, get_data_, period_):
-    '''
-    This function coordinates the setup of the COmmunity SWAT+ Model
-    '''
-    alert(f'Setting up {region_}', f'Setting up {region_}')
-    if get_data_ == 'y': os.system(f'get-data.py {region_}')
-
-    os.system(f'init-model.py {region_} --v {version_}')
-    os.system(f'run-qswatplus.py {region_} --v {version_}')
-    os.system(f'edit-model.py {region_} --v {version_}')
-
-    os.system(f'run-model.py {region_} --v {version_} --y {period_}')
-    os.system(f'evaluate-model.py {region_} --v {version_}')
+from instrumentation import instrument_script
+from pipeline import region_stages, run_pipeline, report_pipeline, submit_tasks, run_worker
 
 args = sys.argv
 
@@ -49,6 +36,9 @@ parser = argparse.ArgumentParser(description="a script to set up the CoSWAT-Glob
 parser.add_argument("r", help="the name of the region to set up the model for. If not specified, all regions will be processed.", nargs='*', default=[])
 parser.add_argument("--v", help="the version of the model setup to use. If not specified, the datavariables value will be used.", nargs='?', default=variables.version)
 parser.add_argument("--d", help="whether to prepare data for regions. If not specified, the data will be prepared.", nargs='?', default='y')
+parser.add_argument("--f", help="run all stages again, also those that are up to date.", action='store_true')
+parser.add_argument("--submit", help="put the stages of the regions in the queue of the ledger for workers and exit.", action='store_true')
+parser.add_argument("--worker", help="run stages from the queue of the ledger until it is empty, on this or any machine sharing the model folders.", action='store_true')
 
 args = parser.parse_args()
 
@@ -66,27 +56,39 @@ version = args.v if args.v else variables.version
 # get data preparation option
 get_data = args.d if args.d else 'y'
 
-# get number of processes to use
-processes = variables.processes
-
 if __name__ == "__main__":
-    
-    pool = multiprocessing.Pool(int(processes))
 
-    jobs = []    
+    with instrument_script():
+
+        if args.worker:
+            # the stages come from the queue, map-outputs.py runs once all workers are done
+            alert('Running queued stages', 'Global Model Setup')
+            tasks, results = run_worker(variables.pipeline_cores, variables.pipeline_memory, force_ = args.f)
+            report_pipeline(tasks, results)
+
+        else:
+            # every region runs its stages in order, a failed stage stops the stages after it
+            tasks = {}
+            for region in regions:
+                # set data preparation options in ./data-preparation/resources/datavariables.py
+                tasks.update(region_stages(region, version, variables.run_period, get_data_ = get_data == 'y'))
+
+            if args.submit:
+                queued = submit_tasks(tasks)
+                alert(f'{queued} stages of {len(regions)} regions queued, start set-up-model.py --worker on the machines to run them', 'Global Model Setup')
+                sys.exit()
 
-    counter = 0
-    for region in regions:
-        counter += 1
-        # set data preparation options in ./data-preparation/resources/datavariables.py
-        jobs.append([region, version, get_data, variables.run_period])
-    
-    result = pool.starmap_async(set_up_model, jobs)
-    result.get()
+            alert(f'Setting up {len(regions)} regions', 'Global Model Setup')
+            results = run_pipeline(tasks, variables.pipeline_cores, variables.pipeline_memory, f'../model-setup/.pipeline/CoSWATv{version}', force_ = args.f)
+            report_pipeline(tasks, results)
 
-    pool.close()
+            os.chdir(os.path.dirname(me))
+            if any(result['status'] in ['done', 'up-to-date'] for name, result in results.items() if name.endswith(':evaluate-model')):
+                os.system(f'{sys.executable} map-outputs.py --v {version}')
 
-    os.chdir(os.path.dirname(me))
-    os.system(f'map-outputs.py --v {version}')
+        failed = [name for name, result in results.items() if result['status'] == 'failed']
+        if len(failed) > 0:
+            alert(f"{len(failed)} stages failed: {', '.join(failed)}", 'Global Model Setup Failed')
+            sys.exit(1)
 
-alert('all tasks complete', 'Global Model Setup Complete')
+        alert('all tasks complete', 'Global Model Setup Complete')
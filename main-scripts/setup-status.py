@@ -0,0 +1,71 @@
+#!/bin/python3
+
+'''
+this script lists the model set up stages of the regions from the run ledger
+written by set-up-model.py: by default the stages that failed, were blocked by
+a failed stage or stalled (left running by a run that is gone), and the stages
+in the queue of the workers with the worker and lease of those that run.
+
+Author  : Celray James CHAWANDA
+Contact : celray@chawanda.com
+Licence : MIT
+GitHub  : github.com/celray
+'''
+
+import os, sys, time, argparse
+
+# change working directory
+me = os.path.realpath(__file__)
+os.chdir(os.path.dirname(me))
+
+import datavariables as variables
+from pipeline import open_ledger, stalled_stages
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description="a script to list the failed or stalled model set up stages of the regions")
+
+    parser.add_argument("r", help="the regions to list. If not specified, all regions in the ledger will be listed.", nargs='*', default=[])
+    parser.add_argument("--v", help="the version of the model setup to list. If not specified, all versions will be listed.", nargs='?', default=None)
+    parser.add_argument("--hours", help="hours after which a running stage counts as stalled, also when its run is on another machine.", nargs='?', type=float, default=None)
+    parser.add_argument("--all", help="list every stage, also those that are done.", action='store_true')
+
+    args = parser.parse_args()
+
+    if not os.path.exists(variables.pipeline_ledger):
+        print(f"! no run ledger at {variables.pipeline_ledger}, run set-up-model.py first")
+        sys.exit(1)
+
+    ledger  = open_ledger(variables.pipeline_ledger)
+    stalled = {(region, version, stage) for region, version, stage, started, host, pid in stalled_stages(ledger, args.hours)}
+    rows    = ledger.execute("SELECT region, version, stage, status, started, finished, seconds, host, message FROM stages ORDER BY version, region, started").fetchall()
+    queue   = ledger.execute("SELECT version, name, status, worker, lease_until, attempts FROM queue ORDER BY version, name").fetchall()
+    ledger.close()
+
+    queue = [row for row in queue if (len(args.r) == 0 or row[1].split(':')[0] in args.r) and (not args.v or row[0] == args.v)]
+    if len(queue) > 0:
+        counts = {}
+        for version, name, status, worker, lease_until, attempts in queue: counts[status] = counts.get(status, 0) + 1
+        print(f"\n  > queue: {', '.join(f'{count} {status}' for status, count in sorted(counts.items()))}")
+        for version, name, status, worker, lease_until, attempts in queue:
+            if status == 'leased': print(f"    {name:<48}{version:<10}{worker:<30}lease {lease_until - time.time():>7.0f} s  attempt {attempts}")
+
+    listed = []
+    for region, version, stage, status, started, finished, seconds, host, message in rows:
+        if len(args.r) > 0 and not region in args.r: continue
+        if args.v and version != args.v: continue
+        if (region, version, stage) in stalled: status = 'stalled'
+        if args.all or status in ['failed', 'blocked', 'stalled']:
+            listed.append([region, version, stage, status, started or '', finished or '', '' if seconds is None else f'{seconds:.1f}', host or '', message or ''])
+
+    if len(listed) == 0:
+        print("\n  > no stages to list\n")
+        sys.exit()
+
+    print(f"\n{'region':<30}{'version':<10}{'stage':<18}{'status':<10}{'started':<21}{'finished':<21}{'seconds':>10}  {'host':<16}message")
+    for region, version, stage, status, started, finished, seconds, host, message in listed:
+        print(f"{region:<30}{version:<10}{stage:<18}{status:<10}{started:<21}{finished:<21}{seconds:>10}  {host:<16}{message}")
+
+    regions = sorted({row[0] for row in listed if row[3] in ['failed', 'stalled']})
+    if len(regions) > 0: print(f"\n  > regions to resume: {' '.join(regions)}")
+    print()
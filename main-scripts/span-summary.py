@@ -0,0 +1,134 @@
+#!/bin/python3
+
+'''
+this script summarises the spans the scripts write (see instrumentation.py) for
+a run: the slowest stages, the slowest regions and the slowest stages of single
+regions, with their cpu seconds, peak rss and bytes read and written. stages nest
+(get-data holds prepare-weather, a pipeline stage holds its script), so their
+times overlap, while the time of a region counts each of its stages once.
+
+usage: span-summary.py [--run last|all|run id] [--top 10] [--runs] [--files spans.jsonl ...]
+
+Author  : Celray James CHAWANDA
+Contact : celray@chawanda.com
+Licence : MIT
+GitHub  : github.com/celray
+'''
+
+import os, sys, argparse
+from datetime import datetime, timedelta
+
+# change working directory, the given files are relative to where the script is started
+start_dir = os.getcwd()
+me = os.path.realpath(__file__)
+os.chdir(os.path.dirname(me))
+
+import datavariables as variables
+from instrumentation import read_spans
+
+
+def outermost(span_, spans_, key_):
+    '''
+    checks if no span around a span has the same key (like its stage or region)
+    '''
+    parent = spans_.get(span_.get('parent'))
+    while not parent is None:
+        if key_(parent) == key_(span_): return False
+        parent = spans_.get(parent.get('parent'))
+
+    return True
+
+
+def span_end(span_):
+    return datetime.fromisoformat(span_['start']) + timedelta(seconds = span_.get('seconds', 0))
+
+
+def gigabytes(bytes_):
+    return f'{bytes_ / 1024 ** 3:.2f}'
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description="a script to rank the slowest regions and stages of a run from the spans of the scripts")
+
+    parser.add_argument("--run", help="the run to summarise: last, all or a run id. If not specified, the last run will be summarised.", nargs='?', default='last')
+    parser.add_argument("--top", help="the number of regions and stages to list. If not specified, 10 will be listed.", nargs='?', type=int, default=10)
+    parser.add_argument("--runs", help="list the runs in the spans instead.", action='store_true')
+    parser.add_argument("--files", help="the spans files to read. If not specified, the files of all machines in pipeline_spans will be read.", nargs='*', default=None)
+
+    args = parser.parse_args()
+
+    spans = read_spans([os.path.join(start_dir, file_name) for file_name in args.files] if args.files else None)
+    if len(spans) == 0:
+        print(f"! no spans in {args.files if args.files else variables.pipeline_spans}")
+        sys.exit(1)
+
+    runs = {}
+    for span in spans:
+        first, last, count = runs.get(span['run'], (span['start'], span_end(span), 0))
+        runs[span['run']] = (min(first, span['start']), max(last, span_end(span)), count + 1)
+
+    if args.runs:
+        print(f"\n{'run':<50}{'started':<25}{'hours':>8}{'spans':>8}")
+        for run, (first, last, count) in sorted(runs.items(), key = lambda item: item[1][0]):
+            print(f"{run:<50}{first:<25}{(last - datetime.fromisoformat(first)).total_seconds() / 3600:>8.2f}{count:>8}")
+        print()
+        sys.exit()
+
+    if args.run == 'last': run = max(runs, key = lambda run: runs[run][0])
+    else: run = args.run
+    if run != 'all' and not run in runs:
+        print(f"! no spans of run {run}, see span-summary.py --runs")
+        sys.exit(1)
+
+    spans   = [span for span in spans if run == 'all' or span['run'] == run]
+    by_id   = {span['id']: span for span in spans}
+    first   = min(span['start'] for span in spans)
+    last    = max(span_end(span) for span in spans)
+    print(f"\n  > run {run}: {len(spans)} spans from {first}, {(last - datetime.fromisoformat(first)).total_seconds() / 3600:.2f} hours\n")
+
+    # stages: every span that is not inside a span of the same stage
+    stages = {}
+    for span in spans:
+        if not outermost(span, by_id, lambda item: item['stage']): continue
+        stage = stages.setdefault(span['stage'], {'count': 0, 'failed': 0, 'seconds': 0.0, 'slowest': span, 'cpu': 0.0, 'rss': 0, 'read': 0, 'written': 0})
+        stage['count']      += 1
+        stage['failed']     += span.get('status') == 'failed'
+        stage['seconds']    += span['seconds']
+        stage['cpu']        += span.get('cpu_seconds', 0) + span.get('child_cpu_seconds', 0)
+        stage['rss']         = max(stage['rss'], span.get('peak_rss', 0))
+        stage['read']       += span.get('read_bytes', 0)
+        stage['written']    += span.get('written_bytes', 0)
+        if span['seconds'] > stage['slowest']['seconds']: stage['slowest'] = span
+
+    print(f"{'stage':<24}{'count':>6}{'failed':>7}{'seconds':>11}{'mean':>10}{'max':>10}  {'slowest region':<30}{'cpu s':>10}{'rss GB':>8}{'read GB':>9}{'write GB':>9}")
+    for name, stage in sorted(stages.items(), key = lambda item: -item[1]['seconds'])[:args.top]:
+        print(f"{name:<24}{stage['count']:>6}{stage['failed']:>7}{stage['seconds']:>11.1f}{stage['seconds'] / stage['count']:>10.1f}{stage['slowest']['seconds']:>10.1f}  "
+              f"{stage['slowest']['region'] or '':<30}{stage['cpu']:>10.1f}{gigabytes(stage['rss']):>8}{gigabytes(stage['read']):>9}{gigabytes(stage['written']):>9}")
+
+    # regions: the spans of a region that are not inside another span of the region
+    regions = {}
+    for span in spans:
+        if span.get('region') is None: continue
+        region = regions.setdefault(span['region'], {'seconds': 0.0, 'slowest': None, 'cpu': 0.0, 'rss': 0, 'read': 0, 'written': 0, 'failed': []})
+        if span.get('status') == 'failed' and not span['stage'] in region['failed']: region['failed'].append(span['stage'])
+        if region['slowest'] is None or span['seconds'] > region['slowest']['seconds']: region['slowest'] = span
+        if not outermost(span, by_id, lambda item: item.get('region')): continue
+        region['seconds']   += span['seconds']
+        region['cpu']       += span.get('cpu_seconds', 0) + span.get('child_cpu_seconds', 0)
+        region['rss']        = max(region['rss'], span.get('peak_rss', 0))
+        region['read']      += span.get('read_bytes', 0)
+        region['written']   += span.get('written_bytes', 0)
+
+    print(f"\n{'region':<30}{'seconds':>11}  {'slowest stage':<24}{'seconds':>10}{'cpu s':>10}{'rss GB':>8}{'read GB':>9}{'write GB':>9}  failed")
+    for name, region in sorted(regions.items(), key = lambda item: -item[1]['seconds'])[:args.top]:
+        print(f"{name:<30}{region['seconds']:>11.1f}  {region['slowest']['stage']:<24}{region['slowest']['seconds']:>10.1f}"
+              f"{region['cpu']:>10.1f}{gigabytes(region['rss']):>8}{gigabytes(region['read']):>9}{gigabytes(region['written']):>9}  {', '.join(region['failed'])}")
+
+    # stages of single regions, a stage run more than once for a region counts once per run
+    single = [span for span in spans if not span.get('region') is None and outermost(span, by_id, lambda item: (item['stage'], item.get('region')))]
+    print(f"\n{'region':<30}{'stage':<24}{'seconds':>10}{'cpu s':>10}{'rss GB':>8}{'read GB':>9}{'write GB':>9}  {'host':<16}status")
+    for span in sorted(single, key = lambda item: -item['seconds'])[:args.top]:
+        print(f"{span['region']:<30}{span['stage']:<24}{span['seconds']:>10.1f}{span.get('cpu_seconds', 0) + span.get('child_cpu_seconds', 0):>10.1f}"
+              f"{gigabytes(span.get('peak_rss', 0)):>8}{gigabytes(span.get('read_bytes', 0)):>9}{gigabytes(span.get('written_bytes', 0)):>9}  {span['host']:<16}{span.get('status', '')}")
+    print()
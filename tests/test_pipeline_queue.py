@@ -0,0 +1,127 @@
+'''
+tests of the queue of the run ledger with several local worker processes (pipeline.py).
+the stages are small python commands, so no gdal, qgis or swat+ is needed
+'''
+
+import os, sys, time, signal, sqlite3, subprocess
+import pytest
+
+main_scripts = os.path.join(os.path.dirname(os.path.realpath(__file__)), '..', 'main-scripts')
+sys.path.insert(0, main_scripts)
+
+if not sys.platform.startswith('linux'): pytest.skip('the workers are killed through their process group', allow_module_level = True)
+from pipeline import submit_tasks
+
+# appends the task name to the runs file, waits a little so the workers overlap and writes the output
+stage_code = "import sys, time; open(sys.argv[1], 'a').write(sys.argv[2] + '\\n'); time.sleep(0.2); open(sys.argv[3], 'w').write('done')"
+
+# runs forever the first time, so its worker can be killed with the stage leased, and finishes the next time
+stalling_code = ("import os, sys, time\n"
+    "first = not os.path.exists(sys.argv[3] + '.started')\n"
+    "open(sys.argv[3] + '.started', 'a').write('started')\n"
+    "open(sys.argv[1], 'a').write(sys.argv[2] + '\\n')\n"
+    "while first: time.sleep(1)\n"
+    "open(sys.argv[3], 'w').write('done')")
+
+
+def stage_task(tmp_path_, region_, stage_, depends_ = [], code_ = stage_code, exit_code_ = 0):
+    '''
+    returns the {task name: task} of a stage that records its run in the runs file
+    '''
+    name    = f'{region_}:{stage_}'
+    output  = str(tmp_path_ / f'{region_}-{stage_}.out')
+    code    = code_ if exit_code_ == 0 else f"import sys; open(sys.argv[1], 'a').write(sys.argv[2] + '\\n'); sys.exit({exit_code_})"
+
+    return {name: {'region': region_, 'version': 'test', 'stage': stage_, 'command': ['python', '-c', code, str(tmp_path_ / 'runs.txt'), name, output],
+        'inputs': [], 'outputs': [output], 'depends': depends_, 'cores': 1, 'memory': 0, 'priority': 0}}
+
+
+@pytest.fixture
+def workers():
+    '''
+    the worker processes a test starts, killed with their stages when the test ends
+    '''
+    started = []
+    yield started
+
+    for worker in started:
+        if worker.poll() is None: os.killpg(worker.pid, signal.SIGKILL)
+        worker.wait()
+
+
+def start_worker(tmp_path_, lease_seconds_, workers_):
+    '''
+    starts a worker process on the ledger in tmp_path_, in its own process group so it can be killed with its stage
+    '''
+    code = (f"import sys; sys.path.insert(0, {main_scripts!r}); import pipeline; "
+        f"pipeline.run_worker(cores_ = 1, state_dir_ = {str(tmp_path_ / 'logs')!r}, ledger_file_ = {str(tmp_path_ / 'ledger.sqlite')!r}, "
+        f"lease_seconds_ = {lease_seconds_}, attempts_ = 3, poll_seconds_ = 0.2)")
+
+    worker = subprocess.Popen([sys.executable, '-c', code], cwd = main_scripts, env = dict(os.environ, COSWAT_SPANS = ''),
+        stdout = subprocess.DEVNULL, stderr = subprocess.DEVNULL, start_new_session = True)
+    workers_.append(worker)
+
+    return worker
+
+
+def queue_rows(tmp_path_):
+    ledger  = sqlite3.connect(tmp_path_ / 'ledger.sqlite')
+    rows    = {name: (status, worker, attempts) for name, status, worker, attempts in ledger.execute("SELECT name, status, worker, attempts FROM queue")}
+    ledger.close()
+
+    return rows
+
+
+def runs(tmp_path_):
+    runs_file = tmp_path_ / 'runs.txt'
+    return runs_file.read_text().split() if runs_file.exists() else []
+
+
+def test_workers_run_every_task_once(tmp_path, workers):
+    tasks = {}
+    for region in ['r1', 'r2', 'r3', 'r4']:
+        tasks.update(stage_task(tmp_path, region, 'get-data'))
+        tasks.update(stage_task(tmp_path, region, 'init-model', [f'{region}:get-data']))
+    tasks.update(stage_task(tmp_path, 'bad', 'get-data', exit_code_ = 1))
+    tasks.update(stage_task(tmp_path, 'bad', 'init-model', ['bad:get-data']))
+
+    assert submit_tasks(tasks, str(tmp_path / 'ledger.sqlite')) == len(tasks)
+
+    for count in range(3): start_worker(tmp_path, 5, workers)
+    for worker in workers: assert worker.wait(timeout = 120) == 0
+
+    ran = runs(tmp_path)
+    assert sorted(ran) == sorted(name for name in tasks if name != 'bad:init-model')
+
+    rows = queue_rows(tmp_path)
+    assert all(rows[name][0] == 'done' and rows[name][2] == 1 for name in tasks if not name.startswith('bad:'))
+    assert rows['bad:get-data'][0] == 'failed'
+    assert rows['bad:init-model'][0] == 'blocked'
+
+    # every stage of a region runs after the one it depends on
+    for region in ['r1', 'r2', 'r3', 'r4']: assert ran.index(f'{region}:get-data') < ran.index(f'{region}:init-model')
+
+
+def test_lease_of_killed_worker_is_reclaimed(tmp_path, workers):
+    tasks = stage_task(tmp_path, 'r1', 'get-data', code_ = stalling_code)
+    tasks.update(stage_task(tmp_path, 'r1', 'init-model', ['r1:get-data']))
+    submit_tasks(tasks, str(tmp_path / 'ledger.sqlite'))
+
+    first = start_worker(tmp_path, 1, workers)
+    deadline = time.time() + 60
+    while runs(tmp_path) != ['r1:get-data']:
+        assert time.time() < deadline and first.poll() is None
+        time.sleep(0.1)
+
+    leased_by = queue_rows(tmp_path)['r1:get-data'][1]
+    os.killpg(first.pid, signal.SIGKILL)
+    first.wait()
+
+    second = start_worker(tmp_path, 1, workers)
+    assert second.wait(timeout = 120) == 0
+
+    rows = queue_rows(tmp_path)
+    assert runs(tmp_path) == ['r1:get-data', 'r1:get-data', 'r1:init-model']
+    assert rows['r1:get-data'][0] == 'done' and rows['r1:get-data'][2] == 2
+    assert rows['r1:get-data'][1] != leased_by
+    assert rows['r1:init-model'][0] == 'done'
@@ -0,0 +1,27 @@
+'''
+tests of the weather file catalog of coswatFX
+'''
+
+import os, sys
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.realpath(__file__)), '..', 'data-preparation'))
+
+for module in ['osgeo', 'ccfx', 'cjfx', 'geopandas', 'xarray']: pytest.importorskip(module)
+from coswatFX import weatherFileCatalog, catalogFiles, groupWeatherFiles
+
+
+def test_empty_catalog():
+    catalog = weatherFileCatalog([])
+
+    assert len(catalog) == 0
+    assert list(catalog.columns) == ['fileName', 'startYear', 'endYear', 'variable', 'model', 'scenario']
+    assert catalogFiles(catalog, [1981, 1985]) == []
+    assert groupWeatherFiles(catalog, {'pcp': 'pr'}) == {}
+
+
+def test_catalog_names():
+    catalog = weatherFileCatalog(['pr_gswp3-ewembi_1981_1990.nc4', 'notes.txt'])
+
+    assert catalog.loc[0, ['variable', 'model', 'startYear', 'endYear']].tolist() == ['pr', 'gswp3-ewembi', 1981, 1990]
+    assert catalogFiles(catalog, [1985, 1986]) == ['pr_gswp3-ewembi_1981_1990.nc4']